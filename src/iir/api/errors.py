@@ -51,6 +51,10 @@ def validation_error(message: str, code: str = "invalid_payload", param: str | N
     return error_json(status_code, "validation_error", code, message, param)
 
 
+def request_too_large_error(max_bytes: int) -> JSONResponse:
+    return error_json(413, "validation_error", "request_too_large", f"Request body too large (max {max_bytes} bytes).")
+
+
 def rate_limit_error() -> JSONResponse:
     return error_json(429, "rate_limit_error", "rate_limit_exceeded", "Rate limit exceeded")
 
@@ -59,5 +63,15 @@ def upstream_error(message: str) -> JSONResponse:
     return error_json(502, "upstream_error", "remote_provider_error", message)
 
 
+def overloaded_error(provider: str, retry_after: int = 1) -> JSONResponse:
+    response = error_json(503, "overloaded_error", "provider_overloaded", f"Provider {provider} is at capacity, retry later")
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def budget_exceeded_error(budget_usd: float) -> JSONResponse:
+    return error_json(429, "insufficient_quota", "budget_exceeded", f"Monthly budget of ${budget_usd:.2f} for this API key is spent")
+
+
 def not_found_error(path: str) -> JSONResponse:
     return error_json(404, "not_found", "not_found", f"Not found: {path}")
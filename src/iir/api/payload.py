@@ -0,0 +1,127 @@
+"""Chat request bodies parsed once and forwarded without re-encoding.
+
+A vision request is mostly base64 image data. ``parse_chat_body`` parses the
+body once and records the byte span of every top-level value. ``upstream_body``
+then builds the Bifrost request from slices of the original bytes for the
+values the router leaves alone, such as ``messages`` with its images. Only the
+fields it overrides are serialized, and the slices are streamed upstream in
+small chunks rather than joined into a second copy of the body.
+
+Only top-level null fields are dropped. Nulls inside ``messages`` or other
+values are forwarded as the client sent them.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ChatBody:
+    raw: bytes
+    data: dict[str, Any]
+    spans: dict[str, tuple[int, int]]  # byte offsets of each top-level value in ``raw``
+
+
+def _skip(text: str, idx: int) -> int:
+    return _WHITESPACE.match(text, idx).end()  # type: ignore[union-attr]
+
+
+def parse_chat_body(raw: bytes) -> ChatBody:
+    """Parse a JSON object, keeping where each top-level value sits in ``raw``.
+
+    Raises ``ValueError`` (``json.JSONDecodeError``) for anything but a JSON object.
+    """
+    text = raw.decode()
+    data: dict[str, Any] = {}
+    spans: dict[str, tuple[int, int]] = {}
+    try:
+        idx = _skip(text, 0)
+        if text[idx] != "{":
+            raise json.JSONDecodeError("Expecting a JSON object", text, idx)
+        idx = _skip(text, idx + 1)
+        if text[idx] == "}":
+            idx += 1
+        else:
+            while True:
+                if text[idx] != '"':
+                    raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, idx)
+                key, idx = _decoder.raw_decode(text, idx)
+                idx = _skip(text, idx)
+                if text[idx] != ":":
+                    raise json.JSONDecodeError("Expecting ':' delimiter", text, idx)
+                start = _skip(text, idx + 1)
+                data[key], idx = _decoder.raw_decode(text, start)
+                spans[key] = (start, idx)
+                idx = _skip(text, idx)
+                if text[idx] == "}":
+                    idx += 1
+                    break
+                if text[idx] != ",":
+                    raise json.JSONDecodeError("Expecting ',' delimiter", text, idx)
+                idx = _skip(text, idx + 1)
+    except IndexError:
+        raise json.JSONDecodeError("Unexpected end of body", text, len(text)) from None
+    if _skip(text, idx) != len(text):
+        raise json.JSONDecodeError("Extra data", text, idx)
+
+    if len(text) != len(raw):
+        # Non-ASCII text: character offsets differ from byte offsets
+        spans = _byte_spans(text, spans)
+    return ChatBody(raw, data, spans)
+
+
+def _byte_spans(text: str, spans: dict[str, tuple[int, int]]) -> dict[str, tuple[int, int]]:
+    offsets: dict[int, int] = {}
+    char = byte = 0
+    for pos in sorted({pos for span in spans.values() for pos in span}):
+        byte += len(text[char:pos].encode())
+        char = pos
+        offsets[pos] = byte
+    return {key: (offsets[start], offsets[end]) for key, (start, end) in spans.items()}
+
+
+@dataclass
+class UpstreamBody:
+    """A request body held as slices of the client's bytes; ``len()`` is its size in bytes."""
+
+    parts: list[bytes | memoryview]
+
+    def __len__(self) -> int:
+        return sum(len(part) for part in self.parts)
+
+    def __bytes__(self) -> bytes:
+        return b"".join(self.parts)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for part in self.parts:
+            for start in range(0, len(part), _CHUNK_SIZE):
+                yield bytes(part[start : start + _CHUNK_SIZE])
+
+
+def upstream_body(body: ChatBody, overrides: dict[str, Any]) -> UpstreamBody:
+    """The request body with ``overrides`` applied and top-level null fields dropped.
+
+    Every other value is a slice of the client's bytes as they arrived.
+    """
+    raw = memoryview(body.raw)
+    parts: list[bytes | memoryview] = [b"{"]
+    for key, value in body.data.items():
+        if key in overrides or value is None:
+            continue
+        start, end = body.spans[key]
+        parts += [json.dumps(key).encode(), b":", raw[start:end], b","]
+    for key, value in overrides.items():
+        parts += [json.dumps(key).encode(), b":", json.dumps(value, separators=(",", ":")).encode(), b","]
+    if len(parts) > 1:
+        parts.pop()
+    parts.append(b"}")
+    return UpstreamBody(parts)
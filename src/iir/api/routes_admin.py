@@ -3,13 +3,23 @@
 from __future__ import annotations
 
 import secrets
+from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 
-from iir.auth.apikey_db import add_api_key, list_api_keys, revoke_api_key
+from iir.auth.apikey_db import (
+    KEY_PREFIX_LENGTH,
+    add_api_key,
+    find_api_keys,
+    get_usage,
+    list_api_keys,
+    revoke_api_key,
+    set_api_key_budget,
+)
 from iir.config import get_settings
-from iir.dependencies import get_api_key
+from iir.dependencies import get_api_key, get_usage_ledger
+from iir.usage.ledger import UsageLedger, current_period
 
 router = APIRouter(prefix="/admin")
 
@@ -18,12 +28,33 @@ class CreateKeyRequest(BaseModel):
     description: str | None = None
     priority: int = 0
     is_superadmin: bool = False
+    budget_usd: float | None = None
 
 
 class CreateKeyResponse(BaseModel):
-    api_key: str
+    api_key: str  # shown once; only its hash is stored
+    id: int
+    key_prefix: str
     description: str | None
     priority: int
+    budget_usd: float | None = None
+
+
+class BudgetRequest(BaseModel):
+    budget_usd: float | None = None
+
+
+def _resolve_key(db_path: str, prefix: str) -> dict[str, Any]:
+    """The single key matching ``prefix`` (or a full key), else 404/409."""
+    matches = find_api_keys(db_path, prefix)
+    if not matches:
+        raise HTTPException(status_code=404, detail="API key not found")
+    if len(matches) > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Prefix {prefix!r} matches {len(matches)} keys; use a longer prefix or the full key",
+        )
+    return matches[0]
 
 
 @router.post("/api-keys")
@@ -31,27 +62,79 @@ async def create_api_key(
     request: Request,
     body: CreateKeyRequest,
     _api_key: str = Depends(get_api_key),
+    ledger: UsageLedger = Depends(get_usage_ledger),
 ) -> CreateKeyResponse:
     settings = get_settings()
     new_key = secrets.token_urlsafe(32)
     ip = request.client.host if request.client else "unknown"
-    add_api_key(settings.auth_db_path, new_key, ip, body.description, body.priority, body.is_superadmin)
-    return CreateKeyResponse(api_key=new_key, description=body.description, priority=body.priority)
+    key_id = add_api_key(settings.auth_db_path, new_key, ip, body.description, body.priority, body.is_superadmin, body.budget_usd)
+    if key_id is None:
+        raise HTTPException(status_code=500, detail="Could not store the new API key")
+    ledger.set_budget(str(key_id), body.budget_usd)
+    return CreateKeyResponse(
+        api_key=new_key,
+        id=key_id,
+        key_prefix=new_key[:KEY_PREFIX_LENGTH],
+        description=body.description,
+        priority=body.priority,
+        budget_usd=body.budget_usd,
+    )
 
 
 @router.get("/api-keys")
-async def get_api_keys(_api_key: str = Depends(get_api_key)) -> dict:
+async def get_api_keys(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: int = Query(0, ge=0, description="next_cursor from the previous page"),
+    active: bool | None = None,
+    prefix: str | None = None,
+    q: str | None = Query(None, description="substring of the description"),
+    _api_key: str = Depends(get_api_key),
+) -> dict[str, Any]:
     settings = get_settings()
-    keys = list_api_keys(settings.auth_db_path)
-    return {"data": keys}
+    if prefix:
+        keys = [k for k in find_api_keys(settings.auth_db_path, prefix) if k["id"] > cursor]
+        if active is not None:
+            keys = [k for k in keys if bool(k["active"]) == active]
+        if q:
+            keys = [k for k in keys if q.lower() in (k["description"] or "").lower()]
+        keys = keys[: limit + 1]
+    else:
+        keys = list_api_keys(settings.auth_db_path, limit=limit + 1, after_id=cursor, active=active, description=q)
+    # One extra row tells whether another page exists without a COUNT query
+    next_cursor = keys[limit - 1]["id"] if len(keys) > limit else None
+    return {"data": keys[:limit], "next_cursor": next_cursor}
 
 
 @router.delete("/api-keys/{key_prefix}")
-async def delete_api_key(key_prefix: str, _api_key: str = Depends(get_api_key)) -> dict:
+async def delete_api_key(key_prefix: str, _api_key: str = Depends(get_api_key)) -> dict[str, Any]:
     settings = get_settings()
-    keys = list_api_keys(settings.auth_db_path)
-    target = next((k for k in keys if k["key"].startswith(key_prefix)), None)
-    if not target:
-        raise HTTPException(status_code=404, detail="API key not found")
-    revoke_api_key(settings.auth_db_path, target["key"])
-    return {"status": "revoked"}
+    target = _resolve_key(settings.auth_db_path, key_prefix)
+    revoke_api_key(settings.auth_db_path, target["id"])
+    return {"status": "revoked", "id": target["id"]}
+
+
+@router.put("/api-keys/{key_prefix}/budget")
+async def update_budget(
+    key_prefix: str,
+    body: BudgetRequest,
+    _api_key: str = Depends(get_api_key),
+    ledger: UsageLedger = Depends(get_usage_ledger),
+) -> dict[str, Any]:
+    settings = get_settings()
+    target = _resolve_key(settings.auth_db_path, key_prefix)
+    set_api_key_budget(settings.auth_db_path, target["id"], body.budget_usd)
+    ledger.set_budget(str(target["id"]), body.budget_usd)
+    return {"status": "updated", "budget_usd": body.budget_usd}
+
+
+@router.get("/usage")
+async def get_key_usage(
+    period: str | None = None,
+    _api_key: str = Depends(get_api_key),
+    ledger: UsageLedger = Depends(get_usage_ledger),
+) -> dict[str, Any]:
+    settings = get_settings()
+    await ledger.flush()
+    period = period or current_period()
+    usage = get_usage(settings.auth_db_path, period)
+    return {"period": period, "data": [{k: v for k, v in row.items() if k != "key"} for row in usage.values()]}
@@ -0,0 +1,83 @@
+"""Batch API: upload JSONL of chat requests, process them offline.
+
+Batches are scoped to the API key that created them. Another key gets 404,
+the same as for a batch that does not exist. A key whose budget is spent
+cannot create batches.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from iir.api.errors import budget_exceeded_error, request_too_large_error
+from iir.batch.manager import BatchManager, BatchState, UploadTooLargeError
+from iir.dependencies import get_api_key, get_batch_manager, get_usage_ledger
+from iir.usage.ledger import UsageLedger
+
+router = APIRouter(prefix="/v1")
+
+
+def _require(state: BatchState | None) -> BatchState:
+    if state is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return state
+
+
+@router.post("/batches")
+async def create_batch(
+    request: Request,
+    api_key: str = Depends(get_api_key),
+    manager: BatchManager = Depends(get_batch_manager),
+    ledger: UsageLedger = Depends(get_usage_ledger),
+) -> Any:
+    """Body is the raw JSONL input file, one OpenAI batch request per line."""
+    if not ledger.within_budget(api_key):
+        return budget_exceeded_error(ledger.budget(api_key) or 0.0)
+    try:
+        state = await manager.create(request.stream(), strategy=request.headers.get("X-Routing-Strategy"), owner=api_key)
+    except UploadTooLargeError as exc:
+        return request_too_large_error(exc.max_bytes)
+    return state.to_dict()
+
+
+@router.get("/batches")
+async def list_batches(
+    limit: int = 20,
+    api_key: str = Depends(get_api_key),
+    manager: BatchManager = Depends(get_batch_manager),
+) -> dict[str, Any]:
+    return {"object": "list", "data": [b.to_dict() for b in manager.list_batches(limit, owner=api_key)]}
+
+
+@router.get("/batches/{batch_id}")
+async def get_batch(
+    batch_id: str,
+    api_key: str = Depends(get_api_key),
+    manager: BatchManager = Depends(get_batch_manager),
+) -> dict[str, Any]:
+    return _require(manager.get(batch_id, owner=api_key)).to_dict()
+
+
+@router.post("/batches/{batch_id}/cancel")
+async def cancel_batch(
+    batch_id: str,
+    api_key: str = Depends(get_api_key),
+    manager: BatchManager = Depends(get_batch_manager),
+) -> dict[str, Any]:
+    return _require(manager.cancel(batch_id, owner=api_key)).to_dict()
+
+
+@router.get("/batches/{batch_id}/output")
+async def get_batch_output(
+    batch_id: str,
+    api_key: str = Depends(get_api_key),
+    manager: BatchManager = Depends(get_batch_manager),
+) -> FileResponse:
+    _require(manager.get(batch_id, owner=api_key))
+    path = manager.output_path(batch_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Batch output not available yet")
+    return FileResponse(path, media_type="application/jsonl")
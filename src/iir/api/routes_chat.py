@@ -3,67 +3,204 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import Any
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import ValidationError
 
-from iir.api.errors import upstream_error, validation_error
+from iir.api.errors import budget_exceeded_error, overloaded_error, request_too_large_error, upstream_error
+from iir.api.payload import ChatBody, parse_chat_body, upstream_body
 from iir.api.schemas import ChatCompletionRequest
 from iir.bifrost_client.client import BifrostClient
-from iir.dependencies import get_api_key, get_bifrost, get_routing_engine
+from iir.bifrost_client.limiter import ProviderOverloadedError
+from iir.config import get_settings
+from iir.dependencies import get_api_key, get_audit_log, get_bifrost, get_routing_engine, get_usage_ledger
+from iir.observability.audit import AuditLog
 from iir.routing.engine import RoutingEngine
+from iir.routing.features import extract_features
+from iir.usage.ledger import UsageLedger, parse_usage
 
 logger = logging.getLogger("iir.api.chat")
 
 router = APIRouter(prefix="/v1")
 
 
+def _body_limit(raw: bytes) -> int:
+    """The size limit for ``raw``, decided by a byte scan before anything is parsed.
+
+    Only bodies that mention ``image_url`` get the vision limit; after parsing,
+    ``_complete`` checks that they really carry an image.
+    """
+    settings = get_settings()
+    if len(raw) > settings.max_body_size and b'"image_url"' in raw:
+        return max(settings.max_body_size, settings.vision_max_body_size)
+    return settings.max_body_size
+
+
+def _parse_body(raw: bytes) -> tuple[ChatBody, ChatCompletionRequest]:
+    """Parse and validate the body by hand, keeping the raw bytes for forwarding.
+
+    Errors are raised as FastAPI's own validation errors, so clients see the
+    same 422 as for a declared body parameter.
+    """
+    try:
+        chat = parse_chat_body(raw)
+        return chat, ChatCompletionRequest.model_validate(chat.data)
+    except ValidationError as exc:
+        errors = [{**e, "loc": ("body", *e["loc"])} for e in exc.errors(include_url=False)]
+        raise RequestValidationError(errors) from None
+    except ValueError as exc:
+        raise RequestValidationError(
+            [{"type": "json_invalid", "loc": ("body",), "msg": "JSON decode error", "input": {}, "ctx": {"error": str(exc)}}]
+        ) from None
+
+
 @router.post("/chat/completions")
 async def chat_completions(
     request: Request,
-    body: ChatCompletionRequest,
-    _api_key: str = Depends(get_api_key),
+    api_key: str = Depends(get_api_key),
     engine: RoutingEngine = Depends(get_routing_engine),
     bifrost: BifrostClient = Depends(get_bifrost),
+    ledger: UsageLedger = Depends(get_usage_ledger),
+    audit: AuditLog | None = Depends(get_audit_log),
 ) -> Any:
+    started = time.perf_counter()
+    record: dict[str, Any] = {
+        "ts": time.time(),
+        "request_id": getattr(request.state, "request_id", None),
+        "key": request.state.api_key_prefix,
+    }
+    # Rejected and failed requests are audited too; an escaping exception is answered with 422 or 500
+    status = 500
+    try:
+        raw = await request.body()
+        limit = _body_limit(raw)
+        if len(raw) > limit:
+            status = 413
+            return request_too_large_error(limit)
+        try:
+            chat, body = _parse_body(raw)
+        except RequestValidationError:
+            status = 422
+            raise
+        record["stream"] = body.stream
+        response = await _complete(request, chat, body, api_key, engine, bifrost, ledger, record)
+        status = response.status_code
+        return response
+    except Exception as exc:
+        record.setdefault("error", str(exc) or type(exc).__name__)
+        raise
+    finally:
+        if audit is not None:
+            record["status"] = status
+            record["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            await audit.log(record)
+
+
+async def _complete(
+    request: Request,
+    chat: ChatBody,
+    body: ChatCompletionRequest,
+    api_key: str,
+    engine: RoutingEngine,
+    bifrost: BifrostClient,
+    ledger: UsageLedger,
+    record: dict[str, Any],
+) -> Response:
+    """Route and proxy one request, filling ``record`` with audit fields along the way."""
+    if not ledger.within_budget(api_key):
+        return budget_exceeded_error(ledger.budget(api_key) or 0.0)
+
     # Read routing hints from headers
     strategy = request.headers.get("X-Routing-Strategy")
     max_cost_header = request.headers.get("X-Max-Cost")
     max_cost = float(max_cost_header) if max_cost_header else None
 
+    # The validated dicts as parsed; image data is never copied for routing
+    messages = chat.data["messages"]
+    features = extract_features(messages, body.tools)
+
+    # The byte scan let this body past max_body_size; make sure it really carries an image
+    settings = get_settings()
+    if len(chat.raw) > settings.max_body_size and not features.has_images:
+        return request_too_large_error(settings.max_body_size)
+
     # Route the request
-    messages = [m.model_dump() for m in body.messages]
+    route_started = time.perf_counter()
     decision = await engine.route(
         messages=messages,
         strategy=strategy,
         explicit_model=body.model,
         max_cost=max_cost,
+        max_tokens=body.max_tokens,
+        features=features,
         tools=body.tools,
     )
+    record.update(
+        messages=messages,
+        model=decision.model,
+        provider=decision.provider,
+        category=decision.category,
+        strategy=strategy,
+        route_ms=round((time.perf_counter() - route_started) * 1000, 3),
+        estimated_prompt_tokens=decision.estimated_prompt_tokens,
+    )
 
-    # Build the payload for Bifrost
-    payload = body.model_dump(exclude_none=True)
-    payload["model"] = decision.model
+    # Build the payload for Bifrost: only overridden fields are re-encoded
+    overrides: dict[str, Any] = {"model": decision.model}
+    if body.stream and chat.data.get("stream_options") is None:
+        # Ask for token usage on the final chunk so streamed requests are billed too
+        overrides["stream_options"] = {"include_usage": True}
+    payload = {**chat.data, **overrides}
 
     # Proxy to Bifrost
+    upstream_started = time.perf_counter()
     try:
-        resp = await bifrost.chat_completion(payload)
+        resp = await bifrost.chat_completion(
+            payload,
+            provider=decision.provider,
+            priority=getattr(request.state, "api_key_priority", 0),
+            content=upstream_body(chat, overrides),
+        )
+    except ProviderOverloadedError as exc:
+        logger.warning("Rejected request: %s", exc)
+        record["error"] = str(exc)
+        return overloaded_error(exc.provider)
     except Exception as exc:
         logger.error("Bifrost request failed: %s", exc)
+        record["error"] = str(exc)
         return upstream_error(f"Gateway error: {exc}")
+    finally:
+        record["upstream_ms"] = round((time.perf_counter() - upstream_started) * 1000, 3)
 
     if resp.status_code >= 400:
         return JSONResponse(status_code=resp.status_code, content=resp.json())
 
+    content_type = resp.headers.get("content-type", "")
+    usage = parse_usage(resp.content, content_type)
+    if usage is not None:
+        record.update(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cost_usd=ledger.record(api_key, decision.model, usage),
+        )
+
     # Build response with routing metadata headers
-    response_data = resp.json()
-    response = JSONResponse(content=response_data)
+    response: Response
+    if "text/event-stream" in content_type:
+        response = Response(content=resp.content, media_type="text/event-stream")
+    else:
+        response = JSONResponse(content=resp.json())
     response.headers["X-Route-Model"] = decision.model
     response.headers["X-Route-Provider"] = decision.provider
     response.headers["X-Route-Reason"] = decision.reason
     response.headers["X-Classification"] = decision.category
     if decision.estimated_cost_per_1m > 0:
         response.headers["X-Estimated-Cost-Per-1M"] = f"{decision.estimated_cost_per_1m:.4f}"
+    if decision.estimated_cost > 0:
+        response.headers["X-Estimated-Cost"] = f"{decision.estimated_cost:.6f}"
 
     return response
@@ -2,29 +2,52 @@
 
 from __future__ import annotations
 
+import asyncio
+from typing import Any
+
 from fastapi import APIRouter, Request
-from fastapi.responses import Response
-from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from fastapi.responses import JSONResponse, Response
 
 from iir import __version__
+from iir.observability.health import HealthMonitor
+from iir.observability.metrics import render_latest
 
 router = APIRouter()
 
 
 @router.get("/health")
-async def health(request: Request) -> dict:
-    bifrost_ok = await request.app.state.bifrost.health()
+async def health(request: Request) -> dict[str, Any]:
+    """Report the health monitor's last probe results; no dependency is contacted here."""
+    monitor: HealthMonitor = request.app.state.health
+    bifrost_ok = monitor.is_healthy("bifrost")
     return {
-        "status": "ok" if bifrost_ok else "degraded",
+        "status": "ok" if monitor.ready else "degraded",
         "bifrost": "connected" if bifrost_ok else "unreachable",
+        "checks": monitor.snapshot(),
     }
 
 
+@router.get("/health/live")
+async def live() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def ready(request: Request) -> JSONResponse:
+    monitor: HealthMonitor = request.app.state.health
+    return JSONResponse(
+        status_code=200 if monitor.ready else 503,
+        content={"status": "ready" if monitor.ready else "unavailable", "checks": monitor.snapshot()},
+    )
+
+
 @router.get("/version")
-async def version() -> dict:
+async def version() -> dict[str, str]:
     return {"version": __version__}
 
 
 @router.get("/metrics")
-async def metrics() -> Response:
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+async def metrics(request: Request) -> Response:
+    # Serialization (and the multiprocess file merge) runs off the event loop
+    body, content_type = await asyncio.to_thread(render_latest, request.headers.get("accept", ""))
+    return Response(body, media_type=content_type)
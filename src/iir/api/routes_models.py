@@ -2,34 +2,30 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
 
-from iir.dependencies import get_api_key, get_routing_engine
-from iir.routing.engine import RoutingEngine
+from iir.dependencies import get_api_key, get_model_catalog
+from iir.routing.catalog import ModelCatalog
 
 router = APIRouter(prefix="/v1")
 
 
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
 @router.get("/models")
 async def list_models(
+    request: Request,
     _api_key: str = Depends(get_api_key),
-    engine: RoutingEngine = Depends(get_routing_engine),
-) -> dict:
-    models = engine.registry.list_models()
-    return {
-        "object": "list",
-        "data": [
-            {
-                "id": m.id,
-                "object": "model",
-                "provider": m.provider,
-                "capabilities": m.capabilities,
-                "quality_tier": m.quality_tier,
-                "supports_vision": m.supports_vision,
-                "supports_tools": m.supports_tools,
-                "cost_per_1m_input_tokens": m.cost_per_1m_input,
-                "cost_per_1m_output_tokens": m.cost_per_1m_output,
-            }
-            for m in models
-        ],
-    }
+    catalog: ModelCatalog = Depends(get_model_catalog),
+) -> Response:
+    body, etag = catalog.render()
+    # Authenticated content: clients may keep it but must revalidate
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
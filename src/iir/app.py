@@ -2,34 +2,147 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from collections.abc import Awaitable, Callable
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator
+from typing import TYPE_CHECKING, Any, AsyncGenerator
 
 from fastapi import FastAPI
 
 from iir.api.routes_admin import router as admin_router
+from iir.api.routes_batches import router as batches_router
 from iir.api.routes_chat import router as chat_router
 from iir.api.routes_health import router as health_router
 from iir.api.routes_models import router as models_router
-from iir.auth.apikey_db import add_api_key, init_db
-from iir.bifrost_client.client import BifrostClient
+from iir.auth.apikey_db import add_api_key, check_db, init_db
+from iir.batch.manager import BatchManager
+from iir.bifrost_client.admission import AdmissionScheduler
+from iir.bifrost_client.client import BifrostClient, PoolConfig
+from iir.bifrost_client.limiter import AIMDLimit, ConcurrencyLimiter
 from iir.cache.memory_cache import MemoryCache
-from iir.cache.redis_cache import RedisCache
+from iir.cache.resilient import ResilientCache
+from iir.cache.sharded import ShardedRedisCache
 from iir.classifier.base import HybridClassifier
-from iir.classifier.llm_classifier import LLMClassifier
 from iir.classifier.rules import RulesClassifier
 from iir.config import Settings, get_settings
 from iir.middleware.body_limit import BodyLimitMiddleware
+from iir.middleware.metrics import RequestMetricsMiddleware
 from iir.middleware.request_id import RequestIDMiddleware
+from iir.observability.audit import AuditLog
+from iir.observability.health import HealthMonitor
 from iir.observability.logging import setup_logging
-from iir.observability.metrics import Metrics, get_metrics
+from iir.observability.metrics import Metrics, get_metrics, mark_worker_exit, reap_dead_workers
+from iir.routing.catalog import ModelCatalog
 from iir.routing.engine import RoutingEngine
 from iir.routing.model_registry import ModelRegistry
+from iir.usage.ledger import UsageLedger
+
+if TYPE_CHECKING:
+    from iir.cache.redis_cache import RedisOptions
+    from iir.classifier.llm_classifier import LLMClassifier
 
 logger = logging.getLogger("iir.app")
 
 
+def _init_auth(settings: Settings) -> None:
+    init_db(settings.auth_db_path)
+    if settings.api_key:
+        add_api_key(settings.auth_db_path, settings.api_key, "startup", "env auto-import")
+
+
+async def _warm_cache(settings: Settings, cache: Any, classifier: HybridClassifier, metrics: Metrics) -> None:
+    from iir.cache.warmup import load_corpus, warm_cache
+
+    source = settings.warmup_source or settings.audit_dir
+    try:
+        corpus = await asyncio.to_thread(load_corpus, source, settings.warmup_limit)
+    except OSError as exc:
+        logger.warning("Cache warm-up skipped, cannot read %s: %s", source, exc)
+        return
+    report = await warm_cache(
+        cache,
+        classifier,
+        corpus,
+        ttl=settings.classification_cache_ttl,
+        concurrency=settings.warmup_concurrency,
+        timeout=settings.warmup_timeout,
+    )
+    metrics.cache_warmup_seconds.set(report.seconds)
+    metrics.cache_warmup_hit_ratio.set(report.hit_rate)
+    logger.info("Cache warm-up from %s: %s", source, report.summary())
+
+
+def _build_cache(settings: Settings, metrics: Metrics) -> Any:
+    # Redis is imported only when it is actually used
+    from iir.cache.redis_cache import RedisCache
+
+    redis_options: RedisOptions = {
+        "max_connections": settings.redis_max_connections,
+        "pool_timeout": settings.redis_pool_timeout,
+        "client_tracking": settings.redis_client_tracking,
+        "local_max_entries": settings.redis_local_cache_size,
+        "local_ttl": settings.redis_local_cache_ttl,
+    }
+    if settings.redis_urls:
+        # Each node fails over on its own; its keys move to the next node on the ring
+        return ShardedRedisCache.from_urls(
+            settings.redis_urls,
+            redis_options,
+            replicas=settings.redis_ring_replicas,
+            timeout=settings.redis_op_timeout,
+            bulk_timeout=settings.redis_bulk_op_timeout,
+            failure_threshold=settings.redis_failure_threshold,
+            probe_interval=settings.redis_probe_interval,
+            metrics=metrics,
+        )
+
+    redis_cache = RedisCache(settings.redis_url, cluster=settings.redis_cluster, **redis_options)
+    if not settings.redis_fallback_to_memory:
+        return redis_cache
+    # Fails over to memory at runtime (or from the start) and back once Redis recovers
+    return ResilientCache(
+        redis_cache,
+        MemoryCache(),
+        timeout=settings.redis_op_timeout,
+        bulk_timeout=settings.redis_bulk_op_timeout,
+        failure_threshold=settings.redis_failure_threshold,
+        probe_interval=settings.redis_probe_interval,
+        metrics=metrics,
+    )
+
+
+def _shard_probe(shard: ResilientCache) -> Callable[[], Awaitable[bool]]:
+    async def probe() -> bool:
+        return shard.healthy
+
+    return probe
+
+
+def _build_health_monitor(settings: Settings, bifrost: BifrostClient, cache: Any, metrics: Metrics) -> HealthMonitor:
+    health = HealthMonitor(metrics)
+
+    def interval(name: str) -> float:
+        return settings.health_intervals.get(name, settings.health_interval)
+
+    async def redis_up() -> bool:
+        # The failover wrappers already probe Redis; report their state instead of adding load
+        return cache.healthy if isinstance(cache, (ResilientCache, ShardedRedisCache)) else await cache.ping()
+
+    async def auth_db_up() -> bool:
+        # Off the event loop, where auth lookups run
+        return await asyncio.to_thread(check_db, settings.auth_db_path)
+
+    health.add("bifrost", bifrost.health, interval("bifrost"), settings.health_timeout)
+    health.add("auth_db", auth_db_up, interval("auth_db"), settings.health_timeout)
+    health.add("redis", redis_up, interval("redis"), settings.health_timeout, critical=not settings.redis_fallback_to_memory)
+    if isinstance(cache, ShardedRedisCache):
+        # Informational: the ring reroutes around a down node
+        for name, shard in cache.shards.items():
+            health.add(f"redis:{name}", _shard_probe(shard), interval("redis"), settings.health_timeout, critical=False)
+    return health
+
+
 def create_app(settings_override: dict[str, Any] | None = None) -> FastAPI:
     settings = Settings(**(settings_override or {}))
     setup_logging(settings.log_level)
@@ -37,46 +150,107 @@ def create_app(settings_override: dict[str, Any] | None = None) -> FastAPI:
     @asynccontextmanager
     async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         # --- Startup ---
-        # Auth DB
-        init_db(settings.auth_db_path)
-        if settings.api_key:
-            add_api_key(settings.auth_db_path, settings.api_key, "startup", "env auto-import")
-
-        # Cache
-        cache: RedisCache | MemoryCache
-        try:
-            cache = RedisCache(settings.redis_url)
-            await cache.connect()
-            logger.info("Redis cache connected")
-        except Exception as exc:
-            if settings.redis_fallback_to_memory:
-                logger.warning("Redis unavailable (%s), using in-memory cache", exc)
-                cache = MemoryCache()
-            else:
-                raise
+        # Auth DB: SQLite setup runs in a thread while the rest of startup proceeds
+        auth_ready = asyncio.create_task(asyncio.to_thread(_init_auth, settings))
+
+        # Metrics
+        metrics = get_metrics()
+        reap_dead_workers()
+
+        cache = _build_cache(settings, metrics)
+        await cache.connect()
         app.state.cache = cache
 
-        # Bifrost client
-        bifrost = BifrostClient(settings.bifrost_url, settings.bifrost_timeout)
+        # Model registry
+        registry = ModelRegistry()
+        registry.load(
+            settings.routing_config_path,
+            settings.startup_snapshot_dir if settings.startup_snapshot_enabled else None,
+        )
+
+        # Bifrost client, behind the admission scheduler
+        scheduler: AdmissionScheduler | None = None
+        if settings.admission_enabled:
+            scheduler = AdmissionScheduler(
+                settings.admission_max_concurrency,
+                provider_limits=settings.admission_provider_limits,
+                default_provider_limit=settings.admission_default_provider_limit,
+                aging_seconds=settings.admission_aging_seconds,
+                metrics=metrics,
+            )
+        limiter: ConcurrencyLimiter | None = None
+        if settings.adaptive_concurrency_enabled:
+            limiter = ConcurrencyLimiter(
+                lambda: AIMDLimit(
+                    initial_limit=settings.adaptive_initial_limit,
+                    min_limit=settings.adaptive_min_limit,
+                    max_limit=settings.adaptive_max_limit,
+                    backoff_ratio=settings.adaptive_backoff_ratio,
+                    latency_tolerance=settings.adaptive_latency_tolerance,
+                    window=settings.adaptive_latency_window,
+                ),
+                metrics=metrics,
+            )
+        pool = PoolConfig(
+            max_connections=settings.bifrost_max_connections,
+            max_keepalive_connections=settings.bifrost_max_keepalive_connections,
+            keepalive_expiry=settings.bifrost_keepalive_expiry,
+            connect_timeout=settings.bifrost_connect_timeout,
+        )
+        providers = {m.provider for m in registry.list_models()} if settings.bifrost_pool_per_provider else set()
+        provider_pools = {
+            p: pool.with_overrides(settings.bifrost_provider_pools.get(p, {}))
+            for p in providers | set(settings.bifrost_provider_pools)
+        }
+        bifrost = BifrostClient(
+            settings.bifrost_url,
+            settings.bifrost_timeout,
+            scheduler=scheduler,
+            limiter=limiter,
+            pool=pool,
+            provider_pools=provider_pools,
+            http2=settings.bifrost_http2,
+            http2_prior_knowledge=settings.bifrost_http2_prior_knowledge,
+            metrics=metrics,
+        )
         await bifrost.start()
+        await bifrost.prewarm(settings.bifrost_prewarm_connections)
         app.state.bifrost = bifrost
 
-        # Model registry
-        registry = ModelRegistry()
-        registry.load_from_yaml(settings.routing_config_path)
+        # /v1/models, optionally merged with what Bifrost actually serves
+        model_catalog = ModelCatalog(registry, bifrost, settings.bifrost_catalog_refresh_interval)
+        await model_catalog.start()
+        app.state.model_catalog = model_catalog
+
+        # Dependency health, probed in the background once startup is done
+        health = _build_health_monitor(settings, bifrost, cache, metrics)
+        app.state.health = health
 
         # Classifier
         rules = RulesClassifier()
         llm: LLMClassifier | None = None
         if settings.classifier_strategy in ("hybrid", "llm_only"):
-            llm = LLMClassifier(settings.ollama_url, settings.classifier_model)
-        classifier = HybridClassifier(rules, llm, settings.classifier_strategy)
+            from iir.classifier.llm_classifier import LLMClassifier
 
-        # Metrics
-        metrics = get_metrics()
+            llm = LLMClassifier(
+                settings.ollama_url,
+                settings.classifier_model,
+                constrained=settings.classifier_constrained,
+                num_predict=settings.classifier_num_predict,
+            )
+        classifier = HybridClassifier(
+            rules,
+            llm,
+            settings.classifier_strategy,
+            llm_min_confidence=settings.classifier_min_confidence,
+            rules_min_margin=settings.classifier_rules_min_margin,
+            llm_available=lambda: health.is_healthy("ollama"),
+        )
+        if llm is not None:
+            health.add("ollama", llm.health, settings.health_intervals.get("ollama", settings.health_interval), settings.health_timeout, critical=False)
 
         # Routing engine
-        app.state.routing_engine = RoutingEngine(
+        engine = RoutingEngine(
             registry=registry,
             classifier=classifier,
             cache=cache,
@@ -84,25 +258,94 @@ def create_app(settings_override: dict[str, Any] | None = None) -> FastAPI:
             cache_ttl=settings.classification_cache_ttl,
             default_strategy=settings.routing_default_strategy,
             max_cost=settings.max_cost_per_request,
+            prefer_local_under_tokens=settings.prefer_local_under_tokens,
+            limiter=limiter,
+            classify_deadline=settings.classifier_deadline_ms / 1000,
+        )
+        app.state.routing_engine = engine
+
+        # Classification cache warm-up, before this worker takes traffic
+        if settings.warmup_enabled:
+            await _warm_cache(settings, cache, classifier, metrics)
+
+        # Usage ledger (needs the auth DB schema)
+        await auth_ready
+        await health.start()
+
+        usage_ledger = UsageLedger(settings.auth_db_path, registry, settings.usage_flush_interval, metrics)
+        await usage_ledger.start()
+        app.state.usage_ledger = usage_ledger
+
+        # Audit log
+        audit_log: AuditLog | None = None
+        if settings.audit_enabled:
+            audit_log = AuditLog(
+                settings.audit_dir,
+                max_queue=settings.audit_queue_size,
+                full_policy=settings.audit_full_policy,
+                max_bytes=settings.audit_max_bytes,
+                rotate_seconds=settings.audit_rotate_seconds,
+                scrub=settings.secret_scrubbing_enabled,
+                entropy_threshold=settings.secret_entropy_threshold,
+                include_messages=settings.audit_include_messages,
+                metrics=metrics,
+            )
+            await audit_log.start()
+        app.state.audit_log = audit_log
+
+        # Batch API
+        batch_manager = BatchManager(
+            settings.batch_dir,
+            engine,
+            bifrost,
+            concurrency=settings.batch_concurrency,
+            interactive_threshold=settings.batch_interactive_threshold,
+            priority=settings.batch_priority,
+            ledger=usage_ledger,
+            max_upload_bytes=settings.batch_max_upload_bytes,
         )
+        await batch_manager.start()
+        app.state.batch_manager = batch_manager
 
         logger.info("IIR v2 started — strategy=%s, bifrost=%s", settings.routing_default_strategy, settings.bifrost_url)
         yield
 
         # --- Shutdown ---
+        await batch_manager.close()
+        await health.close()
+        await model_catalog.close()
+        await usage_ledger.close()
+        if audit_log is not None:
+            await audit_log.close()
         await bifrost.close()
+        await engine.close()
+        if llm is not None:
+            await llm.close()
         await cache.close()
+        mark_worker_exit()
 
     app = FastAPI(title="Intelligent Inference Router", version="2.0.0", lifespan=lifespan)
 
     # Middleware (order matters: outermost first)
     app.add_middleware(RequestIDMiddleware)
-    app.add_middleware(BodyLimitMiddleware, max_bytes=settings.max_body_size)
+    app.add_middleware(
+        BodyLimitMiddleware,
+        max_bytes=settings.max_body_size,
+        path_limits={
+            "/v1/batches": settings.batch_max_upload_bytes,
+            # Only a header check here: the route scans the bytes and holds bodies without
+            # images to max_body_size before parsing them
+            "/v1/chat/completions": max(settings.max_body_size, settings.vision_max_body_size),
+        },
+    )
+    # Added last so it wraps everything, including 413s from the body limit
+    app.add_middleware(RequestMetricsMiddleware, exemplars=settings.metrics_exemplars)
 
     # Routes
     app.include_router(health_router)
     app.include_router(chat_router)
     app.include_router(models_router)
+    app.include_router(batches_router)
     app.include_router(admin_router)
 
     return app
@@ -1,17 +1,36 @@
-"""SQLite-backed API key storage."""
+"""SQLite-backed API key storage.
+
+Keys are never stored in plaintext: each row holds the key's first
+``KEY_PREFIX_LENGTH`` characters (indexed, used for lookups and shown to
+admins), a random salt and ``sha256(salt + key)``. A key is identified
+elsewhere (usage, budgets) by its row id.
+
+The database runs in WAL mode and each thread keeps its own connection, with
+no process-wide lock. Key lookups on the event loop therefore never wait for
+a usage flush writing from a worker thread. A write waits at most
+``BUSY_TIMEOUT_SECONDS`` for another worker's write lock.
+"""
 
 from __future__ import annotations
 
+import hashlib
+import hmac
+import os
 import sqlite3
 import threading
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
 from pathlib import Path
 from typing import Any, Generator
 
+KEY_PREFIX_LENGTH = 8
+BUSY_TIMEOUT_SECONDS = 1.0
+
 CREATE_TABLE_SQL = """
 CREATE TABLE IF NOT EXISTS api_keys (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    key TEXT UNIQUE NOT NULL,
+    key_prefix TEXT NOT NULL,
+    key_salt BLOB NOT NULL,
+    key_hash BLOB NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_used_at TIMESTAMP,
     created_ip TEXT,
@@ -19,30 +38,141 @@ CREATE TABLE IF NOT EXISTS api_keys (
     priority INTEGER DEFAULT 0,
     active BOOLEAN DEFAULT 1,
     revoked_at TIMESTAMP,
-    is_superadmin BOOLEAN DEFAULT 0
+    is_superadmin BOOLEAN DEFAULT 0,
+    budget_usd REAL
+);
+"""
+
+CREATE_PREFIX_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_api_keys_prefix ON api_keys (key_prefix)"
+
+CREATE_USAGE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS api_key_usage (
+    key TEXT NOT NULL,
+    period TEXT NOT NULL,
+    requests INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cost_usd REAL NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (key, period)
 );
 """
 
-_db_lock = threading.Lock()
+# Columns added after the first release, applied to existing plaintext-key databases
+_MIGRATIONS = {"budget_usd": "ALTER TABLE api_keys ADD COLUMN budget_usd REAL"}
+
+# Columns listed by the admin API; never the salt or hash
+_PUBLIC_COLUMNS = "id, key_prefix, created_at, last_used_at, description, priority, active, is_superadmin, budget_usd"
+_COPIED_COLUMNS = "id, created_at, last_used_at, created_ip, description, priority, active, revoked_at, is_superadmin, budget_usd"
+
+_local = threading.local()
+
+
+def hash_key(key: str, salt: bytes) -> bytes:
+    # Keys are 256-bit random tokens, so one salted SHA-256 is enough; a slow KDF would only cost latency
+    return hashlib.sha256(salt + key.encode()).digest()
+
+
+def key_prefix(key: str) -> str:
+    return key[:KEY_PREFIX_LENGTH]
+
+
+def _hash_plaintext_keys(conn: sqlite3.Connection) -> None:
+    """Rebuild a plaintext ``api_keys`` table with salted hashes.
+
+    Usage rows, which were keyed by the plaintext key, are re-keyed by key id.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(api_keys)")}
+    for column, sql in _MIGRATIONS.items():
+        if column not in columns:
+            conn.execute(sql)
+    conn.execute("ALTER TABLE api_keys RENAME TO api_keys_plaintext")
+    conn.execute(CREATE_TABLE_SQL)
+    rows = conn.execute(f"SELECT key, {_COPIED_COLUMNS} FROM api_keys_plaintext").fetchall()
+    for key, *values in rows:
+        salt = os.urandom(16)
+        conn.execute(
+            f"INSERT INTO api_keys (key_prefix, key_salt, key_hash, {_COPIED_COLUMNS}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key_prefix(key), salt, hash_key(key, salt), *values),
+        )
+    conn.execute(
+        "UPDATE api_key_usage SET key = (SELECT CAST(id AS TEXT) FROM api_keys_plaintext p WHERE p.key = api_key_usage.key) "
+        "WHERE key IN (SELECT key FROM api_keys_plaintext)"
+    )
+    conn.execute("DROP TABLE api_keys_plaintext")
 
 
 def init_db(db_path: str | Path) -> None:
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    with _db_lock, sqlite3.connect(str(db_path)) as conn:
-        conn.execute(CREATE_TABLE_SQL)
+    # sqlite3 would autocommit each ALTER/CREATE; manage the transaction ourselves so the
+    # migration applies entirely or not at all
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        # Persistent in the file; lets readers proceed while another connection writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Take the write lock before reading the schema: other workers may be initialising the same file
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(CREATE_USAGE_TABLE_SQL)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(api_keys)")}
+            if "key" in columns:
+                _hash_plaintext_keys(conn)
+            else:
+                conn.execute(CREATE_TABLE_SQL)
+            conn.execute(CREATE_PREFIX_INDEX_SQL)
+        except BaseException:
+            conn.rollback()
+            raise
         conn.commit()
+    finally:
+        conn.close()
+
+
+def _connection(db_path: str | Path) -> sqlite3.Connection:
+    connections: dict[str, sqlite3.Connection] = _local.__dict__.setdefault("connections", {})
+    conn = connections.get(str(db_path))
+    if conn is None:
+        conn = sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT_SECONDS)
+        conn.row_factory = sqlite3.Row
+        connections[str(db_path)] = conn
+    return conn
 
 
 @contextmanager
 def get_db(db_path: str | Path) -> Generator[sqlite3.Connection, None, None]:
-    with _db_lock:
-        conn = sqlite3.connect(str(db_path))
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+    """The calling thread's connection to ``db_path``; a block that raises is rolled back."""
+    conn = _connection(db_path)
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def check_db(db_path: str | Path) -> bool:
+    """Health probe on a connection of its own, so a slow probe holds up no request's connection."""
+    with closing(sqlite3.connect(str(db_path), timeout=BUSY_TIMEOUT_SECONDS)) as conn:
+        conn.execute("SELECT 1 FROM api_keys LIMIT 1").fetchall()
+    return True
+
+
+def _find_key(conn: sqlite3.Connection, key: str, active_only: bool) -> sqlite3.Row | None:
+    # The prefix index narrows the scan to (almost always) one row; the hash comparison is constant-time
+    sql = "SELECT * FROM api_keys WHERE key_prefix = ?" + (" AND active = 1" if active_only else "")
+    row: sqlite3.Row
+    for row in conn.execute(sql, (key_prefix(key),)).fetchall():
+        if hmac.compare_digest(hash_key(key, row["key_salt"]), row["key_hash"]):
+            return row
+    return None
+
+
+def _public(row: sqlite3.Row) -> dict[str, Any]:
+    data = dict(row)
+    data.pop("key_salt", None)
+    data.pop("key_hash", None)
+    return data
 
 
 def add_api_key(
@@ -52,34 +182,113 @@ def add_api_key(
     description: str | None = None,
     priority: int = 0,
     is_superadmin: bool = False,
-) -> None:
+    budget_usd: float | None = None,
+) -> int | None:
+    """Store ``key`` hashed; returns its id, or ``None`` if it is already stored."""
+    salt = os.urandom(16)
     with get_db(db_path) as conn:
-        conn.execute(
-            "INSERT OR IGNORE INTO api_keys (key, created_ip, description, priority, is_superadmin) "
-            "VALUES (?, ?, ?, ?, ?)",
-            (key, created_ip, description, priority, int(is_superadmin)),
+        if _find_key(conn, key, active_only=False) is not None:
+            return None
+        cursor = conn.execute(
+            "INSERT INTO api_keys (key_prefix, key_salt, key_hash, created_ip, description, priority, is_superadmin, budget_usd) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key_prefix(key), salt, hash_key(key, salt), created_ip, description, priority, int(is_superadmin), budget_usd),
         )
         conn.commit()
+        return cursor.lastrowid
 
 
 def get_api_key(db_path: str | Path, key: str) -> dict[str, Any] | None:
+    """The active key matching plaintext ``key``, without its salt and hash."""
+    with get_db(db_path) as conn:
+        row = _find_key(conn, key, active_only=True)
+        return _public(row) if row else None
+
+
+def find_api_keys(db_path: str | Path, prefix: str) -> list[dict[str, Any]]:
+    """Keys whose prefix starts with ``prefix``, or the key itself when a full key is given."""
     with get_db(db_path) as conn:
-        row = conn.execute(
-            "SELECT * FROM api_keys WHERE key = ? AND active = 1", (key,)
-        ).fetchone()
-        return dict(row) if row else None
+        if len(prefix) > KEY_PREFIX_LENGTH:
+            row = _find_key(conn, prefix, active_only=False)
+            return [_public(row)] if row else []
+        # A range scan keeps the prefix index usable for partial prefixes
+        rows = conn.execute(
+            f"SELECT {_PUBLIC_COLUMNS} FROM api_keys WHERE key_prefix >= ? AND key_prefix < ? ORDER BY id",
+            (prefix, prefix + "\U0010ffff"),
+        ).fetchall()
+        return [dict(row) for row in rows]
 
 
-def revoke_api_key(db_path: str | Path, key: str) -> None:
+def revoke_api_key(db_path: str | Path, key_id: int) -> None:
     with get_db(db_path) as conn:
         conn.execute(
-            "UPDATE api_keys SET active = 0, revoked_at = CURRENT_TIMESTAMP WHERE key = ?",
-            (key,),
+            "UPDATE api_keys SET active = 0, revoked_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (key_id,),
         )
         conn.commit()
 
 
-def list_api_keys(db_path: str | Path) -> list[dict[str, Any]]:
+def list_api_keys(
+    db_path: str | Path,
+    limit: int | None = None,
+    after_id: int = 0,
+    active: bool | None = None,
+    description: str | None = None,
+) -> list[dict[str, Any]]:
+    """Keys with ``id > after_id`` in id order, optionally filtered."""
+    sql = f"SELECT {_PUBLIC_COLUMNS} FROM api_keys WHERE id > ?"
+    params: list[Any] = [after_id]
+    if active is not None:
+        sql += " AND active = ?"
+        params.append(int(active))
+    if description:
+        sql += " AND description LIKE ? ESCAPE '\\'"
+        escaped = description.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%{escaped}%")
+    sql += " ORDER BY id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
     with get_db(db_path) as conn:
-        rows = conn.execute("SELECT id, key, created_at, description, priority, active, is_superadmin FROM api_keys").fetchall()
-        return [dict(row) for row in rows]
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+def set_api_key_budget(db_path: str | Path, key_id: int | str, budget_usd: float | None) -> None:
+    with get_db(db_path) as conn:
+        conn.execute("UPDATE api_keys SET budget_usd = ? WHERE id = ?", (budget_usd, int(key_id)))
+        conn.commit()
+
+
+def load_budgets(db_path: str | Path) -> dict[str, float]:
+    """Budgets by key id (as a string, the ledger's key identity)."""
+    with get_db(db_path) as conn:
+        rows = conn.execute("SELECT id, budget_usd FROM api_keys WHERE active = 1 AND budget_usd IS NOT NULL").fetchall()
+        return {str(row["id"]): row["budget_usd"] for row in rows}
+
+
+def add_usage(db_path: str | Path, rows: list[tuple[str, str, int, int, int, float]]) -> None:
+    """Add ``(key, period, requests, prompt_tokens, completion_tokens, cost_usd)`` deltas in one transaction."""
+    with get_db(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO api_key_usage (key, period, requests, prompt_tokens, completion_tokens, cost_usd) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (key, period) DO UPDATE SET "
+            "requests = requests + excluded.requests, "
+            "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+            "completion_tokens = completion_tokens + excluded.completion_tokens, "
+            "cost_usd = cost_usd + excluded.cost_usd, "
+            "updated_at = CURRENT_TIMESTAMP",
+            rows,
+        )
+        conn.commit()
+
+
+def get_usage(db_path: str | Path, period: str) -> dict[str, dict[str, Any]]:
+    """Usage by key id for ``period``, with each key's prefix."""
+    with get_db(db_path) as conn:
+        rows = conn.execute(
+            "SELECT u.key, k.key_prefix, u.requests, u.prompt_tokens, u.completion_tokens, u.cost_usd "
+            "FROM api_key_usage u LEFT JOIN api_keys k ON k.id = CAST(u.key AS INTEGER) WHERE u.period = ?",
+            (period,),
+        ).fetchall()
+        return {row["key"]: dict(row) for row in rows}
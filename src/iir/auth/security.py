@@ -23,13 +23,19 @@ def _extract_bearer_token(request: Request) -> str:
 
 
 async def api_key_auth(request: Request) -> str:
-    """FastAPI dependency that validates the API key and returns it."""
+    """FastAPI dependency that validates the API key and returns its id.
+
+    The id (as a string) identifies the key to the usage ledger; the key's
+    prefix is left on ``request.state`` for logging.
+    """
     settings = get_settings()
     key = _extract_bearer_token(request)
 
     row = get_api_key(settings.auth_db_path, key)
     if row is not None:
-        return key
+        request.state.api_key_priority = row["priority"] or 0
+        request.state.api_key_prefix = row["key_prefix"]
+        return str(row["id"])
 
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,429 @@
+"""OpenAI-style batch processing for offline workloads.
+
+Each batch lives in ``<root>/<batch_id>/``: the uploaded ``input.jsonl``, an
+``output.jsonl`` that results are appended to as items finish, and a
+``state.json`` checkpoint. The output file is the source of truth on resume:
+items whose ``custom_id`` already has a result are skipped, and a torn last
+line left by a crash is cut off before appending. A batch belongs to the API
+key that created it; lookups by any other key find nothing. Each item is
+checked against that key's budget before it is sent, and its usage is billed
+to the key as for interactive requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import IO, Any
+
+from iir.api.schemas import ChatCompletionRequest
+from iir.bifrost_client.client import BifrostClient
+from iir.bifrost_client.limiter import ProviderOverloadedError
+from iir.routing.engine import RoutingEngine
+from iir.usage.ledger import UsageLedger, parse_usage
+
+logger = logging.getLogger("iir.batch")
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+_TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+_CHECKPOINT_EVERY = 100
+_MAX_REPORTED_ERRORS = 100
+_YIELD_SLEEP_SECONDS = 0.05
+_OVERLOAD_RETRY_SECONDS = 0.5
+_MAX_OVERLOAD_RETRIES = 8  # backoff doubles up to _MAX_OVERLOAD_BACKOFF_SECONDS
+_MAX_OVERLOAD_BACKOFF_SECONDS = 10.0
+
+
+class BudgetExceededError(Exception):
+    def __init__(self, budget_usd: float) -> None:
+        super().__init__(f"Monthly budget of ${budget_usd:.2f} for this API key is spent")
+
+
+class UploadTooLargeError(Exception):
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(f"Batch input is larger than {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class BatchState:
+    id: str
+    owner: str | None = None  # API key id; never exposed through the API
+    status: str = "validating"  # validating | in_progress | cancelling | completed | failed | cancelled
+    endpoint: str = BATCH_ENDPOINT
+    strategy: str | None = None
+    created_at: int = 0
+    completed_at: int | None = None
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "object": "batch",
+            "endpoint": self.endpoint,
+            "status": self.status,
+            "created_at": self.created_at,
+            "completed_at": self.completed_at,
+            "request_counts": {"total": self.total, "completed": self.completed, "failed": self.failed},
+            "errors": self.errors or None,
+            "metadata": {"routing_strategy": self.strategy} if self.strategy else None,
+        }
+
+
+class BatchManager:
+    """Runs uploaded batches through the normal routing + Bifrost path.
+
+    Items are dispatched with bounded concurrency, and dispatch pauses while
+    more than ``interactive_threshold`` interactive requests are in flight so
+    batches only soak up idle capacity. Upstream admission uses ``priority``,
+    below any interactive key.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        engine: RoutingEngine,
+        bifrost: BifrostClient,
+        concurrency: int = 4,
+        interactive_threshold: int = 4,
+        priority: int = -2,
+        ledger: UsageLedger | None = None,
+        max_upload_bytes: int | None = None,
+    ) -> None:
+        self.root = Path(root)
+        self.engine = engine
+        self.bifrost = bifrost
+        self.concurrency = concurrency
+        self.interactive_threshold = interactive_threshold
+        self.priority = priority
+        self.ledger = ledger
+        self.max_upload_bytes = max_upload_bytes
+        self._batches: dict[str, BatchState] = {}
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._in_flight = 0
+
+    async def start(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        for state_file in sorted(self.root.glob("*/state.json")):
+            try:
+                state = BatchState(**json.loads(state_file.read_text()))
+            except (ValueError, TypeError):
+                logger.warning("Ignoring unreadable batch state %s", state_file)
+                continue
+            self._batches[state.id] = state
+            if state.status not in _TERMINAL_STATUSES:
+                logger.info("Resuming batch %s (%s)", state.id, state.status)
+                self._launch(state)
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def create(
+        self, chunks: AsyncIterator[bytes], strategy: str | None = None, owner: str | None = None
+    ) -> BatchState:
+        """Store the uploaded input and start the batch.
+
+        Raises ``UploadTooLargeError``, leaving nothing on disk, once the input passes ``max_upload_bytes``.
+        """
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch_dir = self.root / batch_id
+        batch_dir.mkdir(parents=True)
+        # Counted here as well: a chunked upload has no Content-Length for the body limit to check
+        size = 0
+        too_large = False
+        f = await asyncio.to_thread(open, batch_dir / "input.jsonl", "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if self.max_upload_bytes is not None and size > self.max_upload_bytes:
+                    too_large = True
+                    break
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        if too_large:
+            await asyncio.to_thread(shutil.rmtree, batch_dir, ignore_errors=True)
+            raise UploadTooLargeError(self.max_upload_bytes or 0)
+
+        state = BatchState(id=batch_id, owner=owner, strategy=strategy, created_at=int(time.time()))
+        self._batches[batch_id] = state
+        self._save(state)
+        self._launch(state)
+        return state
+
+    def get(self, batch_id: str, owner: str | None = None) -> BatchState | None:
+        """The batch, or None if it does not exist or ``owner`` did not create it.
+
+        ``owner=None`` skips the ownership check (internal callers only).
+        """
+        state = self._batches.get(batch_id)
+        if state is None or (owner is not None and state.owner != owner):
+            return None
+        return state
+
+    def list_batches(self, limit: int = 20, owner: str | None = None) -> list[BatchState]:
+        batches = [b for b in self._batches.values() if owner is None or b.owner == owner]
+        batches.sort(key=lambda b: b.created_at, reverse=True)
+        return batches[:limit]
+
+    def cancel(self, batch_id: str, owner: str | None = None) -> BatchState | None:
+        state = self.get(batch_id, owner)
+        if state is None:
+            return None
+        if state.status not in _TERMINAL_STATUSES:
+            state.status = "cancelling"
+            if batch_id not in self._tasks:
+                state.status = "cancelled"
+                state.completed_at = int(time.time())
+            self._save(state)
+        return state
+
+    def output_path(self, batch_id: str) -> Path:
+        return self.root / batch_id / "output.jsonl"
+
+    # --- Processing ---
+
+    def _launch(self, state: BatchState) -> None:
+        self._tasks[state.id] = asyncio.create_task(self._run(state))
+
+    async def _run(self, state: BatchState) -> None:
+        pending: set[asyncio.Task[None]] = set()
+        try:
+            if state.status == "validating":
+                if not await asyncio.to_thread(self._validate, state):
+                    state.status = "failed"
+                    state.completed_at = int(time.time())
+                    return
+                if state.status == "cancelling":  # cancelled while validating
+                    state.status = "cancelled"
+                    state.completed_at = int(time.time())
+                    return
+                state.status = "in_progress"
+                self._save(state)
+
+            done = await asyncio.to_thread(self._recover_counts, state)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            out = await asyncio.to_thread(open, self.output_path(state.id), "ab")
+            try:
+                for custom_id, body in self._iter_items(state.id):
+                    if state.status == "cancelling":
+                        break
+                    if custom_id in done:
+                        continue
+                    await semaphore.acquire()
+                    await self._yield_to_interactive()
+                    task = asyncio.create_task(self._process(state, custom_id, body, out))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    task.add_done_callback(lambda _t: semaphore.release())
+                await asyncio.gather(*pending)
+            finally:
+                await asyncio.to_thread(out.close)
+
+            state.status = "cancelled" if state.status == "cancelling" else "completed"
+            state.completed_at = int(time.time())
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        except Exception as exc:
+            logger.exception("Batch %s failed", state.id)
+            state.status = "failed"
+            state.errors.append(str(exc))
+            state.completed_at = int(time.time())
+        finally:
+            self._save(state)
+            self._tasks.pop(state.id, None)
+
+    async def _yield_to_interactive(self) -> None:
+        while self.bifrost.in_flight - self._in_flight > self.interactive_threshold:
+            await asyncio.sleep(_YIELD_SLEEP_SECONDS)
+
+    async def _process(self, state: BatchState, custom_id: str, body: dict[str, Any], out: IO[bytes]) -> None:
+        self._in_flight += 1
+        try:
+            response = await self._execute(body, state)
+            error = None
+        except BudgetExceededError as exc:
+            response = None
+            error = {"code": "budget_exceeded", "message": str(exc)}
+        except Exception as exc:  # noqa: BLE001 - any failure becomes the item's error record
+            response = None
+            error = {"code": "batch_item_error", "message": str(exc)}
+        finally:
+            self._in_flight -= 1
+
+        record = {
+            "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+            "custom_id": custom_id,
+            "response": response,
+            "error": error,
+        }
+        # One buffered write per record; BufferedWriter serialises the threads
+        await asyncio.to_thread(_append, out, (json.dumps(record) + "\n").encode())
+
+        if _succeeded(record):
+            state.completed += 1
+        else:
+            state.failed += 1
+        if (state.completed + state.failed) % _CHECKPOINT_EVERY == 0:
+            self._save(state)
+
+    async def _execute(self, body: dict[str, Any], state: BatchState) -> dict[str, Any]:
+        ledger, owner = self.ledger, state.owner
+        if ledger is not None and owner is not None and not ledger.within_budget(owner):
+            raise BudgetExceededError(ledger.budget(owner) or 0.0)
+
+        request = ChatCompletionRequest.model_validate(body)
+        messages = [m.model_dump() for m in request.messages]
+        attempt = 0
+        while True:
+            decision = await self.engine.route(
+                messages=messages,
+                strategy=state.strategy,
+                explicit_model=request.model,
+                max_tokens=request.max_tokens,
+                tools=request.tools,
+            )
+
+            payload = request.model_dump(exclude_none=True)
+            payload["model"] = decision.model
+            payload["stream"] = False
+
+            try:
+                resp = await self.bifrost.chat_completion(payload, provider=decision.provider, priority=self.priority)
+                break
+            except ProviderOverloadedError:
+                # Load shedding is not a batch item failure: back off and re-route,
+                # up to a point; after that the item fails with the overload error
+                if attempt >= _MAX_OVERLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(min(_OVERLOAD_RETRY_SECONDS * 2**attempt, _MAX_OVERLOAD_BACKOFF_SECONDS))
+                attempt += 1
+
+        if ledger is not None and owner is not None and resp.status_code < 400:
+            usage = parse_usage(resp.content, resp.headers.get("content-type", ""))
+            if usage is not None:
+                ledger.record(owner, decision.model, usage)
+        return {
+            "status_code": resp.status_code,
+            "route": {"model": decision.model, "provider": decision.provider, "category": decision.category},
+            "body": resp.json(),
+        }
+
+    # --- Files ---
+
+    def _validate(self, state: BatchState) -> bool:
+        seen: set[str] = set()
+        errors: list[str] = []
+        with open(self.root / state.id / "input.jsonl", "rb") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    errors.append(f"line {line_no}: invalid JSON")
+                    continue
+                error = _item_error(item, seen)
+                if error:
+                    errors.append(f"line {line_no}: {error}")
+                    continue
+                seen.add(item["custom_id"])
+        state.total = len(seen)
+        state.errors = errors[:_MAX_REPORTED_ERRORS]
+        if not seen and not errors:
+            state.errors = ["batch input is empty"]
+        return not state.errors
+
+    def _iter_items(self, batch_id: str) -> Iterator[tuple[str, dict[str, Any]]]:
+        with open(self.root / batch_id / "input.jsonl", "rb") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item["custom_id"], item["body"]
+
+    def _recover_counts(self, state: BatchState) -> set[str]:
+        done: set[str] = set()
+        state.completed = state.failed = 0
+        path = self.output_path(state.id)
+        if not path.exists():
+            return done
+        _truncate_torn_line(path)
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # unreadable record; the item is retried
+                done.add(record["custom_id"])
+                if _succeeded(record):
+                    state.completed += 1
+                else:
+                    state.failed += 1
+        return done
+
+    def _save(self, state: BatchState) -> None:
+        path = self.root / state.id / "state.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(asdict(state)))
+        os.replace(tmp, path)
+
+
+def _append(out: IO[bytes], data: bytes) -> None:
+    out.write(data)
+    out.flush()
+
+
+def _truncate_torn_line(path: Path) -> None:
+    """Cut ``path`` back to its last newline, dropping a partially written record."""
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end != size:
+            logger.warning("Dropping %d bytes of a torn record at the end of %s", size - end, path)
+            f.truncate(end)
+
+
+def _item_error(item: Any, seen: set[str]) -> str | None:
+    if not isinstance(item, dict):
+        return "item must be a JSON object"
+    custom_id = item.get("custom_id")
+    if not isinstance(custom_id, str) or not custom_id:
+        return "missing custom_id"
+    if custom_id in seen:
+        return f"duplicate custom_id {custom_id!r}"
+    if item.get("url", BATCH_ENDPOINT) != BATCH_ENDPOINT:
+        return f"unsupported url {item.get('url')!r}"
+    if not isinstance(item.get("body"), dict):
+        return "missing body"
+    return None
+
+
+def _succeeded(record: dict[str, Any]) -> bool:
+    response = record.get("response")
+    return record.get("error") is None and response is not None and response.get("status_code", 500) < 400
@@ -0,0 +1,150 @@
+"""Priority-aware admission control toward the upstream gateway.
+
+Requests take a global slot and a per-provider slot before they are sent to
+Bifrost. When either limit is reached they wait in a weighted fair queue: each
+API key priority level is a flow with weight ``2 ** priority``, so a priority-2
+key gets four times the share of a priority-0 key, but no level is starved.
+Waiting time additionally ages an entry forward in the queue.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from iir.observability.metrics import Metrics
+
+_MIN_PRIORITY = -4
+_MAX_PRIORITY = 8
+
+
+def priority_weight(priority: int) -> float:
+    return 2.0 ** max(_MIN_PRIORITY, min(priority, _MAX_PRIORITY))
+
+
+@dataclass(order=True)
+class _Waiter:
+    key: float
+    seq: int
+    finish_tag: float = field(compare=False)
+    provider: str = field(compare=False)
+    future: asyncio.Future[None] = field(compare=False)
+
+
+class AdmissionScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        provider_limits: dict[str, int] | None = None,
+        default_provider_limit: int | None = None,
+        aging_seconds: float = 5.0,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.provider_limits = dict(provider_limits or {})
+        self.default_provider_limit = default_provider_limit
+        self.aging_seconds = aging_seconds
+        self.metrics = metrics
+        self._in_flight = 0
+        self._provider_in_flight: dict[str, int] = {}
+        self._queues: dict[str, list[_Waiter]] = {}
+        self._waiting: dict[str, int] = {}
+        self._virtual_time = 0.0
+        self._last_finish: dict[int, float] = {}
+        self._seq = itertools.count()
+        self._epoch = time.monotonic()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def queue_depth(self, provider: str | None = None) -> int:
+        if provider is not None:
+            return self._waiting.get(provider, 0)
+        return sum(self._waiting.values())
+
+    def provider_limit(self, provider: str) -> int | None:
+        return self.provider_limits.get(provider, self.default_provider_limit)
+
+    @asynccontextmanager
+    async def slot(self, provider: str, priority: int = 0) -> AsyncIterator[None]:
+        await self.acquire(provider, priority)
+        try:
+            yield
+        finally:
+            self.release(provider)
+
+    async def acquire(self, provider: str, priority: int = 0) -> None:
+        if not self._waiting.get(provider) and self._has_capacity(provider):
+            self._admit(provider)
+            self._observe_wait(provider, 0.0)
+            return
+
+        now = time.monotonic()
+        start = max(self._virtual_time, self._last_finish.get(priority, 0.0))
+        finish = start + 1.0 / priority_weight(priority)
+        self._last_finish[priority] = finish
+        aged_key = finish + (now - self._epoch) / self.aging_seconds
+        waiter = _Waiter(aged_key, next(self._seq), finish, provider, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queues.setdefault(provider, []), waiter)
+        self._waiting[provider] = self._waiting.get(provider, 0) + 1
+        self._set_depth(provider)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted in the same tick we were cancelled: give the slot back
+                self.release(provider)
+            else:
+                waiter.future.cancel()
+                self._waiting[provider] -= 1
+                self._set_depth(provider)
+            raise
+        self._observe_wait(provider, time.monotonic() - now)
+
+    def release(self, provider: str) -> None:
+        self._in_flight -= 1
+        self._provider_in_flight[provider] -= 1
+        self._dispatch()
+
+    def _has_capacity(self, provider: str) -> bool:
+        if self._in_flight >= self.max_concurrency:
+            return False
+        limit = self.provider_limit(provider)
+        return limit is None or self._provider_in_flight.get(provider, 0) < limit
+
+    def _admit(self, provider: str) -> None:
+        self._in_flight += 1
+        self._provider_in_flight[provider] = self._provider_in_flight.get(provider, 0) + 1
+
+    def _dispatch(self) -> None:
+        while self._in_flight < self.max_concurrency:
+            best: _Waiter | None = None
+            for provider, queue in self._queues.items():
+                while queue and queue[0].future.done():
+                    heapq.heappop(queue)  # cancelled waiter
+                if queue and self._has_capacity(provider) and (best is None or queue[0] < best):
+                    best = queue[0]
+            if best is None:
+                return
+            heapq.heappop(self._queues[best.provider])
+            self._virtual_time = max(self._virtual_time, best.finish_tag)
+            self._admit(best.provider)
+            self._waiting[best.provider] -= 1
+            best.future.set_result(None)
+            self._set_depth(best.provider)
+
+    def _observe_wait(self, provider: str, seconds: float) -> None:
+        if self.metrics is not None:
+            self.metrics.admission_wait.labels(provider=provider).observe(seconds)
+
+    def _set_depth(self, provider: str) -> None:
+        if self.metrics is not None:
+            self.metrics.admission_queue_depth.labels(provider=provider).set(self.queue_depth(provider))
@@ -1,40 +1,258 @@
-"""Async HTTP client for proxying requests to Bifrost."""
+"""Async HTTP client for proxying requests to Bifrost.
+
+Chat completions are sent through a connection pool per provider (falling back
+to a shared default pool), so a burst of slow calls to one provider cannot
+exhaust the connections that fast calls to another provider need.
+
+The adaptive limit is taken after the admission scheduler lets a request
+through, so requests waiting in its queue do not count as in flight. Each
+answer feeds the limit its latency per output token, read from the usage
+block of the response.
+
+Pool gauges are bound once per pool and sampled by a background task every
+``pool_stats_interval`` seconds, not on the request path.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+import re
+import ssl
+import time
+from collections.abc import AsyncIterator
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from typing import Any, Protocol
 
+import httpcore
 import httpx
+from prometheus_client import Gauge
+
+from iir.bifrost_client.admission import AdmissionScheduler
+from iir.bifrost_client.limiter import ConcurrencyLimiter, ProviderOverloadedError
+from iir.observability.metrics import Metrics
 
 logger = logging.getLogger("iir.bifrost")
 
+DEFAULT_POOL = "default"
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_COMPLETION_TOKENS = re.compile(rb'"completion_tokens"\s*:\s*(\d+)')
+
+
+class StreamedBody(Protocol):
+    """A pre-encoded body sent in chunks; ``len()`` is its size in bytes."""
+
+    def __len__(self) -> int: ...
+
+    def __aiter__(self) -> AsyncIterator[bytes]: ...
+
+
+@dataclass(frozen=True)
+class _PoolGauges:
+    in_flight: Gauge
+    active: Gauge
+    idle: Gauge
+    utilization: Gauge
+
+    @classmethod
+    def bind(cls, metrics: Metrics, pool: str) -> _PoolGauges:
+        return cls(
+            metrics.bifrost_pool_in_flight.labels(pool=pool),
+            metrics.bifrost_pool_connections.labels(pool=pool, state="active"),
+            metrics.bifrost_pool_connections.labels(pool=pool, state="idle"),
+            metrics.bifrost_pool_utilization.labels(pool=pool),
+        )
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 10.0
+
+    def with_overrides(self, overrides: dict[str, Any]) -> PoolConfig:
+        return replace(self, **overrides)
+
 
 class BifrostClient:
-    def __init__(self, base_url: str, timeout: int = 120) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        timeout: int = 120,
+        scheduler: AdmissionScheduler | None = None,
+        limiter: ConcurrencyLimiter | None = None,
+        pool: PoolConfig | None = None,
+        provider_pools: dict[str, PoolConfig] | None = None,
+        http2: bool = False,
+        http2_prior_knowledge: bool = False,
+        metrics: Metrics | None = None,
+        pool_stats_interval: float = 1.0,
+    ) -> None:
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
-        self._client: httpx.AsyncClient | None = None
+        self.scheduler = scheduler
+        self.limiter = limiter
+        self.pool_configs = {DEFAULT_POOL: pool or PoolConfig(), **(provider_pools or {})}
+        self.http2 = http2
+        self.http2_prior_knowledge = http2_prior_knowledge
+        self.metrics = metrics
+        self.pool_stats_interval = pool_stats_interval
+        self._pools: dict[str, httpx.AsyncClient] = {}
+        self._connection_pools: dict[str, httpcore.AsyncConnectionPool] = {}
+        self._pool_in_flight: dict[str, int] = dict.fromkeys(self.pool_configs, 0)
+        self._pool_gauges = {name: _PoolGauges.bind(metrics, name) for name in self.pool_configs} if metrics else {}
+        self._stats_task: asyncio.Task[None] | None = None
+        self.in_flight = 0
 
     async def start(self) -> None:
-        self._client = httpx.AsyncClient(
-            base_url=self.base_url,
-            timeout=httpx.Timeout(self.timeout, connect=10.0),
+        # One SSL context for all pools; building it dominates client construction
+        ssl_context = httpx.create_ssl_context()
+        for name, config in self.pool_configs.items():
+            transport = self._build_transport(config, ssl_context)
+            self._pools[name] = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=transport,
+                timeout=httpx.Timeout(self.timeout, connect=config.connect_timeout),
+            )
+            pool = _connection_pool(transport)
+            if pool is not None:
+                self._connection_pools[name] = pool
+        if self.metrics is not None:
+            if len(self._connection_pools) < len(self._pools):
+                logger.warning("This httpx version hides its connection pool; pool connection metrics stay at 0")
+            self._stats_task = asyncio.create_task(self._stats_loop())
+
+    def _build_transport(self, config: PoolConfig, ssl_context: ssl.SSLContext) -> httpx.AsyncHTTPTransport:
+        return httpx.AsyncHTTPTransport(
+            verify=ssl_context,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            # HTTP/2 is negotiated via ALPN on https; prior knowledge forces h2c on plain http
+            http2=self.http2 or self.http2_prior_knowledge,
+            http1=not self.http2_prior_knowledge,
         )
 
+    async def prewarm(self, connections: int) -> None:
+        """Open up to ``connections`` connections per pool so first requests skip the handshake."""
+        if connections <= 0:
+            return
+
+        async def _touch(client: httpx.AsyncClient) -> None:
+            try:
+                await client.get("/health")
+            except httpx.HTTPError as exc:
+                logger.debug("Pre-warm request failed: %s", exc)
+
+        await asyncio.gather(*(
+            _touch(client)
+            for name, client in self._pools.items()
+            for _ in range(min(connections, self.pool_configs[name].max_keepalive_connections))
+        ))
+        self._export_pools()
+        logger.info("Pre-warmed %d Bifrost pool(s)", len(self._pools))
+
     async def close(self) -> None:
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+            await asyncio.gather(self._stats_task, return_exceptions=True)
+            self._stats_task = None
+        for client in self._pools.values():
+            await client.aclose()
+        self._pools.clear()
 
     @property
     def client(self) -> httpx.AsyncClient:
-        if self._client is None:
+        client = self._pools.get(DEFAULT_POOL)
+        if client is None:
             raise RuntimeError("BifrostClient not started. Call start() first.")
-        return self._client
+        return client
+
+    def pool_name(self, provider: str) -> str:
+        return provider if provider in self.pool_configs else DEFAULT_POOL
+
+    def pool_stats(self, name: str) -> dict[str, int]:
+        """Connection counts for a pool, read from httpcore's pool when available."""
+        stats = {"in_flight": self._pool_in_flight.get(name, 0), "active": 0, "idle": 0}
+        pool = self._connection_pools.get(name)
+        for conn in pool.connections if pool is not None else ():
+            stats["idle" if conn.is_idle() else "active"] += 1
+        return stats
+
+    async def chat_completion(
+        self,
+        payload: dict[str, Any],
+        *,
+        provider: str,
+        priority: int = 0,
+        content: bytes | StreamedBody | None = None,
+    ) -> httpx.Response:
+        """POST ``payload`` to ``provider`` (the routed model's ``ModelInfo.provider``).
+
+        ``content``, if given, is the payload's serialized form and is sent as-is.
+        """
+        async with self.scheduler.slot(provider, priority) if self.scheduler else nullcontext():
+            if self.limiter is not None and not self.limiter.try_acquire(provider):
+                raise ProviderOverloadedError(provider)
+
+            started = time.monotonic()
+            resp: httpx.Response | None = None
+            cancelled = False
+            try:
+                resp = await self._post_chat(payload, provider, content)
+                return resp
+            except asyncio.CancelledError:
+                cancelled = True  # client went away; not a signal about the provider
+                raise
+            finally:
+                if self.limiter is not None:
+                    if cancelled:
+                        self.limiter.release(provider, reached=False)
+                    elif resp is None:
+                        self.limiter.release(provider, reached=True, dropped=True)
+                    else:
+                        self.limiter.release(
+                            provider,
+                            reached=True,
+                            latency=_per_token_latency(resp.content, time.monotonic() - started),
+                            dropped=resp.status_code == 429 or resp.status_code >= 500,
+                        )
 
-    async def chat_completion(self, payload: dict[str, Any]) -> httpx.Response:
-        return await self.client.post("/v1/chat/completions", json=payload)
+    async def _post_chat(
+        self, payload: dict[str, Any], provider: str, content: bytes | StreamedBody | None = None
+    ) -> httpx.Response:
+        pool = self.pool_name(provider)
+        client = self._pools.get(pool) or self.client
+        self.in_flight += 1
+        self._pool_in_flight[pool] += 1
+        try:
+            if isinstance(content, bytes):
+                return await client.post("/v1/chat/completions", content=content, headers=_JSON_HEADERS)
+            if content is not None:
+                # An explicit length keeps httpx from switching to chunked transfer encoding
+                headers = {**_JSON_HEADERS, "Content-Length": str(len(content))}
+                return await client.post("/v1/chat/completions", content=content, headers=headers)
+            return await client.post("/v1/chat/completions", json=payload)
+        finally:
+            self.in_flight -= 1
+            self._pool_in_flight[pool] -= 1
+
+    async def _stats_loop(self) -> None:
+        while True:
+            self._export_pools()
+            await asyncio.sleep(self.pool_stats_interval)
+
+    def _export_pools(self) -> None:
+        for name, gauges in self._pool_gauges.items():
+            stats = self.pool_stats(name)
+            gauges.in_flight.set(stats["in_flight"])
+            gauges.active.set(stats["active"])
+            gauges.idle.set(stats["idle"])
+            gauges.utilization.set(stats["active"] / self.pool_configs[name].max_connections)
 
     async def list_models(self) -> httpx.Response:
         return await self.client.get("/v1/models")
@@ -45,3 +263,22 @@ class BifrostClient:
             return resp.status_code == 200
         except Exception:
             return False
+
+
+def _per_token_latency(content: bytes, elapsed: float) -> float | None:
+    """``elapsed`` per completion token, or None without a usage block.
+
+    Usage comes last in both JSON bodies and SSE streams, so the last
+    ``completion_tokens`` field is the one that counts; no full parse needed.
+    """
+    idx = content.rfind(b'"completion_tokens"')
+    match = _COMPLETION_TOKENS.match(content, idx) if idx != -1 else None
+    if match is None or int(match[1]) == 0:
+        return None
+    return elapsed / int(match[1])
+
+
+def _connection_pool(transport: httpx.AsyncHTTPTransport) -> httpcore.AsyncConnectionPool | None:
+    # httpx keeps its httpcore pool private; tests pin this down so an upgrade that moves it fails loudly
+    pool = getattr(transport, "_pool", None)
+    return pool if isinstance(pool, httpcore.AsyncConnectionPool) else None
@@ -0,0 +1,129 @@
+"""Adaptive per-provider concurrency limits.
+
+Each provider behind Bifrost gets an AIMD limit in the style of Netflix's
+concurrency-limits: the limit grows by one while the provider is well used and
+healthy, and is multiplied by ``backoff_ratio`` on an error, a 429/5xx, or a
+sustained latency shift.
+
+Latency is judged per output token, since a whole completion's duration grows
+with its length. Samples are gathered in windows. A window whose median
+exceeds ``latency_tolerance`` times the provider's baseline (a slow moving
+average of past window medians) counts as one congestion signal, so
+occasional long or slow completions do not move the limit.
+
+Requests over the limit are not queued; routing steers around saturated
+providers and the client rejects what still arrives.
+"""
+
+from __future__ import annotations
+
+import statistics
+from collections.abc import Callable
+
+from iir.observability.metrics import Metrics
+
+
+class ProviderOverloadedError(Exception):
+    def __init__(self, provider: str) -> None:
+        super().__init__(f"Provider {provider!r} is at its concurrency limit")
+        self.provider = provider
+
+
+class AIMDLimit:
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        backoff_ratio: float = 0.9,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2,
+        window: int = 20,
+    ) -> None:
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.window = window
+        self.baseline: float | None = None
+        self._samples: list[float] = []
+
+    def on_sample(self, latency: float | None, in_flight: int, dropped: bool) -> None:
+        """Record one upstream answer; ``latency`` is seconds per output token, if known."""
+        congested = dropped
+        if latency is not None:
+            self._samples.append(latency)
+            if len(self._samples) >= self.window:
+                congested = self._close_window() or congested
+
+        if congested:
+            self.limit = max(self.min_limit, int(self.limit * self.backoff_ratio))
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def _close_window(self) -> bool:
+        median = statistics.median(self._samples)
+        self._samples.clear()
+        if self.baseline is None:
+            self.baseline = median
+            return False
+        slow = median > self.baseline * self.latency_tolerance
+        # The baseline follows lasting shifts, so a provider that is simply
+        # slower now is not backed off forever
+        self.baseline += self.smoothing * (median - self.baseline)
+        return slow
+
+
+class ConcurrencyLimiter:
+    """Tracks in-flight requests and an adaptive limit per provider."""
+
+    def __init__(self, limit_factory: Callable[[], AIMDLimit] = AIMDLimit, metrics: Metrics | None = None) -> None:
+        self._factory = limit_factory
+        self._limits: dict[str, AIMDLimit] = {}
+        self._in_flight: dict[str, int] = {}
+        self.metrics = metrics
+
+    def limit(self, provider: str) -> int:
+        return self._get(provider).limit
+
+    def in_flight(self, provider: str) -> int:
+        return self._in_flight.get(provider, 0)
+
+    def has_capacity(self, provider: str) -> bool:
+        return self._in_flight.get(provider, 0) < self._get(provider).limit
+
+    def saturated(self) -> frozenset[str]:
+        return frozenset(p for p, limit in self._limits.items() if self._in_flight.get(p, 0) >= limit.limit)
+
+    def try_acquire(self, provider: str) -> bool:
+        if not self.has_capacity(provider):
+            if self.metrics is not None:
+                self.metrics.provider_rejections.labels(provider=provider).inc()
+            return False
+        self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+        self._export(provider)
+        return True
+
+    def release(self, provider: str, reached: bool, latency: float | None = None, dropped: bool = False) -> None:
+        """Release a slot; ``reached=False`` means there was no upstream answer to learn from.
+
+        ``latency`` is seconds per output token, None when the response has no usage.
+        """
+        in_flight = self._in_flight[provider]
+        self._in_flight[provider] = in_flight - 1
+        if reached:
+            self._get(provider).on_sample(latency, in_flight, dropped)
+        self._export(provider)
+
+    def _get(self, provider: str) -> AIMDLimit:
+        limit = self._limits.get(provider)
+        if limit is None:
+            limit = self._limits[provider] = self._factory()
+        return limit
+
+    def _export(self, provider: str) -> None:
+        if self.metrics is not None:
+            self.metrics.provider_concurrency_limit.labels(provider=provider).set(self._get(provider).limit)
+            self.metrics.provider_in_flight.labels(provider=provider).set(self._in_flight.get(provider, 0))
@@ -4,20 +4,101 @@ from __future__ import annotations
 
 import hashlib
 import json
-from typing import Any
+from typing import Any, Protocol
+
+try:  # optional: pip install "intelligent-inference-router[perf]"
+    import xxhash
+except ImportError:  # pragma: no cover - depends on environment
+    xxhash = None
+
+_FIELD_SEP = b"\x1f"
+_MESSAGE_SEP = b"\x1e"
+_BLOCK_SEP = b"\x1d"
+
+
+class Hasher(Protocol):
+    def update(self, data: bytes, /) -> None: ...
+
+    def hexdigest(self) -> str: ...
+
+
+def new_hasher() -> Hasher:
+    """128-bit non-cryptographic hasher (xxh3), or blake2b when xxhash is absent."""
+    if xxhash is not None:
+        hasher: Hasher = xxhash.xxh3_128()
+        return hasher
+    return hashlib.blake2b(digest_size=16)
+
+
+def fast_digest(data: bytes) -> str:
+    h = new_hasher()
+    h.update(data)
+    return h.hexdigest()
 
 
 def make_cache_key(prefix: str, data: dict[str, Any]) -> str:
     raw = json.dumps(data, sort_keys=True)
-    digest = hashlib.sha256(raw.encode()).hexdigest()
-    return f"{prefix}:{digest}"
+    return f"{prefix}:{fast_digest(raw.encode())}"
+
+
+def _hash_block(h: Hasher, block: Any) -> None:
+    kind = block.get("type") if isinstance(block, dict) else None
+    if kind == "text" and isinstance(block.get("text"), str):
+        h.update(b"text")
+        h.update(_FIELD_SEP)
+        h.update(block["text"].encode())
+    elif kind == "image_url":
+        # An image is identified by its URL (for data: URLs, the payload),
+        # which is fed to the hasher directly rather than JSON-encoded
+        image = block.get("image_url")
+        url = image.get("url") if isinstance(image, dict) else image
+        h.update(b"image_url")
+        h.update(_FIELD_SEP)
+        h.update(str(url).encode())
+    else:
+        h.update(json.dumps(block, sort_keys=True).encode())
+    h.update(_BLOCK_SEP)
+
+
+def hash_message(h: Hasher, role: str, content: Any) -> None:
+    """Fold one message into a running conversation hash."""
+    h.update(role.encode())
+    h.update(_FIELD_SEP)
+    if isinstance(content, str):
+        h.update(content.encode())
+    elif isinstance(content, list):
+        for block in content:
+            _hash_block(h, block)
+    else:
+        h.update(json.dumps(content, sort_keys=True).encode())
+    h.update(_MESSAGE_SEP)
+
+
+def conversation_cache_keys(messages: list[dict[str, Any]]) -> tuple[str | None, str]:
+    """Return ``(previous_turn_key, current_turn_key)`` for classification.
+
+    Messages are folded into one running hash; its state is snapshotted at every
+    user message, so a turn's key covers the whole conversation up to and
+    including that turn. The previous turn's key is what the prior request
+    stored, which lets follow-ups reuse its category.
+
+    The hash is incremental within a request (one pass for every turn's key)
+    but not across requests: each request re-hashes its full history. That
+    pass is linear and cheap; what carries over between turns is the cached
+    category, not hasher state.
+    """
+    h = new_hasher()
+    previous: str | None = None
+    current: str | None = None
+    for msg in messages:
+        role = msg.get("role", "")
+        hash_message(h, role, msg.get("content", ""))
+        if role == "user":
+            previous, current = current, h.hexdigest()
+    if current is None:
+        return None, f"classify:{h.hexdigest()}"
+    return (f"classify:{previous}" if previous else None), f"classify:{current}"
 
 
 def classification_cache_key(messages: list[dict[str, Any]]) -> str:
-    last_user = ""
-    for msg in reversed(messages):
-        if msg.get("role") == "user":
-            content = msg.get("content", "")
-            last_user = content if isinstance(content, str) else json.dumps(content)
-            break
-    return make_cache_key("classify", {"message": last_user})
+    return conversation_cache_keys(messages)[1]
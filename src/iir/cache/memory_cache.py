@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import time
 import threading
+from collections.abc import Mapping
 from typing import Any
 
 
@@ -28,6 +29,15 @@ class MemoryCache:
         with self._lock:
             self._store[key] = (value, expires_at)
 
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, items: Mapping[str, Any], ttl: int = 3600) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._store[key] = (value, expires_at)
+
     async def delete(self, key: str) -> None:
         with self._lock:
             self._store.pop(key, None)
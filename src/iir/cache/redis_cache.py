@@ -1,47 +1,292 @@
-"""Redis async cache with connection management."""
+"""Redis async cache with connection management.
+
+Values are stored in a compact binary form: strings (almost every value, since
+categories are bare strings) as a one-byte tag plus UTF-8, anything else as
+JSON. Untagged values written by older versions still decode as JSON.
+
+``get_many`` and ``set_many`` cover bulk paths in one round trip (``MGET``, and
+``MSET`` or a pipeline of ``SET ... EX``).
+
+With ``client_tracking``, hot keys are also served from a local LRU. A
+dedicated connection subscribes to ``__redis__:invalidate`` and a second one
+enables ``CLIENT TRACKING ... BCAST`` for the cached prefixes, redirected to
+it. Redis then pushes every write under those prefixes and the local copy is
+dropped. Reads that overlap an invalidation are not stored locally. If tracking
+cannot be enabled or the listener loses its connection, the local cache is
+cleared and bypassed.
+
+With ``cluster``, ``url`` is any node of a Redis Cluster. redis-py's
+``RedisCluster`` discovers the slot map, follows ``MOVED``/``ASK``
+redirections and refreshes the map when slots migrate. Bulk operations become
+per-slot ``MGET``/``MSET`` and a cluster pipeline. Client-side caching is not
+used in cluster mode.
+"""
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-from typing import Any
+import math
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from typing import Any, TypedDict
 
 import redis.asyncio as aioredis
 
 logger = logging.getLogger("iir.cache")
 
+_STR = b"\x01"
+_BYTES = b"\x02"
+_INVALIDATE_CHANNEL = "__redis__:invalidate"
+
+
+def encode_value(value: Any) -> bytes:
+    if isinstance(value, str):
+        return _STR + value.encode()
+    if isinstance(value, bytes):
+        return _BYTES + value
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def decode_value(raw: bytes | str | None) -> Any | None:
+    if raw is None:
+        return None
+    if isinstance(raw, str):  # a client created with decode_responses=True
+        raw = raw.encode()
+    tag = raw[:1]
+    if tag == _STR:
+        return raw[1:].decode()
+    if tag == _BYTES:
+        return raw[1:]
+    try:
+        return json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return raw.decode(errors="replace")
+
+
+class LocalCache:
+    """Bounded LRU of decoded values, invalidated by server pushes."""
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 300.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Bumped on every invalidation; a read that spans a bump is not stored
+        self.generation = 0
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any, generation: int) -> None:
+        if generation != self.generation:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str] | None) -> None:
+        """Drop ``keys``; ``None`` (a server-side flush) drops everything."""
+        self.generation += 1
+        if keys is None:
+            self._entries.clear()
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisOptions(TypedDict, total=False):
+    """Connection and local-cache keyword arguments shared by every ``RedisCache`` of a deployment."""
+
+    max_connections: int
+    pool_timeout: float
+    client_tracking: bool
+    local_max_entries: int
+    local_ttl: float
+
 
 class RedisCache:
-    def __init__(self, url: str) -> None:
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 64,
+        pool_timeout: float = 5.0,
+        client_tracking: bool = False,
+        tracking_prefixes: tuple[str, ...] = ("classify:",),
+        local_max_entries: int = 10_000,
+        local_ttl: float = 300.0,
+        client: aioredis.Redis | aioredis.RedisCluster | None = None,
+        cluster: bool = False,
+    ) -> None:
         self._url = url
-        self._client: aioredis.Redis | None = None
+        self.cluster = cluster
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        if cluster and client_tracking:
+            logger.warning("Redis client-side caching is not supported with a cluster; disabled")
+        self.client_tracking = client_tracking and not cluster
+        self.tracking_prefixes = tracking_prefixes
+        self._client: aioredis.Redis | aioredis.RedisCluster | None = client
+        self._local = LocalCache(local_max_entries, local_ttl)
+        self._tracking = False
+        self._tracker: Any = None
+        self._listener: Any = None
+        self._listen_task: asyncio.Task[None] | None = None
 
     async def connect(self) -> None:
-        self._client = aioredis.from_url(self._url, decode_responses=True)
-        await self._client.ping()
+        client = self._client
+        if client is None and self.cluster:
+            client = aioredis.RedisCluster.from_url(self._url, max_connections=self.max_connections)
+        elif client is None:
+            # Blocking pool: a burst waits up to pool_timeout for a connection instead of failing
+            pool = aioredis.BlockingConnectionPool.from_url(
+                self._url, max_connections=self.max_connections, timeout=self.pool_timeout
+            )
+            client = aioredis.Redis(connection_pool=pool)
+        self._client = client
+        await client.ping()
         logger.info("Redis connected at %s", self._url)
+        if self.client_tracking:
+            # Reconnecting after an outage: the old tracking connections are dead
+            await self._stop_tracking()
+            await self._start_tracking()
 
     async def close(self) -> None:
+        await self._stop_tracking()
         if self._client:
-            await self._client.close()
+            await self._client.aclose()
             self._client = None
 
+    async def ping(self) -> bool:
+        return bool(self._client and await self._client.ping())
+
     async def get(self, key: str) -> Any | None:
         if not self._client:
             return None
-        raw = await self._client.get(key)
-        if raw is None:
-            return None
-        try:
-            return json.loads(raw)
-        except (json.JSONDecodeError, TypeError):
-            return raw
+        if self._tracking:
+            value = self._local.get(key)
+            if value is not None:
+                return value
+        generation = self._local.generation
+        value = decode_value(await self._client.get(key))
+        if self._tracking and value is not None:
+            self._local.put(key, value, generation)
+        return value
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        if not self._client or not keys:
+            return [None] * len(keys)
+        generation = self._local.generation
+        if isinstance(self._client, aioredis.RedisCluster):
+            # Keys span slots; the non-atomic variant splits the MGET per slot
+            raw_values = await self._client.mget_nonatomic(keys)
+        else:
+            raw_values = await self._client.mget(keys)
+        values = [decode_value(raw) for raw in raw_values]
+        if self._tracking:
+            for key, value in zip(keys, values):
+                if value is not None:
+                    self._local.put(key, value, generation)
+        return values
 
     async def set(self, key: str, value: Any, ttl: int = 3600) -> None:
         if not self._client:
             return
-        await self._client.set(key, json.dumps(value), ex=ttl)
+        await self._client.set(key, encode_value(value), ex=ttl or None)
+
+    async def set_many(self, items: Mapping[str, Any], ttl: int = 3600) -> None:
+        if not self._client or not items:
+            return
+        if not ttl:
+            encoded = {key: encode_value(value) for key, value in items.items()}
+            if isinstance(self._client, aioredis.RedisCluster):
+                await self._client.mset_nonatomic(encoded)
+            else:
+                await self._client.mset(encoded)
+            return
+        # MSET cannot set expiries; a non-transactional pipeline is still one round trip
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, encode_value(value), ex=ttl)
+            await pipe.execute()
 
     async def delete(self, key: str) -> None:
         if self._client:
             await self._client.delete(key)
+
+    # --- Client-side caching ---
+
+    async def _start_tracking(self) -> None:
+        assert isinstance(self._client, aioredis.Redis)  # tracking is off in cluster mode
+        pool = self._client.connection_pool
+        try:
+            self._listener = await pool.get_connection()  # type: ignore[no-untyped-call]
+            await self._listener.send_command("CLIENT", "ID")
+            listener_id = await self._listener.read_response()
+            await self._listener.send_command("SUBSCRIBE", _INVALIDATE_CHANNEL)
+            await self._listener.read_response()
+
+            # Tracking lives as long as the connection that enabled it, so keep it out of the pool
+            self._tracker = await pool.get_connection()  # type: ignore[no-untyped-call]
+            args: list[Any] = ["CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST"]
+            for prefix in self.tracking_prefixes:
+                args += ["PREFIX", prefix]
+            await self._tracker.send_command(*args)
+            response = await self._tracker.read_response()
+            if isinstance(response, Exception):
+                raise response
+        except Exception as exc:  # noqa: BLE001 - any failure here means reading through
+            logger.warning("Redis client-side caching unavailable (%s: %s); reading through", type(exc).__name__, exc)
+            await self._stop_tracking()
+            return
+        self._tracking = True
+        self._listen_task = asyncio.create_task(self._listen())
+        logger.info("Redis client-side caching enabled for %s", ", ".join(self.tracking_prefixes))
+
+    async def _stop_tracking(self) -> None:
+        self._tracking = False
+        self._local.invalidate(None)
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            await asyncio.gather(self._listen_task, return_exceptions=True)
+            self._listen_task = None
+        for conn in (self._listener, self._tracker):
+            if conn is not None:
+                # Subscribed/tracking state must not leak back into the pool
+                await conn.disconnect()
+                if isinstance(self._client, aioredis.Redis):
+                    await self._client.connection_pool.release(conn)
+        self._listener = self._tracker = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._listener.read_response(timeout=math.inf)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001 - any stream error disables the local cache
+                logger.warning("Lost Redis invalidation stream (%s); local cache disabled", exc)
+                self._tracking = False
+                self._local.invalidate(None)
+                return
+            self.handle_invalidation(message)
+
+    def handle_invalidation(self, message: Any) -> None:
+        """Apply a ``message __redis__:invalidate <keys|nil>`` push."""
+        if not isinstance(message, list) or len(message) < 3 or message[0] not in (b"message", "message"):
+            return
+        keys = message[2]
+        self._local.invalidate(None if keys is None else [k.decode() if isinstance(k, bytes) else k for k in keys])
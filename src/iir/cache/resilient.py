@@ -0,0 +1,150 @@
+"""Redis cache with an in-memory fallback behind a circuit breaker.
+
+Every Redis call gets a hard timeout of a few milliseconds. A failed or slow
+call is answered from the fallback instead, so a cache outage costs a request
+at most ``timeout``. Bulk calls (``get_many``/``set_many``, used by the cache
+warm-up) carry hundreds of keys and get ``bulk_timeout`` instead.
+
+After ``failure_threshold`` consecutive failures the breaker opens: calls go
+straight to the fallback and a background task probes Redis every
+``probe_interval`` seconds. The first successful probe closes the
+breaker. Entries written to the fallback during the outage are then discarded,
+and Redis stays authoritative. A worker that starts while Redis is down begins
+with the breaker open.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Mapping
+from typing import Any, TypeVar
+
+from iir.cache.memory_cache import MemoryCache
+from iir.observability.metrics import Metrics
+
+logger = logging.getLogger("iir.cache")
+
+T = TypeVar("T")
+
+
+class ResilientCache:
+    def __init__(
+        self,
+        primary: Any,
+        fallback: MemoryCache | None = None,
+        timeout: float = 0.005,
+        failure_threshold: int = 3,
+        probe_interval: float = 1.0,
+        probe_timeout: float = 1.0,
+        metrics: Metrics | None = None,
+        node: str | None = None,
+        bulk_timeout: float = 0.5,
+    ) -> None:
+        self.primary = primary
+        self.fallback = fallback or MemoryCache()
+        self.timeout = timeout
+        self.bulk_timeout = bulk_timeout
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.metrics = metrics
+        self.node = node  # set when this is one node of a sharded cache
+        self._label = f"Redis node {node}" if node else "Redis"
+        self.healthy = False
+        self._failures = 0
+        self._probe_task: asyncio.Task[None] | None = None
+
+    async def connect(self) -> None:
+        try:
+            async with asyncio.timeout(self.probe_timeout):
+                await self.primary.connect()
+        except Exception as exc:  # noqa: BLE001 - start on memory whatever the cause
+            logger.warning("%s unavailable (%s), using in-memory cache until it recovers", self._label, exc)
+            self._trip()
+            return
+        self._set_healthy(True)
+
+    async def close(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+        try:
+            await self.primary.close()
+        except Exception as exc:  # noqa: BLE001 - shutting down anyway
+            logger.debug("Error closing Redis: %s", exc)
+        await self.fallback.close()
+
+    async def get(self, key: str) -> Any | None:
+        return await self._call(lambda: self.primary.get(key), lambda: self.fallback.get(key))
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        return await self._call(
+            lambda: self.primary.get_many(keys), lambda: self.fallback.get_many(keys), self.bulk_timeout
+        )
+
+    async def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+        await self._call(lambda: self.primary.set(key, value, ttl=ttl), lambda: self.fallback.set(key, value, ttl=ttl))
+
+    async def set_many(self, items: Mapping[str, Any], ttl: int = 3600) -> None:
+        await self._call(
+            lambda: self.primary.set_many(items, ttl=ttl),
+            lambda: self.fallback.set_many(items, ttl=ttl),
+            self.bulk_timeout,
+        )
+
+    async def delete(self, key: str) -> None:
+        await self._call(lambda: self.primary.delete(key), lambda: self.fallback.delete(key))
+
+    async def _call(
+        self,
+        primary: Callable[[], Awaitable[T]],
+        fallback: Callable[[], Awaitable[T]],
+        timeout: float | None = None,
+    ) -> T:
+        if not self.healthy:
+            return await fallback()
+        try:
+            async with asyncio.timeout(self.timeout if timeout is None else timeout):
+                result = await primary()
+        except Exception as exc:  # noqa: BLE001 - any Redis failure is answered from memory
+            self._failures += 1
+            logger.debug("%s call failed (%d in a row): %r", self._label, self._failures, exc)
+            if self._failures >= self.failure_threshold:
+                logger.warning("%s failing (%r); switching to in-memory cache", self._label, exc)
+                self._trip()
+            return await fallback()
+        self._failures = 0
+        return result
+
+    def _trip(self) -> None:
+        self._set_healthy(False)
+        if self.metrics is not None:
+            self.metrics.cache_failovers.inc()
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe())
+
+    def _set_healthy(self, healthy: bool) -> None:
+        self.healthy = healthy
+        self._failures = 0
+        if self.metrics is None:
+            return
+        if self.node is None:
+            self.metrics.cache_redis_up.set(1 if healthy else 0)
+        else:
+            self.metrics.cache_node_up.labels(self.node).set(1 if healthy else 0)
+
+    async def _probe(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                async with asyncio.timeout(self.probe_timeout):
+                    await self.primary.connect()
+            except Exception as exc:  # noqa: BLE001 - keep probing until Redis answers
+                logger.debug("%s still unavailable: %r", self._label, exc)
+                continue
+            await self.fallback.close()
+            self._set_healthy(True)
+            logger.info("%s recovered; leaving in-memory cache", self._label)
+            return
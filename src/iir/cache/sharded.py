@@ -0,0 +1,164 @@
+"""Classification cache spread over several Redis nodes by consistent hashing.
+
+Each node sits on a hash ring at ``replicas`` points. A key belongs to the
+first point at or after its hash, so adding or removing a node moves only
+about ``1/N`` of the keys. Every node is wrapped in a ``ResilientCache``,
+which gives it a per-call timeout, a failure counter and a background
+recovery probe. While a node is down its keys go to the next healthy node on
+the ring and are re-classified there. Once it recovers they go back to it. If
+every node is down, the owning node's in-memory fallback answers.
+
+For Redis Cluster use ``RedisCache(cluster=True)`` instead. The cluster then
+owns sharding, slot redirection and resharding.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+from collections.abc import Mapping, Sequence
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+from iir.cache.memory_cache import MemoryCache
+from iir.cache.resilient import ResilientCache
+from iir.observability.metrics import Metrics
+
+if TYPE_CHECKING:
+    from iir.cache.redis_cache import RedisOptions
+
+
+def node_name(url: str) -> str:
+    """``host:port/db`` of a Redis URL, without credentials (for logs and labels)."""
+    parts = urlsplit(url)
+    return f"{parts.hostname}:{parts.port or 6379}{parts.path if parts.path not in ('', '/') else ''}"
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring; ``preference(key)`` lists every node, owner first."""
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 160) -> None:
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        self.nodes = list(nodes)
+        points = sorted((_hash(f"{node}#{i}"), n) for n, node in enumerate(self.nodes) for i in range(replicas))
+        self._points = [point for point, _ in points]
+        # Walking clockwise from each point, every node in the order it is met
+        owners = [n for _, n in points]
+        self._preferences: list[tuple[int, ...]] = []
+        for i in range(len(owners)):
+            order: dict[int, None] = {}
+            j = i
+            while len(order) < len(self.nodes):
+                order.setdefault(owners[j % len(owners)], None)
+                j += 1
+            self._preferences.append(tuple(order))
+
+    def preference(self, key: str) -> tuple[int, ...]:
+        i = bisect.bisect_left(self._points, _hash(key))
+        return self._preferences[i % len(self._points)]
+
+    def owner(self, key: str) -> str:
+        return self.nodes[self.preference(key)[0]]
+
+
+class ShardedRedisCache:
+    def __init__(
+        self,
+        nodes: Mapping[str, Any],
+        replicas: int = 160,
+        timeout: float = 0.005,
+        failure_threshold: int = 3,
+        probe_interval: float = 1.0,
+        probe_timeout: float = 1.0,
+        metrics: Metrics | None = None,
+        bulk_timeout: float = 0.5,
+    ) -> None:
+        """``nodes`` maps a node name to its backend (a ``RedisCache``)."""
+        self.ring = HashRing(list(nodes), replicas)
+        self.shards = {
+            name: ResilientCache(
+                backend,
+                MemoryCache(),
+                timeout=timeout,
+                failure_threshold=failure_threshold,
+                probe_interval=probe_interval,
+                probe_timeout=probe_timeout,
+                metrics=metrics,
+                node=name,
+                bulk_timeout=bulk_timeout,
+            )
+            for name, backend in nodes.items()
+        }
+        self._shard_list = [self.shards[name] for name in self.ring.nodes]
+
+    @classmethod
+    def from_urls(cls, urls: Sequence[str], redis_options: RedisOptions | None = None, **kwargs: Any) -> ShardedRedisCache:
+        """One ``RedisCache(url, **redis_options)`` per URL."""
+        from iir.cache.redis_cache import RedisCache
+
+        return cls({node_name(url): RedisCache(url, **(redis_options or {})) for url in urls}, **kwargs)
+
+    @property
+    def healthy(self) -> bool:
+        return any(shard.healthy for shard in self._shard_list)
+
+    def shard_for(self, key: str) -> ResilientCache:
+        """The first healthy node in ``key``'s ring order, else its owner."""
+        preference = self.ring.preference(key)
+        for n in preference:
+            if self._shard_list[n].healthy:
+                return self._shard_list[n]
+        return self._shard_list[preference[0]]
+
+    async def connect(self) -> None:
+        await asyncio.gather(*(shard.connect() for shard in self._shard_list))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(shard.close() for shard in self._shard_list))
+
+    async def ping(self) -> bool:
+        return self.healthy
+
+    async def get(self, key: str) -> Any | None:
+        return await self.shard_for(key).get(key)
+
+    async def get_many(self, keys: list[str]) -> list[Any | None]:
+        groups = self._group(keys)
+        results = await asyncio.gather(*(shard.get_many([keys[i] for i in idx]) for shard, idx in groups))
+        values: list[Any | None] = [None] * len(keys)
+        for (_, idx), group_values in zip(groups, results):
+            for i, value in zip(idx, group_values):
+                values[i] = value
+        return values
+
+    async def set(self, key: str, value: Any, ttl: int = 3600) -> None:
+        await self.shard_for(key).set(key, value, ttl=ttl)
+
+    async def set_many(self, items: Mapping[str, Any], ttl: int = 3600) -> None:
+        keys = list(items)
+        await asyncio.gather(
+            *(shard.set_many({keys[i]: items[keys[i]] for i in idx}, ttl=ttl) for shard, idx in self._group(keys))
+        )
+
+    async def delete(self, key: str) -> None:
+        await self.shard_for(key).delete(key)
+
+    def distribution(self, keys: list[str]) -> dict[str, int]:
+        """How many of ``keys`` each node currently serves."""
+        counts = dict.fromkeys(self.shards, 0)
+        for key in keys:
+            counts[self.shard_for(key).node] += 1  # type: ignore[index]
+        return counts
+
+    def _group(self, keys: list[str]) -> list[tuple[ResilientCache, list[int]]]:
+        groups: dict[int, tuple[ResilientCache, list[int]]] = {}
+        for i, key in enumerate(keys):
+            shard = self.shard_for(key)
+            groups.setdefault(id(shard), (shard, []))[1].append(i)
+        return list(groups.values())
@@ -0,0 +1,162 @@
+"""Classification cache warm-up from historical prompts.
+
+A corpus is either an audit log directory (records written with
+``audit_include_messages``) or a JSONL file in the simulator's format. Audit
+records whose messages were scrubbed or had images elided are skipped: they
+would warm keys no live request looks up. Prompts
+are deduplicated by classification cache key, newest audit files first, up to
+``limit``. Existing entries are looked up in bulk. Each prompt not already
+cached is classified through the full classifier (rules, then LLM) by a fixed
+number of workers, and the results are written back in batches under the key
+``RoutingEngine`` looks up.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from iir.cache.keys import classification_cache_key
+from iir.classifier.base import HybridClassifier
+
+logger = logging.getLogger("iir.cache.warmup")
+
+Messages = list[dict[str, Any]]
+
+
+@dataclass
+class WarmupReport:
+    prompts: int = 0
+    already_cached: int = 0
+    classified: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    timed_out: bool = False
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of the corpus that was already cached before warm-up."""
+        return self.already_cached / self.prompts if self.prompts else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.prompts} prompts in {self.seconds:.2f}s: {self.already_cached} already cached "
+            f"(hit rate {self.hit_rate:.1%}), {self.classified} classified, {self.failed} failed"
+            + (", timed out" if self.timed_out else "")
+        )
+
+
+def _messages_of(item: Any) -> Messages | None:
+    if not isinstance(item, dict):
+        return None
+    body = item.get("body", item)
+    messages = body.get("messages") if isinstance(body, dict) else None
+    return messages if isinstance(messages, list) and messages else None
+
+
+def iter_audit_prompts(directory: str | Path) -> Iterator[Messages]:
+    """Messages from audit records, newest file first, except ``messages_altered`` ones."""
+    files = sorted(Path(directory).glob("audit-*.jsonl.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in files:
+        try:
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record.get("messages_altered"):
+                        continue
+                    messages = _messages_of(record)
+                    if messages is not None:
+                        yield messages
+        except (OSError, EOFError, ValueError) as exc:
+            # The active file of a running worker has no gzip trailer yet
+            logger.debug("Stopped reading %s: %s", path, exc)
+
+
+def iter_jsonl_prompts(path: str | Path) -> Iterator[Messages]:
+    """Messages from chat bodies or batch items, one per line."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                messages = _messages_of(json.loads(line))
+            except ValueError:
+                continue
+            if messages is not None:
+                yield messages
+
+
+def load_corpus(source: str | Path, limit: int) -> list[tuple[str, Messages]]:
+    """Up to ``limit`` distinct prompts as ``(cache_key, messages)`` pairs."""
+    prompts: Iterable[Messages] = iter_audit_prompts(source) if Path(source).is_dir() else iter_jsonl_prompts(source)
+    corpus: dict[str, Messages] = {}
+    for messages in prompts:
+        if len(corpus) >= limit:
+            break
+        corpus.setdefault(classification_cache_key(messages), messages)
+    return list(corpus.items())
+
+
+async def warm_cache(
+    cache: Any,
+    classifier: HybridClassifier,
+    corpus: list[tuple[str, Messages]],
+    ttl: int = 3600,
+    concurrency: int = 8,
+    timeout: float | None = None,
+    batch_size: int = 500,
+) -> WarmupReport:
+    report = WarmupReport(prompts=len(corpus))
+    start = time.monotonic()
+
+    # One MGET per batch finds what is already cached
+    misses: list[tuple[str, Messages]] = []
+    for i in range(0, len(corpus), batch_size):
+        batch = corpus[i : i + batch_size]
+        values = await cache.get_many([key for key, _ in batch])
+        misses.extend(item for item, value in zip(batch, values) if not value)
+    report.already_cached = len(corpus) - len(misses)
+
+    # Results are written back in batches, one pipelined round trip each
+    results: dict[str, str] = {}
+
+    async def flush() -> None:
+        if results:
+            batch = dict(results)
+            results.clear()
+            try:
+                await cache.set_many(batch, ttl=ttl)
+            except Exception as exc:  # noqa: BLE001 - a failed write only loses this batch
+                logger.warning("Could not store %d warm-up results: %s", len(batch), exc)
+
+    pending = iter(misses)
+
+    async def worker() -> None:
+        for key, messages in pending:
+            try:
+                results[key] = (await classifier.classify(messages)).value
+                report.classified += 1
+            except Exception as exc:  # noqa: BLE001 - one bad prompt must not stop the warm-up
+                report.failed += 1
+                logger.debug("Warm-up classification failed: %s", exc)
+            if len(results) >= batch_size:
+                await flush()
+
+    remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    _, unfinished = await asyncio.wait(workers, timeout=remaining)
+    if unfinished:
+        report.timed_out = True
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+    await flush()
+    report.seconds = time.monotonic() - start
+    return report
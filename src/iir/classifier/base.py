@@ -4,41 +4,105 @@ from __future__ import annotations
 
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Protocol
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
 
 from iir.classifier.categories import TaskCategory
 
 logger = logging.getLogger("iir.classifier")
 
 
+@dataclass(frozen=True)
+class Classification:
+    category: TaskCategory
+    confidence: float = 1.0  # 1.0 when the tier cannot score itself
+
+
 class Classifier(ABC):
     @abstractmethod
     async def classify(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory | None:
         ...
 
+    async def classify_with_confidence(self, messages: list[dict[str, Any]], **kwargs: Any) -> Classification | None:
+        category = await self.classify(messages, **kwargs)
+        return Classification(category) if category is not None else None
+
 
 class HybridClassifier:
     """Two-stage classifier: rules first, then LLM for ambiguous cases."""
 
-    def __init__(self, rules: Classifier, llm: Classifier | None = None, strategy: str = "hybrid") -> None:
+    def __init__(
+        self,
+        rules: Classifier,
+        llm: Classifier | None = None,
+        strategy: str = "hybrid",
+        llm_min_confidence: float = 0.0,
+        rules_min_margin: float = 0.0,
+        llm_available: Callable[[], bool] | None = None,
+    ) -> None:
         self.rules = rules
         self.llm = llm
         self.strategy = strategy
+        self.llm_min_confidence = llm_min_confidence
+        self.rules_min_margin = rules_min_margin
+        # e.g. the health monitor's view of Ollama; while false the LLM tier is skipped
+        self.llm_available = llm_available
+
+    def llm_ready(self) -> bool:
+        return self.llm is not None and (self.llm_available is None or self.llm_available())
 
     async def classify(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory:
-        if self.strategy == "llm_only" and self.llm:
-            result = await self.llm.classify(messages, **kwargs)
+        llm_ready = self.llm_ready()
+        if self.strategy == "llm_only" and llm_ready:
+            result = await self._classify_llm(messages, **kwargs)
             return result or TaskCategory.GENERAL_CHAT
 
-        result = await self.rules.classify(messages, **kwargs)
-        if result is not None:
-            logger.debug("Rules classifier matched: %s", result)
-            return result
+        rules = await self.rules.classify_with_confidence(messages, **kwargs)
+        escalate = self.strategy == "hybrid" and llm_ready
+        if rules is not None and (not escalate or rules.confidence >= self.rules_min_margin):
+            logger.debug("Rules classifier matched: %s (margin %.2f)", rules.category, rules.confidence)
+            return rules.category
 
-        if self.strategy == "hybrid" and self.llm:
-            result = await self.llm.classify(messages, **kwargs)
+        if escalate:
+            result = await self._classify_llm(messages, **kwargs)
             if result is not None:
                 logger.debug("LLM classifier matched: %s", result)
                 return result
 
-        return TaskCategory.GENERAL_CHAT
+        # A narrow rules winner still beats the generic default
+        return rules.category if rules is not None else TaskCategory.GENERAL_CHAT
+
+    async def classify_fast(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory:
+        """Best answer without the LLM tier: the rules winner, else ``GENERAL_CHAT``."""
+        rules = await self.rules.classify_with_confidence(messages, **kwargs)
+        return rules.category if rules is not None else TaskCategory.GENERAL_CHAT
+
+    async def _classify_llm(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory | None:
+        assert self.llm is not None
+        result = await self.llm.classify_with_confidence(messages, **kwargs)
+        if result is None:
+            return None
+        if result.confidence < self.llm_min_confidence:
+            logger.debug("LLM classifier unsure (%s at %.2f), using default", result.category, result.confidence)
+            return None
+        return result.category
+
+    async def classify_followup(
+        self, messages: list[dict[str, Any]], previous: TaskCategory, **kwargs: Any
+    ) -> TaskCategory:
+        """Classify a conversation turn whose previous turn was ``previous``.
+
+        Only the rules tier runs; its result replaces the previous category when
+        it is a strong signal (anything but a bare greeting, won by at least
+        ``rules_min_margin``), otherwise the conversation keeps its category and
+        the LLM tier is skipped.
+        """
+        result = await self.rules.classify_with_confidence(messages, **kwargs)
+        if (
+            result is not None
+            and result.category is not TaskCategory.SIMPLE_CHAT
+            and result.confidence >= self.rules_min_margin
+        ):
+            return result.category
+        return previous
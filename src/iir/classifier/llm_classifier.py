@@ -1,14 +1,27 @@
-"""LLM-based classifier via Ollama for ambiguous prompts."""
+"""LLM-based classifier via Ollama for ambiguous prompts.
+
+In constrained mode (the default) the model is asked for ``{"category": ...}``
+with a JSON schema whose ``category`` is an enum of the allowed labels. Output
+is capped with ``num_predict``. The response is streamed and the stream is
+closed as soon as the label is complete. When Ollama returns token logprobs,
+the confidence is the probability of the generated tokens up to the label
+(``exp`` of their summed logprobs). Schema-forced syntax tokens contribute
+~0, so in practice this is the label's probability.
+"""
 
 from __future__ import annotations
 
+import json
 import logging
+import math
+import re
 from typing import Any
 
 import httpx
 
-from iir.classifier.base import Classifier
+from iir.classifier.base import Classification, Classifier
 from iir.classifier.categories import TaskCategory
+from iir.routing.features import features_of
 
 logger = logging.getLogger("iir.classifier.llm")
 
@@ -20,36 +33,113 @@ User request: {message}
 
 Respond with ONLY the category name, nothing else."""
 
+_CONSTRAINED_PROMPT = """Classify this user request into exactly one category.
+
+Categories: general_chat, coding, analysis, creative_writing, summarization, translation, math
+
+User request: {message}
+
+Respond with JSON: {{"category": "<category>"}}"""
+
 _CATEGORY_MAP = {v.value: v for v in TaskCategory if v not in (TaskCategory.VISION, TaskCategory.FUNCTION_CALLING, TaskCategory.LONG_CONTEXT, TaskCategory.SIMPLE_CHAT)}
 
+_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {"category": {"type": "string", "enum": list(_CATEGORY_MAP)}},
+    "required": ["category"],
+}
+
+_LABEL = re.compile(r'"category"\s*:\s*"([a-z_]+)"')
+
 
 class LLMClassifier(Classifier):
-    def __init__(self, ollama_url: str, model: str = "llama3.2:1b") -> None:
+    def __init__(
+        self,
+        ollama_url: str,
+        model: str = "llama3.2:1b",
+        constrained: bool = True,
+        num_predict: int = 16,
+        timeout: float = 15.0,
+    ) -> None:
         self.ollama_url = ollama_url.rstrip("/")
         self.model = model
+        self.constrained = constrained
+        self.num_predict = num_predict
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.ollama_url, timeout=self.timeout)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def health(self) -> bool:
+        resp = await self.client.get("/api/tags")
+        return resp.status_code == 200
 
     async def classify(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory | None:
-        last_user = ""
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                content = msg.get("content", "")
-                last_user = content if isinstance(content, str) else str(content)
-                break
+        result = await self.classify_with_confidence(messages, **kwargs)
+        return result.category if result else None
 
+    async def classify_with_confidence(self, messages: list[dict[str, Any]], **kwargs: Any) -> Classification | None:
+        last_user = features_of(messages, kwargs).last_user_text
         if not last_user:
             return None
 
-        prompt = _CLASSIFICATION_PROMPT.format(message=last_user[:500])
-
         try:
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                resp = await client.post(
-                    f"{self.ollama_url}/api/generate",
-                    json={"model": self.model, "prompt": prompt, "stream": False},
-                )
-                resp.raise_for_status()
-                result = resp.json().get("response", "").strip().lower()
-                return _CATEGORY_MAP.get(result)
+            if self.constrained:
+                return await self._classify_constrained(last_user[:500])
+            return await self._classify_freeform(last_user[:500])
         except Exception:
             logger.warning("LLM classification failed, falling back", exc_info=True)
             return None
+
+    async def _classify_freeform(self, text: str) -> Classification | None:
+        resp = await self.client.post(
+            "/api/generate",
+            json={"model": self.model, "prompt": _CLASSIFICATION_PROMPT.format(message=text), "stream": False},
+        )
+        resp.raise_for_status()
+        category = _CATEGORY_MAP.get(resp.json().get("response", "").strip().lower())
+        return Classification(category) if category else None
+
+    async def _classify_constrained(self, text: str) -> Classification | None:
+        body = {
+            "model": self.model,
+            "prompt": _CONSTRAINED_PROMPT.format(message=text),
+            "stream": True,
+            "format": _OUTPUT_SCHEMA,
+            "logprobs": True,
+            "options": {"num_predict": self.num_predict, "temperature": 0},
+        }
+        generated = ""
+        logprob_sum = 0.0
+        scored = False
+        async with self.client.stream("POST", "/api/generate", json=body) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                generated += chunk.get("response", "")
+                for token in chunk.get("logprobs") or ():
+                    if "logprob" in token:
+                        logprob_sum += token["logprob"]
+                        scored = True
+                match = _LABEL.search(generated)
+                if match:
+                    # Leaving the context manager closes the stream and stops generation
+                    category = _CATEGORY_MAP.get(match.group(1))
+                    if category is None:
+                        return None
+                    return Classification(category, math.exp(logprob_sum) if scored else 1.0)
+                if chunk.get("done"):
+                    break
+        logger.debug("Constrained classification produced no label: %r", generated)
+        return None
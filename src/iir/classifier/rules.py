@@ -1,12 +1,28 @@
-"""Rules-based fast classifier. Handles ~60-70% of requests in <1ms."""
+"""Rules-based fast classifier. Handles ~60-70% of requests in <1ms.
+
+Text categories are scored, not picked by first match. Every keyword hit adds
+to its category's score, and a repeat of the same keyword adds a quarter.
+Hits near the start or end of the prompt, where the instruction usually is,
+count up to double. Hits in the middle (pasted material) count once. The share
+of code punctuation adds to ``CODING``.
+
+The winner's confidence is its margin over the runner-up,
+``(top - second) / top``, scaled by how much evidence it has for the prompt's
+length. Up to 400 characters one hit is enough. Beyond that, the score
+needed grows with length, up to five edge-weighted hits' worth. An incidental
+"bug" or "json" in a long analysis prompt then loses to the real keywords. If
+it is the only keyword, it wins with low confidence and the hybrid classifier
+escalates.
+"""
 
 from __future__ import annotations
 
 import re
 from typing import Any
 
-from iir.classifier.base import Classifier
+from iir.classifier.base import Classification, Classifier
 from iir.classifier.categories import TaskCategory
+from iir.routing.features import features_of
 
 _CODE_KEYWORDS = re.compile(
     r"\b(def |class |import |function |const |let |var |return |async |await |"
@@ -44,84 +60,100 @@ _TRANSLATE_KEYWORDS = re.compile(
     re.IGNORECASE,
 )
 
+_ANALYSIS_KEYWORDS = re.compile(
+    r"\b(analy[sz]e|analysis|compare|comparison|evaluate|assess|pros and cons|"
+    r"trade-?offs?|implications|root cause|strengths and weaknesses)",
+    re.IGNORECASE,
+)
+
 _GREETING_PATTERNS = re.compile(
     r"^(hi|hello|hey|howdy|good (morning|afternoon|evening)|what'?s up|yo|sup)\s*[!?.]?$",
     re.IGNORECASE,
 )
 
 
-def _last_user_message(messages: list[dict[str, Any]]) -> str:
-    for msg in reversed(messages):
-        if msg.get("role") == "user":
-            content = msg.get("content", "")
-            return content if isinstance(content, str) else ""
-    return ""
-
-
-def _has_images(messages: list[dict[str, Any]]) -> bool:
-    for msg in messages:
-        content = msg.get("content")
-        if isinstance(content, list):
-            for block in content:
-                if isinstance(block, dict) and block.get("type") == "image_url":
-                    return True
-    return False
-
+# Tie order matches the old first-match order
+_SCORED_PATTERNS: tuple[tuple[TaskCategory, re.Pattern[str], float], ...] = (
+    (TaskCategory.CODING, _CODE_KEYWORDS, 1.0),
+    (TaskCategory.MATH, _MATH_KEYWORDS, 1.0),
+    (TaskCategory.TRANSLATION, _TRANSLATE_KEYWORDS, 1.5),
+    (TaskCategory.SUMMARIZATION, _SUMMARIZE_KEYWORDS, 1.5),
+    (TaskCategory.CREATIVE_WRITING, _CREATIVE_KEYWORDS, 1.5),
+    (TaskCategory.ANALYSIS, _ANALYSIS_KEYWORDS, 1.0),
+)
 
-def _total_content_length(messages: list[dict[str, Any]]) -> int:
-    total = 0
-    for msg in messages:
-        content = msg.get("content", "")
-        if isinstance(content, str):
-            total += len(content)
-        elif isinstance(content, list):
-            for block in content:
-                if isinstance(block, dict) and block.get("type") == "text":
-                    total += len(block.get("text", ""))
-    return total
+_CODE_CHARS = frozenset("{}[]();=<>_*/\\|&$#")
+_CODE_CHAR_MIN_RATIO = 0.03
+_CODE_CHAR_WEIGHT = 40.0
+_CODE_FENCE_SCORE = 3.0
+_EDGE_BONUS = 1.0
+_REPEAT_WEIGHT = 0.25  # the same keyword again is weak evidence
+_EVIDENCE_CHARS = 400  # prompt length one keyword hit is enough evidence for
+_MAX_REQUIRED_EVIDENCE = 5.0
+
+
+def score_text(text: str) -> dict[TaskCategory, float]:
+    """Weighted keyword scores per category; categories without hits are omitted."""
+    scores: dict[TaskCategory, float] = {}
+    length = max(len(text), 1)
+    for category, pattern, weight in _SCORED_PATTERNS:
+        score = 0.0
+        seen: set[str] = set()
+        for match in pattern.finditer(text):
+            keyword = match.group(0).lower()
+            repeat = _REPEAT_WEIGHT if keyword in seen else 1.0
+            seen.add(keyword)
+            position = match.start() / length
+            score += weight * repeat * (1.0 + _EDGE_BONUS * abs(2 * position - 1))
+        if score:
+            scores[category] = score
+
+    code = _CODE_FENCE_SCORE if "```" in text else 0.0
+    ratio = sum(1 for c in text if c in _CODE_CHARS) / length
+    if ratio >= _CODE_CHAR_MIN_RATIO and len(text) >= 20:
+        code += ratio * _CODE_CHAR_WEIGHT
+    if code:
+        scores[TaskCategory.CODING] = scores.get(TaskCategory.CODING, 0.0) + code
+    return scores
+
+
+def _winner(scores: dict[TaskCategory, float], length: int) -> Classification | None:
+    if not scores:
+        return None
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    top_category, top = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else 0.0
+    required = min(_MAX_REQUIRED_EVIDENCE, max(1.0, length / _EVIDENCE_CHARS))
+    return Classification(top_category, (top - second) / top * min(1.0, top / required))
 
 
 class RulesClassifier(Classifier):
     async def classify(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory | None:
+        result = await self.classify_with_confidence(messages, **kwargs)
+        return result.category if result else None
+
+    async def classify_with_confidence(self, messages: list[dict[str, Any]], **kwargs: Any) -> Classification | None:
+        features = features_of(messages, kwargs)
+
         # Check for tool/function calling in the request
-        if kwargs.get("tools") or kwargs.get("functions"):
-            return TaskCategory.FUNCTION_CALLING
+        if features.has_tools:
+            return Classification(TaskCategory.FUNCTION_CALLING)
 
         # Vision: images present
-        if _has_images(messages):
-            return TaskCategory.VISION
+        if features.has_images:
+            return Classification(TaskCategory.VISION)
 
         # Long context
-        if _total_content_length(messages) > 50_000:
-            return TaskCategory.LONG_CONTEXT
+        if features.total_text_length > 50_000:
+            return Classification(TaskCategory.LONG_CONTEXT)
 
-        text = _last_user_message(messages)
+        text = features.last_user_text
         if not text:
             return None
 
         # Simple greetings
         if len(text) < 60 and _GREETING_PATTERNS.match(text.strip()):
-            return TaskCategory.SIMPLE_CHAT
-
-        # Code detection
-        if _CODE_KEYWORDS.search(text) or "```" in text:
-            return TaskCategory.CODING
-
-        # Math
-        if _MATH_KEYWORDS.search(text):
-            return TaskCategory.MATH
+            return Classification(TaskCategory.SIMPLE_CHAT)
 
-        # Translation
-        if _TRANSLATE_KEYWORDS.search(text):
-            return TaskCategory.TRANSLATION
-
-        # Summarization
-        if _SUMMARIZE_KEYWORDS.search(text):
-            return TaskCategory.SUMMARIZATION
-
-        # Creative writing
-        if _CREATIVE_KEYWORDS.search(text):
-            return TaskCategory.CREATIVE_WRITING
-
-        # No rule matched — return None so hybrid can fall through to LLM
-        return None
+        # No rule matched — None lets hybrid fall through to the LLM
+        return _winner(score_text(text), len(text))
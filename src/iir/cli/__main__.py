@@ -0,0 +1,5 @@
+import sys
+
+from iir.cli.main import main
+
+sys.exit(main())
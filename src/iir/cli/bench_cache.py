@@ -0,0 +1,218 @@
+"""Multi-node classification cache benchmark.
+
+Runs the same read-heavy workload against one Redis node and against
+``ShardedRedisCache`` over all nodes. It reports throughput, latency
+percentiles, hit rate and how keys spread over the nodes. With ``--kill-node``
+one node is stopped halfway through the sharded run, which shows failover and
+rebalancing under load. The nodes are given with ``--url``. Without it, local
+stand-ins are started: fakeredis servers (the ``test`` extra), one process
+each so they do not share an interpreter lock.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import queue
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from iir.cache.resilient import ResilientCache
+from iir.cache.sharded import ShardedRedisCache, node_name
+
+_CATEGORIES = ("coding", "math", "simple_chat", "general_chat", "analysis")
+
+
+@dataclass
+class BenchResult:
+    name: str
+    ops: int = 0
+    seconds: float = 0.0
+    hits: int = 0
+    reads: int = 0
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+    distribution: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.ops / self.seconds if self.seconds else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.reads if self.reads else 0.0
+
+    def summary(self) -> str:
+        line = (
+            f"{self.name:<10} {self.ops_per_second:>10,.0f} ops/s  p50 {self.p50_ms:6.2f} ms  "
+            f"p99 {self.p99_ms:6.2f} ms  hit rate {self.hit_rate:.1%}"
+        )
+        if self.distribution:
+            line += "\n" + "\n".join(f"           {node:<24} {count:>7} keys" for node, count in self.distribution.items())
+        return line
+
+
+# --- Stand-in nodes ---
+
+
+def _serve(ports: Any) -> None:
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_standins(count: int, timeout: float = 30.0) -> tuple[list[str], list[multiprocessing.Process]]:
+    """Start ``count`` fakeredis servers; returns their URLs and processes.
+
+    Raises ``ImportError`` without fakeredis, before any process is started, and
+    ``RuntimeError`` if the servers do not report a port within ``timeout`` seconds.
+    """
+    # The children import it too, but an ImportError there would never reach this process
+    from fakeredis import TcpFakeServer  # noqa: F401
+
+    ports: Any = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_serve, args=(ports,), daemon=True) for _ in range(count)]
+    for process in processes:
+        process.start()
+    try:
+        urls = [f"redis://127.0.0.1:{ports.get(timeout=timeout)}/0" for _ in processes]
+    except queue.Empty:
+        for process in processes:
+            process.terminate()
+        raise RuntimeError(f"Stand-in Redis nodes did not start within {timeout:.0f}s") from None
+    return urls, processes
+
+
+# --- Workload ---
+
+
+async def run_workload(
+    cache: Any,
+    name: str,
+    keys: list[str],
+    ops: int,
+    concurrency: int,
+    read_ratio: float,
+    midway: Any = None,
+) -> BenchResult:
+    """``ops`` gets and sets over ``keys``; a read miss is followed by a set, as in routing."""
+    result = BenchResult(name)
+    latencies: list[float] = []
+    rng = random.Random(0)
+    remaining = iter(range(ops))
+
+    async def worker() -> None:
+        for i in remaining:
+            if midway is not None and i == ops // 2:
+                midway()
+            key = rng.choice(keys)
+            started = time.perf_counter()
+            if rng.random() < read_ratio:
+                result.reads += 1
+                if await cache.get(key) is not None:
+                    result.hits += 1
+                else:
+                    await cache.set(key, rng.choice(_CATEGORIES))
+            else:
+                await cache.set(key, rng.choice(_CATEGORIES))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.seconds = time.perf_counter() - started
+    result.ops = len(latencies)
+    latencies.sort()
+    if latencies:
+        result.p50_ms = latencies[len(latencies) // 2] * 1000
+        result.p99_ms = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    if isinstance(cache, ShardedRedisCache):
+        result.distribution = cache.distribution(keys)
+    return result
+
+
+async def run_benchmark(
+    urls: list[str],
+    ops: int = 20_000,
+    concurrency: int = 64,
+    key_count: int = 5_000,
+    read_ratio: float = 0.9,
+    op_timeout: float = 0.25,
+    kill: Any = None,
+) -> list[BenchResult]:
+    from iir.cache.redis_cache import RedisCache
+
+    results = []
+
+    single = ResilientCache(RedisCache(urls[0]), timeout=op_timeout, failure_threshold=3, probe_interval=0.5)
+    await single.connect()
+    try:
+        keys = [f"classify:bench:single:{i}" for i in range(key_count)]
+        results.append(await run_workload(single, "single", keys, ops, concurrency, read_ratio))
+    finally:
+        await single.close()
+
+    sharded = ShardedRedisCache.from_urls(urls, timeout=op_timeout, failure_threshold=3, probe_interval=0.5)
+    await sharded.connect()
+    try:
+        keys = [f"classify:bench:sharded:{i}" for i in range(key_count)]
+        results.append(await run_workload(sharded, f"sharded/{len(urls)}", keys, ops, concurrency, read_ratio, kill))
+    finally:
+        await sharded.close()
+    return results
+
+
+def add_parser(subparsers: Any) -> None:
+    parser = subparsers.add_parser("bench-cache", help="Benchmark one Redis node against a sharded cache")
+    parser.add_argument("--url", action="append", default=[], help="Redis node (repeat); default: local stand-ins")
+    parser.add_argument("--nodes", type=int, default=3, help="stand-in nodes to start when no --url is given")
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--keys", type=int, default=5_000, help="distinct cache keys")
+    parser.add_argument("--read-ratio", type=float, default=0.9)
+    parser.add_argument("--op-timeout", type=float, default=0.25, help="per-call timeout before a node counts a failure")
+    parser.add_argument("--kill-node", action="store_true", help="stop one stand-in halfway through the sharded run")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.set_defaults(handler=_cmd_bench_cache)
+
+
+def _cmd_bench_cache(args: argparse.Namespace) -> int:
+    processes: list[multiprocessing.Process] = []
+    urls = args.url
+    if not urls:
+        try:
+            urls, processes = start_standins(args.nodes)
+        except ImportError:
+            print("Stand-in nodes need fakeredis (pip install 'intelligent-inference-router[test]') or --url", file=sys.stderr)
+            return 2
+        except RuntimeError as exc:
+            print(f"{exc}; pass --url to benchmark running Redis nodes", file=sys.stderr)
+            return 2
+    elif args.kill_node:
+        print("--kill-node only works with stand-in nodes", file=sys.stderr)
+        return 2
+
+    kill = processes[-1].terminate if args.kill_node and len(processes) > 1 else None
+    try:
+        results = asyncio.run(run_benchmark(
+            urls, args.ops, args.concurrency, args.keys, args.read_ratio, args.op_timeout, kill
+        ))
+    finally:
+        for process in processes:
+            process.terminate()
+
+    if args.json:
+        print(json.dumps([
+            {**asdict(r), "ops_per_second": r.ops_per_second, "hit_rate": r.hit_rate} for r in results
+        ], indent=2))
+    else:
+        print(f"Nodes: {', '.join(node_name(url) for url in urls)}")
+        for result in results:
+            print(result.summary())
+    return 0
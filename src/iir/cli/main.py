@@ -0,0 +1,24 @@
+"""``iir`` command-line entry point."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from iir.cli import bench_cache, simulate, startup, warmup
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="iir", description="Intelligent Inference Router tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench_cache.add_parser(subparsers)
+    simulate.add_parser(subparsers)
+    startup.add_parser(subparsers)
+    warmup.add_parser(subparsers)
+
+    args = parser.parse_args(argv)
+    return int(args.handler(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""Offline routing simulator.
+
+Replays a JSONL corpus of chat requests through ``RoutingEngine.route`` with no
+upstream calls and reports the category mix, per-strategy model mix, estimated
+spend and classification throughput. The corpus is split into byte ranges that
+worker processes read independently, so large corpora scale with cores.
+
+Each line is either a chat completion body (``{"messages": [...]}``) or a batch
+API item (``{"custom_id": ..., "body": {...}}``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from prometheus_client import CollectorRegistry
+
+from iir.cache.memory_cache import MemoryCache
+from iir.classifier.base import Classifier, HybridClassifier
+from iir.classifier.categories import TaskCategory
+from iir.classifier.rules import RulesClassifier
+from iir.config import Settings
+from iir.observability.metrics import Metrics
+from iir.routing.engine import RoutingEngine
+from iir.routing.model_registry import ModelRegistry
+
+STRATEGIES = ("cost-optimized", "quality-first", "local-only")
+
+
+class StubLLMClassifier(Classifier):
+    """Stands in for the Ollama tier: always answers ``category`` (or abstains)."""
+
+    def __init__(self, category: TaskCategory | None = None) -> None:
+        self.category = category
+
+    async def classify(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory | None:
+        return self.category
+
+
+@dataclass
+class SimulationConfig:
+    models_path: str
+    classifier_strategy: str = "hybrid"
+    strategies: tuple[str, ...] = STRATEGIES
+    llm_category: str | None = None
+    max_cost: float | None = None
+    prefer_local_under_tokens: int = 0
+    rules_min_margin: float = 0.0
+
+
+@dataclass
+class SimulationResult:
+    requests: int = 0
+    invalid: int = 0
+    categories: Counter[str] = field(default_factory=Counter)
+    models: dict[str, Counter[str]] = field(default_factory=dict)
+    cost: dict[str, float] = field(default_factory=dict)
+    classifications: int = 0
+    classify_seconds: float = 0.0
+
+    def merge(self, other: SimulationResult) -> None:
+        self.requests += other.requests
+        self.invalid += other.invalid
+        self.categories.update(other.categories)
+        for strategy, counts in other.models.items():
+            self.models.setdefault(strategy, Counter()).update(counts)
+        for strategy, cost in other.cost.items():
+            self.cost[strategy] = self.cost.get(strategy, 0.0) + cost
+        self.classifications += other.classifications
+        self.classify_seconds += other.classify_seconds
+
+
+# --- Worker side ---
+
+_worker_engine: RoutingEngine | None = None
+_worker_metrics: CollectorRegistry | None = None
+
+
+def _init_worker(config: SimulationConfig) -> None:
+    global _worker_engine, _worker_metrics
+    registry = ModelRegistry()
+    registry.load_from_yaml(config.models_path)
+    llm = StubLLMClassifier(TaskCategory(config.llm_category) if config.llm_category else None)
+    classifier = HybridClassifier(RulesClassifier(), llm, config.classifier_strategy, rules_min_margin=config.rules_min_margin)
+    _worker_metrics = CollectorRegistry()
+    _worker_engine = RoutingEngine(
+        registry=registry,
+        classifier=classifier,
+        cache=MemoryCache(),
+        metrics=Metrics(registry=_worker_metrics),
+        max_cost=config.max_cost,
+        prefer_local_under_tokens=config.prefer_local_under_tokens,
+    )
+
+
+def _iter_range(path: str, start: int, end: int) -> Any:
+    """Yield the lines whose first byte falls in ``[start, end)``."""
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line
+
+
+async def _simulate_range(path: str, start: int, end: int, strategies: tuple[str, ...]) -> SimulationResult:
+    assert _worker_engine is not None and _worker_metrics is not None
+    engine = _worker_engine
+    # Fresh cache per range: later strategies reuse the first one's classification
+    engine.cache = MemoryCache()
+    result = SimulationResult(models={s: Counter() for s in strategies}, cost={s: 0.0 for s in strategies})
+    count_before = _worker_metrics.get_sample_value("iir_classification_latency_seconds_count") or 0.0
+    sum_before = _worker_metrics.get_sample_value("iir_classification_latency_seconds_sum") or 0.0
+
+    for line in _iter_range(path, start, end):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            body = item.get("body", item)
+            messages = body["messages"]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            result.invalid += 1
+            continue
+        result.requests += 1
+        for i, strategy in enumerate(strategies):
+            decision = await engine.route(
+                messages=messages,
+                strategy=strategy,
+                explicit_model=body.get("model"),
+                max_tokens=body.get("max_tokens"),
+                tools=body.get("tools"),
+            )
+            if i == 0:
+                result.categories[decision.category] += 1
+            result.models[strategy][decision.model] += 1
+            result.cost[strategy] += decision.estimated_cost
+
+    result.classifications = int((_worker_metrics.get_sample_value("iir_classification_latency_seconds_count") or 0.0) - count_before)
+    result.classify_seconds = (_worker_metrics.get_sample_value("iir_classification_latency_seconds_sum") or 0.0) - sum_before
+    await engine.cache.close()
+    return result
+
+
+def _run_range(args: tuple[str, int, int, tuple[str, ...]]) -> SimulationResult:
+    path, start, end, strategies = args
+    return asyncio.run(_simulate_range(path, start, end, strategies))
+
+
+# --- Driver ---
+
+
+def split_ranges(path: str, parts: int) -> list[tuple[int, int]]:
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    step = max(1, -(-size // parts))
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def run_simulation(corpus: str, config: SimulationConfig, workers: int = 1, chunks_per_worker: int = 4) -> SimulationResult:
+    ranges = split_ranges(corpus, max(1, workers * chunks_per_worker))
+    tasks = [(corpus, start, end, config.strategies) for start, end in ranges]
+    total = SimulationResult(models={s: Counter() for s in config.strategies}, cost={s: 0.0 for s in config.strategies})
+
+    if workers <= 1:
+        _init_worker(config)
+        for task in tasks:
+            total.merge(_run_range(task))
+        return total
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(config,)) as pool:
+        for result in pool.imap_unordered(_run_range, tasks):
+            total.merge(result)
+    return total
+
+
+def format_report(result: SimulationResult, elapsed: float, workers: int) -> str:
+    lines = [f"Requests: {result.requests} ({result.invalid} invalid) in {elapsed:.2f}s with {workers} worker(s)"]
+    if result.classify_seconds > 0:
+        per_core = result.classifications / result.classify_seconds
+        lines.append(f"Classification throughput: {per_core:,.0f}/s per core ({result.classifications} classifications)")
+
+    lines.append("")
+    lines.append("Categories:")
+    for category, count in result.categories.most_common():
+        lines.append(f"  {category:<20} {count:>10}  {count / max(result.requests, 1):6.1%}")
+
+    for strategy, counts in result.models.items():
+        lines.append("")
+        lines.append(f"Strategy {strategy}: estimated cost ${result.cost.get(strategy, 0.0):,.4f}")
+        for model, count in counts.most_common():
+            lines.append(f"  {model:<40} {count:>10}  {count / max(result.requests, 1):6.1%}")
+    return "\n".join(lines)
+
+
+def add_parser(subparsers: Any) -> None:
+    parser = subparsers.add_parser("simulate", help="Replay a JSONL corpus through the router offline")
+    parser.add_argument("corpus", help="JSONL file of chat requests")
+    parser.add_argument("--models", help="models.yaml to load (default: routing_config_path)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help="comma-separated routing strategies")
+    parser.add_argument("--classifier", default=None, help="rules_only | llm_only | hybrid")
+    parser.add_argument("--llm-category", default=None, help="category the stub LLM tier answers (default: abstain)")
+    parser.add_argument("--max-cost", type=float, default=None)
+    parser.add_argument("--rules-min-margin", type=float, default=None, help="rules margin below which the LLM tier runs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.set_defaults(handler=_cmd_simulate)
+
+
+def _cmd_simulate(args: argparse.Namespace) -> int:
+    if not Path(args.corpus).exists():
+        print(f"Corpus not found: {args.corpus}", file=sys.stderr)
+        return 2
+    settings = Settings()
+    config = SimulationConfig(
+        models_path=args.models or settings.routing_config_path,
+        classifier_strategy=args.classifier or settings.classifier_strategy,
+        strategies=tuple(s.strip() for s in args.strategies.split(",") if s.strip()),
+        llm_category=args.llm_category,
+        max_cost=args.max_cost if args.max_cost is not None else settings.max_cost_per_request,
+        prefer_local_under_tokens=settings.prefer_local_under_tokens,
+        rules_min_margin=args.rules_min_margin if args.rules_min_margin is not None else settings.classifier_rules_min_margin,
+    )
+
+    start = time.monotonic()
+    result = run_simulation(args.corpus, config, workers=args.workers)
+    elapsed = time.monotonic() - start
+
+    if args.json:
+        print(json.dumps({
+            "requests": result.requests,
+            "invalid": result.invalid,
+            "elapsed_seconds": elapsed,
+            "classifications": result.classifications,
+            "classify_seconds": result.classify_seconds,
+            "categories": dict(result.categories),
+            "models": {s: dict(c) for s, c in result.models.items()},
+            "estimated_cost": result.cost,
+        }, indent=2))
+    else:
+        print(format_report(result, elapsed, args.workers))
+    return 0
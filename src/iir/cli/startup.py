@@ -0,0 +1,116 @@
+"""Cold-start report.
+
+Runs ``python -X importtime`` on the app module in a fresh interpreter and
+reports the slowest imports. It also times the startup steps that run in each
+worker: building the app, and loading the model registry from YAML versus
+from its snapshot.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from iir.config import Settings
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """Parse ``-X importtime`` stderr (``import time: self | cumulative | name``)."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header row
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        timings.append(ImportTiming(stripped, int(parts[0]), int(parts[1]), (len(name) - len(stripped) - 1) // 2))
+    return timings
+
+
+def profile_imports(module: str = "iir.app") -> list[ImportTiming]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def _timed(fn: Any) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def time_startup_steps(settings: Settings) -> dict[str, float]:
+    from iir.app import create_app
+    from iir.routing.model_registry import ModelRegistry
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        ModelRegistry().load(settings.routing_config_path, snapshot_dir)  # write the snapshot
+        return {
+            "create_app": _timed(create_app),
+            "registry_yaml": _timed(lambda: ModelRegistry().load_from_yaml(settings.routing_config_path)),
+            "registry_snapshot": _timed(lambda: ModelRegistry().load(settings.routing_config_path, snapshot_dir)),
+        }
+
+
+def format_report(timings: list[ImportTiming], steps: dict[str, float], top: int) -> str:
+    roots = [t for t in timings if t.depth == 0]
+    total_us = sum(t.cumulative_us for t in roots)
+    by_package: dict[str, int] = {}
+    for t in timings:
+        package = t.module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + t.self_us
+    lines = [
+        f"Import time: {total_us / 1000:.1f} ms across {len(timings)} modules",
+        "",
+        "Slowest packages (self time of all their modules):",
+    ]
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"  {self_us / 1000:8.1f} ms  {package}")
+    lines.append("")
+    lines.append("Slowest iir modules (self time):")
+    own = [t for t in timings if t.module.split(".")[0] == "iir"]
+    for t in sorted(own, key=lambda t: t.self_us, reverse=True)[:top]:
+        lines.append(f"  {t.self_us / 1000:8.1f} ms  {t.module}")
+    lines.append("")
+    lines.append("Startup steps:")
+    for name, seconds in steps.items():
+        lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+    return "\n".join(lines)
+
+
+def add_parser(subparsers: Any) -> None:
+    parser = subparsers.add_parser("startup-report", help="Profile worker cold-start time")
+    parser.add_argument("--module", default="iir.app", help="module whose import is profiled")
+    parser.add_argument("--top", type=int, default=15, help="rows per section")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.set_defaults(handler=_cmd_startup_report)
+
+
+def _cmd_startup_report(args: argparse.Namespace) -> int:
+    timings = profile_imports(args.module)
+    steps = time_startup_steps(Settings())
+    if args.json:
+        print(json.dumps({"imports": [asdict(t) for t in timings], "steps": steps}, indent=2))
+    else:
+        print(format_report(timings, steps, args.top))
+    return 0
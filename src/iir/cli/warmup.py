@@ -0,0 +1,103 @@
+"""Standalone classification cache warm-up.
+
+Classifies a corpus of recent prompts into a shared Redis, so that workers
+started afterwards find their cache already filled. Uses the same classifier
+settings as the server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+from iir.cache.warmup import WarmupReport, load_corpus, warm_cache
+from iir.classifier.base import HybridClassifier
+from iir.classifier.rules import RulesClassifier
+from iir.config import Settings
+
+
+async def _warm(args: argparse.Namespace, settings: Settings) -> WarmupReport:
+    from iir.cache.redis_cache import RedisCache, RedisOptions
+    from iir.classifier.llm_classifier import LLMClassifier
+
+    strategy = args.classifier or settings.classifier_strategy
+    llm = None
+    if strategy in ("hybrid", "llm_only"):
+        llm = LLMClassifier(
+            settings.ollama_url,
+            settings.classifier_model,
+            constrained=settings.classifier_constrained,
+            num_predict=settings.classifier_num_predict,
+        )
+    classifier = HybridClassifier(
+        RulesClassifier(),
+        llm,
+        strategy,
+        llm_min_confidence=settings.classifier_min_confidence,
+        rules_min_margin=settings.classifier_rules_min_margin,
+    )
+    redis_options: RedisOptions = {
+        "max_connections": settings.redis_max_connections,
+        "pool_timeout": settings.redis_pool_timeout,
+    }
+    cache: Any
+    if settings.redis_urls and not args.redis_url:
+        from iir.cache.sharded import ShardedRedisCache
+
+        # Bulk writes need more than the per-request timeout
+        cache = ShardedRedisCache.from_urls(
+            settings.redis_urls,
+            redis_options,
+            replicas=settings.redis_ring_replicas,
+            timeout=settings.redis_pool_timeout,
+        )
+    else:
+        cache = RedisCache(args.redis_url or settings.redis_url, cluster=settings.redis_cluster, **redis_options)
+    await cache.connect()
+    try:
+        corpus = await asyncio.to_thread(
+            load_corpus, args.source or settings.audit_dir, args.limit or settings.warmup_limit
+        )
+        return await warm_cache(
+            cache,
+            classifier,
+            corpus,
+            ttl=settings.classification_cache_ttl,
+            concurrency=args.concurrency or settings.warmup_concurrency,
+            timeout=args.timeout,
+        )
+    finally:
+        await cache.close()
+        if llm is not None:
+            await llm.close()
+
+
+def add_parser(subparsers: Any) -> None:
+    parser = subparsers.add_parser("warm-cache", help="Pre-populate the classification cache from recent prompts")
+    parser.add_argument("source", nargs="?", help="audit directory or JSONL file (default: audit_dir)")
+    parser.add_argument("--redis-url", help="Redis to fill (default: redis_url)")
+    parser.add_argument("--limit", type=int, default=None, help="distinct prompts to replay, newest first")
+    parser.add_argument("--concurrency", type=int, default=None, help="classifications in flight")
+    parser.add_argument("--classifier", default=None, help="rules_only | llm_only | hybrid")
+    parser.add_argument("--timeout", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.set_defaults(handler=_cmd_warm_cache)
+
+
+def _cmd_warm_cache(args: argparse.Namespace) -> int:
+    settings = Settings()
+    source = args.source or settings.audit_dir
+    if not Path(source).exists():
+        print(f"Corpus not found: {source}", file=sys.stderr)
+        return 2
+    report = asyncio.run(_warm(args, settings))
+    if args.json:
+        print(json.dumps({**asdict(report), "hit_rate": report.hit_rate}, indent=2))
+    else:
+        print(report.summary())
+    return 1 if report.failed and not report.classified else 0
@@ -7,7 +7,6 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
-import yaml
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -16,6 +15,8 @@ _PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
 
 def _load_yaml_defaults() -> dict[str, Any]:
+    import yaml
+
     path = _PROJECT_ROOT / "config" / "defaults.yaml"
     if path.exists():
         with open(path) as f:
@@ -34,6 +35,16 @@ class Settings(BaseSettings):
     # Bifrost gateway
     bifrost_url: str = "http://localhost:8080"
     bifrost_timeout: int = 120
+    bifrost_http2: bool = True
+    bifrost_http2_prior_knowledge: bool = False
+    bifrost_max_connections: int = 100
+    bifrost_max_keepalive_connections: int = 20
+    bifrost_keepalive_expiry: float = 30.0
+    bifrost_connect_timeout: float = 10.0
+    bifrost_pool_per_provider: bool = True
+    bifrost_provider_pools: dict[str, dict[str, float]] = Field(default_factory=dict)
+    bifrost_prewarm_connections: int = 0
+    bifrost_catalog_refresh_interval: float = 0.0  # seconds; 0 lists configured models only
 
     # Ollama (local models)
     ollama_url: str = "http://localhost:11434"
@@ -44,6 +55,18 @@ class Settings(BaseSettings):
     redis_url: str = "redis://localhost:6379/0"
     classification_cache_ttl: int = 3600
     redis_fallback_to_memory: bool = True
+    redis_max_connections: int = 64
+    redis_pool_timeout: float = 5.0
+    redis_client_tracking: bool = False
+    redis_local_cache_size: int = 10_000
+    redis_local_cache_ttl: float = 300.0
+    redis_op_timeout: float = 0.005
+    redis_bulk_op_timeout: float = 0.5
+    redis_failure_threshold: int = 3
+    redis_probe_interval: float = 1.0
+    redis_cluster: bool = False  # redis_url is a Redis Cluster node
+    redis_urls: list[str] = Field(default_factory=list)  # shard over these nodes instead of redis_url
+    redis_ring_replicas: int = 160  # hash ring points per node
 
     # Auth
     api_key: str | None = None
@@ -56,6 +79,16 @@ class Settings(BaseSettings):
 
     # Classifier
     classifier_strategy: str = "hybrid"  # rules_only | llm_only | hybrid
+    classifier_constrained: bool = True
+    classifier_num_predict: int = 16
+    classifier_min_confidence: float = 0.5
+    classifier_rules_min_margin: float = 0.3
+    classifier_deadline_ms: float = 50.0  # 0 waits for the LLM tier
+
+    # Dependency health checks
+    health_interval: float = 10.0
+    health_intervals: dict[str, float] = Field(default_factory=dict)  # per dependency: bifrost, redis, ollama, auth_db
+    health_timeout: float = 2.0
 
     # Routing
     routing_default_strategy: str = "cost-optimized"
@@ -63,8 +96,58 @@ class Settings(BaseSettings):
     max_cost_per_request: float = 0.10
     prefer_local_under_tokens: int = 2000
 
+    # Admission control toward Bifrost
+    admission_enabled: bool = True
+    admission_max_concurrency: int = 256
+    admission_provider_limits: dict[str, int] = Field(default_factory=dict)
+    admission_default_provider_limit: int | None = 64
+    admission_aging_seconds: float = 5.0
+
+    # Adaptive per-provider concurrency (AIMD)
+    adaptive_concurrency_enabled: bool = True
+    adaptive_initial_limit: int = 20
+    adaptive_min_limit: int = 1
+    adaptive_max_limit: int = 200
+    adaptive_backoff_ratio: float = 0.9
+    adaptive_latency_tolerance: float = 2.0
+    adaptive_latency_window: int = 20
+
+    # Request metrics
+    metrics_exemplars: bool = False
+
+    # Usage ledger
+    usage_flush_interval: float = 5.0
+
+    # Audit log
+    audit_enabled: bool = True
+    audit_dir: str = str(_PROJECT_ROOT / "persistent-data" / "audit")
+    audit_queue_size: int = 10_000
+    audit_full_policy: str = "drop"  # drop | block
+    audit_max_bytes: int = 67_108_864
+    audit_rotate_seconds: float = 3600.0
+    audit_include_messages: bool = False
+
+    # Classification cache warm-up
+    warmup_enabled: bool = False
+    warmup_source: str = ""  # audit directory or JSONL file; defaults to audit_dir
+    warmup_limit: int = 5000
+    warmup_concurrency: int = 8
+    warmup_timeout: float = 60.0
+
+    # Startup
+    startup_snapshot_enabled: bool = True
+    startup_snapshot_dir: str = str(_PROJECT_ROOT / "persistent-data" / "snapshots")
+
     # Body limit
     max_body_size: int = 1_048_576
+    vision_max_body_size: int = 20_971_520  # chat requests carrying images may be this large
+
+    # Batch API
+    batch_dir: str = str(_PROJECT_ROOT / "persistent-data" / "batches")
+    batch_concurrency: int = 4
+    batch_interactive_threshold: int = 4
+    batch_max_upload_bytes: int = 268_435_456
+    batch_priority: int = -2
 
     # Secret scrubbing
     secret_scrubbing_enabled: bool = True
@@ -7,8 +7,12 @@ from typing import Any
 from fastapi import Request
 
 from iir.auth.security import api_key_auth as _api_key_auth
+from iir.batch.manager import BatchManager
 from iir.bifrost_client.client import BifrostClient
+from iir.observability.audit import AuditLog
+from iir.routing.catalog import ModelCatalog
 from iir.routing.engine import RoutingEngine
+from iir.usage.ledger import UsageLedger
 
 
 async def get_api_key(request: Request) -> str:
@@ -25,3 +29,22 @@ def get_routing_engine(request: Request) -> RoutingEngine:
 
 def get_cache(request: Request) -> Any:
     return request.app.state.cache
+
+
+def get_batch_manager(request: Request) -> BatchManager:
+    manager: BatchManager = request.app.state.batch_manager
+    return manager
+
+
+def get_usage_ledger(request: Request) -> UsageLedger:
+    ledger: UsageLedger = request.app.state.usage_ledger
+    return ledger
+
+
+def get_audit_log(request: Request) -> AuditLog | None:
+    return getattr(request.app.state, "audit_log", None)
+
+
+def get_model_catalog(request: Request) -> ModelCatalog:
+    catalog: ModelCatalog = request.app.state.model_catalog
+    return catalog
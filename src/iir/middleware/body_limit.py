@@ -8,21 +8,23 @@ from starlette.responses import JSONResponse, Response
 
 
 class BodyLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: object, max_bytes: int = 1_048_576) -> None:
+    def __init__(self, app: object, max_bytes: int = 1_048_576, path_limits: dict[str, int] | None = None) -> None:
         super().__init__(app)  # type: ignore[arg-type]
         self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
 
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+        max_bytes = self.path_limits.get(request.url.path, self.max_bytes)
         content_length = request.headers.get("content-length")
         if content_length is not None:
             try:
-                if int(content_length) > self.max_bytes:
+                if int(content_length) > max_bytes:
                     return JSONResponse(
                         status_code=413,
                         content={"error": {
                             "type": "validation_error",
                             "code": "request_too_large",
-                            "message": f"Request body too large (max {self.max_bytes} bytes).",
+                            "message": f"Request body too large (max {max_bytes} bytes).",
                         }},
                     )
             except ValueError:
@@ -0,0 +1,92 @@
+"""Pure ASGI middleware recording per-route request counts and latency.
+
+Unlike ``BaseHTTPMiddleware`` this does not wrap the response in a task and
+memory stream; it only watches ``http.response.start`` for the status code.
+Labels use the matched route template (``/v1/batches/{batch_id}``), not the
+raw path, so cardinality stays bounded.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from iir.observability.metrics import Metrics, get_metrics, multiprocess_dir
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _status_class(status: int) -> str:
+    return f"{status // 100}xx"
+
+
+def _trace_id(scope: Scope) -> str | None:
+    """Trace id from a W3C ``traceparent`` header, else the request id."""
+    request_id = None
+    headers: list[tuple[bytes, bytes]] = scope.get("headers", [])
+    for name, value in headers:
+        if name == b"traceparent":
+            parts = value.decode("latin-1").split("-")
+            if len(parts) >= 2 and parts[1]:
+                return parts[1]
+        elif name == b"x-request-id":
+            request_id = value.decode("latin-1")
+    return request_id
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp, metrics: Metrics | None = None, exemplars: bool = False) -> None:
+        self.app = app
+        self._metrics = metrics
+        # prometheus_client ignores exemplars in multiprocess mode
+        self.exemplars = exemplars and not multiprocess_dir()
+        self._children: dict[tuple[str, str, str], tuple[Any, Any, Any]] = {}
+
+    @property
+    def metrics(self) -> Metrics:
+        if self._metrics is None:
+            self._metrics = get_metrics()
+        return self._metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            self._record(scope, route, status, elapsed)
+
+    def _record(self, scope: Scope, route: str, status: int, elapsed: float) -> None:
+        key = (scope["method"], route, _status_class(status))
+        children = self._children.get(key)
+        if children is None:
+            metrics = self.metrics
+            children = self._children[key] = (
+                metrics.requests_total.labels(*key),
+                metrics.request_errors_total.labels(*key),
+                metrics.request_latency.labels(key[0], route),
+            )
+        total, errors, latency = children
+        total.inc()
+        if status >= 400:
+            errors.inc()
+        trace_id = _trace_id(scope) if self.exemplars else None
+        if trace_id:
+            latency.observe(elapsed, exemplar={"trace_id": trace_id})
+        else:
+            latency.observe(elapsed)
@@ -0,0 +1,182 @@
+"""Append-only per-request audit log.
+
+The request path only puts a dict on a bounded queue. A background task
+drains it in batches and hands each batch to a thread. The thread scrubs
+free-text fields, then appends JSON lines to a gzip file. The file rotates
+once it has taken ``max_bytes`` of uncompressed data or is ``rotate_seconds``
+old. File names carry the worker pid, so workers never share a file.
+Prompts are kept only with ``include_messages``, e.g. to feed cache warm-up.
+Inline (``data:``) images in them are replaced by their size when queued, so
+queued records do not hold image data and the scrubber never scans it. A
+record whose messages were changed this way, or by the scrubber, is marked
+``messages_altered``: its prompt no longer hashes to the live cache key.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from iir.middleware.secret_scrubber import gather_env_secrets, scrub_data
+from iir.observability.metrics import Metrics
+
+logger = logging.getLogger("iir.audit")
+
+DROP = "drop"
+BLOCK = "block"
+
+# Structured fields (model ids, request ids) look high-entropy; only free text is scrubbed
+_SCRUBBED_FIELDS = ("error", "messages")
+_MAX_BATCH = 512
+
+
+def _elide_block(block: Any) -> Any:
+    if not isinstance(block, dict) or block.get("type") != "image_url":
+        return block
+    image = block.get("image_url")
+    if not isinstance(image, dict):
+        return block
+    url = image.get("url")
+    if not isinstance(url, str) or not url.startswith("data:"):
+        return block
+    header, _, data = url.partition(",")
+    return {**block, "image_url": {**image, "url": f"{header},<{len(data)} bytes elided>"}}
+
+
+def elide_images(messages: Any) -> Any:
+    """``messages`` with inline image data replaced by its length; the input is not modified."""
+    if not isinstance(messages, list):
+        return messages
+    elided = []
+    for msg in messages:
+        content = msg.get("content") if isinstance(msg, dict) else None
+        if isinstance(content, list):
+            msg = {**msg, "content": [_elide_block(block) for block in content]}
+        elided.append(msg)
+    return elided
+
+
+class AuditLog:
+    def __init__(
+        self,
+        directory: str | Path,
+        max_queue: int = 10_000,
+        full_policy: str = DROP,
+        max_bytes: int = 64 * 1024 * 1024,
+        rotate_seconds: float = 3600.0,
+        scrub: bool = True,
+        entropy_threshold: float = 4.0,
+        include_messages: bool = False,
+        metrics: Metrics | None = None,
+    ) -> None:
+        if full_policy not in (DROP, BLOCK):
+            raise ValueError(f"Unknown audit queue policy: {full_policy!r}")
+        self.directory = Path(directory)
+        self.full_policy = full_policy
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.scrub = scrub
+        self.entropy_threshold = entropy_threshold
+        self.include_messages = include_messages
+        self.metrics = metrics
+        self.dropped = 0
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(max_queue)
+        self._env_secrets: set[str] = set()
+        self._file: gzip.GzipFile | None = None
+        self._path: Path | None = None
+        self._opened_at = 0.0
+        self._written = 0
+        self._rotations = 0
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.scrub:
+            self._env_secrets = gather_env_secrets()
+        self._task = asyncio.create_task(self._drain())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self._close_file)
+
+    async def log(self, record: dict[str, Any]) -> None:
+        if not self.include_messages:
+            record.pop("messages", None)
+        elif "messages" in record:
+            elided = elide_images(record["messages"])
+            # Untouched blocks are the same objects, so this only compares what was elided
+            if elided != record["messages"]:
+                record["messages_altered"] = True
+            record["messages"] = elided
+        if self.full_policy == BLOCK:
+            await self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.metrics is not None:
+                self.metrics.audit_dropped.inc()
+
+    # --- Writer ---
+
+    async def _drain(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < _MAX_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                logger.exception("Failed to write %d audit records", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        lines = []
+        for record in batch:
+            if self.scrub:
+                for name in _SCRUBBED_FIELDS:
+                    if record.get(name) is not None:
+                        scrubbed = scrub_data(record[name], self._env_secrets, self.entropy_threshold)
+                        if name == "messages" and scrubbed != record[name]:
+                            record["messages_altered"] = True
+                        record[name] = scrubbed
+            lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        data = ("\n".join(lines) + "\n").encode()
+
+        if self._file is None or self._should_rotate():
+            self._rotate()
+        assert self._file is not None
+        self._file.write(data)
+        self._file.flush()  # sync flush: everything written so far is readable
+        self._written += len(data)
+
+    def _should_rotate(self) -> bool:
+        return self._written >= self.max_bytes or time.time() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self) -> None:
+        self._close_file()
+        self._opened_at = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(self._opened_at))
+        self._rotations += 1
+        self._path = self.directory / f"audit-{stamp}-{os.getpid()}-{self._rotations}.jsonl.gz"
+        # Stays open across batches until the next rotation
+        self._file = gzip.GzipFile(self._path, "ab")
+        self._written = 0
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,118 @@
+"""Background dependency health checks.
+
+Each dependency is probed on its own interval by a background task, and the
+latest result (up/down, probe latency, last error) is kept in memory. The
+health endpoints and the router read that state, so a probe request costs no
+upstream traffic. A check reports down when its probe returns false, raises,
+or takes longer than its timeout. Until its first probe completes, a check
+counts as up, so a slow probe does not block startup.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from iir.observability.metrics import Metrics
+
+logger = logging.getLogger("iir.health")
+
+Probe = Callable[[], Awaitable[bool]]
+
+
+@dataclass
+class CheckStatus:
+    healthy: bool = True
+    latency_ms: float | None = None
+    checked_at: float | None = None
+    error: str | None = None
+    consecutive_failures: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "status": "up" if self.healthy else "down",
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+@dataclass
+class HealthCheck:
+    name: str
+    probe: Probe
+    interval: float = 10.0
+    timeout: float = 2.0
+    critical: bool = True  # a critical check that is down makes the worker unready
+    status: CheckStatus = field(default_factory=CheckStatus)
+
+
+class HealthMonitor:
+    def __init__(self, metrics: Metrics | None = None) -> None:
+        self.metrics = metrics
+        self.checks: dict[str, HealthCheck] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def add(self, name: str, probe: Probe, interval: float = 10.0, timeout: float = 2.0, critical: bool = True) -> None:
+        self.checks[name] = HealthCheck(name, probe, interval, timeout, critical)
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run(check)) for check in self.checks.values()]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def is_healthy(self, name: str) -> bool:
+        check = self.checks.get(name)
+        return check is None or check.status.healthy
+
+    @property
+    def ready(self) -> bool:
+        return all(check.status.healthy for check in self.checks.values() if check.critical)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        return {name: {**check.status.to_dict(), "critical": check.critical} for name, check in self.checks.items()}
+
+    async def check_now(self, name: str) -> CheckStatus:
+        check = self.checks[name]
+        await self._probe(check)
+        return check.status
+
+    async def _run(self, check: HealthCheck) -> None:
+        while True:
+            await self._probe(check)
+            await asyncio.sleep(check.interval)
+
+    async def _probe(self, check: HealthCheck) -> None:
+        started = time.perf_counter()
+        error: str | None = None
+        try:
+            async with asyncio.timeout(check.timeout):
+                healthy = bool(await check.probe())
+            if not healthy:
+                error = "probe reported unhealthy"
+        except TimeoutError:
+            healthy, error = False, f"timed out after {check.timeout}s"
+        except Exception as exc:  # noqa: BLE001 - a crashing probe marks the dependency down
+            healthy, error = False, str(exc) or type(exc).__name__
+        elapsed = time.perf_counter() - started
+
+        status = check.status
+        if healthy != status.healthy:
+            log = logger.info if healthy else logger.warning
+            log("Dependency %s is %s%s", check.name, "up" if healthy else "down", f": {error}" if error else "")
+        status.healthy = healthy
+        status.latency_ms = round(elapsed * 1000, 3)
+        status.checked_at = time.time()
+        status.error = error
+        status.consecutive_failures = 0 if healthy else status.consecutive_failures + 1
+        if self.metrics is not None:
+            self.metrics.dependency_up.labels(check.name).set(1 if healthy else 0)
+            self.metrics.dependency_probe_latency.labels(check.name).set(elapsed)
@@ -1,35 +1,136 @@
-"""Prometheus metrics registration and middleware."""
+"""Prometheus metrics registration and middleware.
+
+Multi-worker deployments set ``PROMETHEUS_MULTIPROC_DIR`` in the environment
+before the server starts (prometheus_client picks its value backend at import
+time). Each worker then writes its samples to mmap files in that directory and
+``/metrics`` aggregates all of them, including workers that have since exited.
+"""
 
 from __future__ import annotations
 
-from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Generic, TypeVar, cast
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.openmetrics import exposition as openmetrics
+
+from iir.classifier.categories import TaskCategory
+
+logger = logging.getLogger("iir.metrics")
+
+_LIVE_GAUGE_FILE = re.compile(r"^gauge_live\w+?_(\d+)\.db$")
+_TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 131072, 262144, float("inf"))
 
 
 def _safe_counter(name: str, desc: str, registry: CollectorRegistry, labelnames: tuple[str, ...] = ()) -> Counter:
     try:
         return Counter(name, desc, labelnames=labelnames, registry=registry)
     except ValueError:
-        return registry._names_to_collectors.get(name + "_total") or registry._names_to_collectors[name]
+        existing = registry._names_to_collectors.get(name + "_total") or registry._names_to_collectors[name]
+        return cast(Counter, existing)
 
 
-def _safe_histogram(name: str, desc: str, registry: CollectorRegistry, labelnames: tuple[str, ...] = ()) -> Histogram:
+def _safe_histogram(
+    name: str,
+    desc: str,
+    registry: CollectorRegistry,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = Histogram.DEFAULT_BUCKETS,
+) -> Histogram:
     try:
-        return Histogram(name, desc, labelnames=labelnames, registry=registry)
+        return Histogram(name, desc, labelnames=labelnames, registry=registry, buckets=buckets)
     except ValueError:
-        return registry._names_to_collectors[name]
+        return cast(Histogram, registry._names_to_collectors[name])
+
+
+def _safe_gauge(
+    name: str,
+    desc: str,
+    registry: CollectorRegistry,
+    labelnames: tuple[str, ...] = (),
+    multiprocess_mode: str = "livesum",
+) -> Gauge:
+    try:
+        return Gauge(name, desc, labelnames=labelnames, registry=registry, multiprocess_mode=multiprocess_mode)  # type: ignore[arg-type]
+    except ValueError:
+        return cast(Gauge, registry._names_to_collectors[name])
+
+
+M = TypeVar("M", Counter, Gauge, Histogram)
+
+
+class LabelCache(Generic[M]):
+    """Pre-bound label children for a metric.
+
+    ``metric.labels(...)`` validates, locks and looks up on every call; after
+    the first use of a label set this is a single dict lookup.
+    """
+
+    def __init__(self, metric: M, prebind: tuple[tuple[str, ...], ...] = ()) -> None:
+        self._metric: M = metric
+        self._children: dict[tuple[str, ...], M] = {}
+        for values in prebind:
+            self.get(*values)
+
+    def get(self, *values: str) -> M:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._metric.labels(*values)
+        return child
 
 
 class Metrics:
     def __init__(self, registry: CollectorRegistry | None = None) -> None:
         reg = registry or REGISTRY
-        self.requests_total = _safe_counter("iir_requests_total", "Total requests", reg)
-        self.request_errors_total = _safe_counter("iir_request_errors_total", "Total error responses", reg)
-        self.request_latency = _safe_histogram("iir_request_latency_seconds", "Request latency", reg)
+        self.requests_total = _safe_counter("iir_requests_total", "Total requests", reg, labelnames=("method", "route", "status"))
+        self.request_errors_total = _safe_counter("iir_request_errors_total", "Total error responses", reg, labelnames=("method", "route", "status"))
+        self.request_latency = _safe_histogram("iir_request_latency_seconds", "Request latency", reg, labelnames=("method", "route"))
+        self.request_prompt_tokens = _safe_histogram("iir_request_prompt_tokens", "Estimated prompt tokens per routed request", reg, buckets=_TOKEN_BUCKETS)
         self.classification_latency = _safe_histogram("iir_classification_latency_seconds", "Classification latency", reg)
+        self.classification_deadline_expired = _safe_counter("iir_classification_deadline_expired_total", "Requests routed on the fallback category because classification missed its deadline", reg)
+        self.classification_background = _safe_counter("iir_classification_background_total", "Late classifications compared with the fallback they replaced", reg, labelnames=("outcome",))
         self.model_routed = _safe_counter("iir_model_routed_total", "Requests routed per model", reg, labelnames=("model",))
         self.classification_category = _safe_counter("iir_classification_category_total", "Classifications per category", reg, labelnames=("category",))
         self.cache_hits = _safe_counter("iir_cache_hits_total", "Cache hits", reg, labelnames=("cache_type",))
         self.cache_misses = _safe_counter("iir_cache_misses_total", "Cache misses", reg, labelnames=("cache_type",))
+        self.admission_wait = _safe_histogram("iir_admission_wait_seconds", "Time spent waiting for an upstream slot", reg, labelnames=("provider",))
+        self.provider_concurrency_limit = _safe_gauge("iir_provider_concurrency_limit", "Adaptive concurrency limit per provider", reg, labelnames=("provider",))
+        self.provider_in_flight = _safe_gauge("iir_provider_in_flight", "In-flight upstream requests per provider", reg, labelnames=("provider",))
+        self.provider_rejections = _safe_counter("iir_provider_rejections_total", "Requests rejected at a provider's concurrency limit", reg, labelnames=("provider",))
+        self.bifrost_pool_in_flight = _safe_gauge("iir_bifrost_pool_in_flight", "In-flight requests per Bifrost connection pool", reg, labelnames=("pool",))
+        self.bifrost_pool_connections = _safe_gauge("iir_bifrost_pool_connections", "Open connections per Bifrost connection pool", reg, labelnames=("pool", "state"))
+        self.bifrost_pool_utilization = _safe_gauge("iir_bifrost_pool_utilization", "Active connections / max_connections per pool", reg, labelnames=("pool",), multiprocess_mode="livemax")
+        self.admission_queue_depth = _safe_gauge("iir_admission_queue_depth", "Requests waiting for an upstream slot", reg, labelnames=("provider",))
+        self.usage_tokens = _safe_counter("iir_usage_tokens_total", "Upstream-reported tokens per model", reg, labelnames=("model", "kind"))
+        self.usage_cost = _safe_counter("iir_usage_cost_usd_total", "Actual spend in USD per model", reg, labelnames=("model",))
+        self.budget_rejections = _safe_counter("iir_budget_rejections_total", "Requests rejected because the key's budget is spent", reg)
+        self.audit_dropped = _safe_counter("iir_audit_dropped_total", "Audit records dropped because the queue was full", reg)
+        self.cache_failovers = _safe_counter("iir_cache_failovers_total", "Switches from Redis to the in-memory cache", reg)
+        self.cache_redis_up = _safe_gauge("iir_cache_redis_up", "1 while the cache is served by Redis, 0 while on the in-memory fallback", reg, multiprocess_mode="livemin")
+        self.cache_node_up = _safe_gauge("iir_cache_node_up", "1 while a sharded cache node is serving, 0 while its keys are rerouted", reg, labelnames=("node",), multiprocess_mode="livemin")
+        self.dependency_up = _safe_gauge("iir_dependency_up", "1 if the dependency's last health probe succeeded", reg, labelnames=("dependency",), multiprocess_mode="livemin")
+        self.dependency_probe_latency = _safe_gauge("iir_dependency_probe_seconds", "Latency of the dependency's last health probe", reg, labelnames=("dependency",), multiprocess_mode="livemax")
+        self.cache_warmup_seconds = _safe_gauge("iir_cache_warmup_seconds", "Duration of the last classification cache warm-up", reg, multiprocess_mode="max")
+        self.cache_warmup_hit_ratio = _safe_gauge("iir_cache_warmup_hit_ratio", "Share of warm-up prompts that were already cached", reg, multiprocess_mode="max")
+
+        # Hot-path label children, bound once
+        self.category_counters = LabelCache(self.classification_category, tuple((c.value,) for c in TaskCategory))
+        self.model_counters = LabelCache(self.model_routed)
+        self.cache_hit_counters = LabelCache(self.cache_hits)
+        self.cache_miss_counters = LabelCache(self.cache_misses)
+        self.background_outcomes = LabelCache(self.classification_background, (("agreed",), ("disagreed",)))
 
 
 _metrics: Metrics | None = None
@@ -40,3 +141,59 @@ def get_metrics(registry: CollectorRegistry | None = None) -> Metrics:
     if _metrics is None:
         _metrics = Metrics(registry)
     return _metrics
+
+
+def multiprocess_dir() -> str | None:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir")
+
+
+def render_latest(accept: str = "") -> tuple[bytes, str]:
+    """Exposition for ``/metrics``: all workers in multiprocess mode, else this process.
+
+    OpenMetrics is served when the scraper asks for it, which is the format
+    that carries exemplars.
+    """
+    registry: Any = REGISTRY
+    if multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+    if "application/openmetrics-text" in accept:
+        return openmetrics.generate_latest(registry), openmetrics.CONTENT_TYPE_LATEST  # type: ignore[no-untyped-call]
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def reap_dead_workers() -> int:
+    """Drop live-gauge files left by workers that died without shutting down.
+
+    Counter and histogram files are kept so totals stay monotonic across
+    worker restarts; only ``live*`` gauges describe processes that must exist.
+    """
+    path = multiprocess_dir()
+    if not path:
+        return 0
+    dead: set[int] = set()
+    for entry in Path(path).iterdir():
+        match = _LIVE_GAUGE_FILE.match(entry.name)
+        if match and not _pid_alive(int(match.group(1))):
+            dead.add(int(match.group(1)))
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, path)  # type: ignore[no-untyped-call]
+    if dead:
+        logger.info("Reaped metrics of %d dead worker(s)", len(dead))
+    return len(dead)
+
+
+def mark_worker_exit() -> None:
+    path = multiprocess_dir()
+    if path:
+        multiprocess.mark_process_dead(os.getpid(), path)  # type: ignore[no-untyped-call]
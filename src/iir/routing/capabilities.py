@@ -0,0 +1,44 @@
+"""Model capabilities and request requirements as integer bitsets.
+
+Each model's mask is computed once at load time: one bit for tool support, one
+for vision, and one per task category it lists. A request's hard requirements
+use the same bits, so checking a candidate is a single AND.
+"""
+
+from __future__ import annotations
+
+from iir.classifier.categories import TaskCategory
+from iir.routing.features import RequestFeatures
+
+TOOLS = 1 << 0
+VISION = 1 << 1
+CATEGORY_BITS = {category: 1 << (2 + i) for i, category in enumerate(TaskCategory)}
+
+_CATEGORY_REQUIREMENTS = {TaskCategory.VISION: VISION, TaskCategory.FUNCTION_CALLING: TOOLS}
+
+
+def category_bit(category: TaskCategory) -> int:
+    return CATEGORY_BITS[category]
+
+
+def model_mask(capabilities: list[str], supports_tools: bool, supports_vision: bool) -> int:
+    mask = (TOOLS if supports_tools else 0) | (VISION if supports_vision else 0)
+    for name in capabilities:
+        try:
+            mask |= CATEGORY_BITS[TaskCategory(name)]
+        except ValueError:
+            pass  # unknown capability names don't constrain routing
+    return mask
+
+
+def request_requirements(features: RequestFeatures) -> int:
+    """Hard requirements that follow from the request itself."""
+    return (TOOLS if features.has_tools else 0) | (VISION if features.has_images else 0)
+
+
+def category_requirements(category: TaskCategory) -> int:
+    return _CATEGORY_REQUIREMENTS.get(category, 0)
+
+
+def satisfies(mask: int, required: int) -> bool:
+    return mask & required == required
@@ -0,0 +1,114 @@
+"""Serialized ``/v1/models`` response with a strong ETag.
+
+The JSON body is built once per (registry version, upstream catalog) pair and
+served as bytes. With a refresh interval, a background task polls Bifrost's
+``/v1/models``. Each configured model is then marked ``available`` or not, and
+models Bifrost serves that are not configured are appended with
+``"configured": false``. A failed refresh keeps the last known catalog.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any
+
+from iir.bifrost_client.client import BifrostClient
+from iir.routing.model_registry import ModelInfo, ModelRegistry
+
+logger = logging.getLogger("iir.catalog")
+
+
+def _model_entry(m: ModelInfo) -> dict[str, Any]:
+    return {
+        "id": m.id,
+        "object": "model",
+        "provider": m.provider,
+        "capabilities": m.capabilities,
+        "quality_tier": m.quality_tier,
+        "supports_vision": m.supports_vision,
+        "supports_tools": m.supports_tools,
+        "cost_per_1m_input_tokens": m.cost_per_1m_input,
+        "cost_per_1m_output_tokens": m.cost_per_1m_output,
+    }
+
+
+def build_catalog(models: list[ModelInfo], upstream: dict[str, dict[str, Any]] | None = None) -> dict[str, Any]:
+    data = [_model_entry(m) for m in models]
+    if upstream is not None:
+        for entry in data:
+            entry["configured"] = True
+            entry["available"] = entry["id"] in upstream
+        configured = {m.id for m in models}
+        for model_id, info in upstream.items():
+            if model_id not in configured:
+                data.append(
+                    {
+                        "id": model_id,
+                        "object": "model",
+                        "provider": info.get("owned_by") or model_id.split("/")[0],
+                        "configured": False,
+                        "available": True,
+                    }
+                )
+    return {"object": "list", "data": data}
+
+
+class ModelCatalog:
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        bifrost: BifrostClient | None = None,
+        refresh_interval: float = 0.0,
+    ) -> None:
+        self.registry = registry
+        self.bifrost = bifrost
+        self.refresh_interval = refresh_interval
+        self._upstream: dict[str, dict[str, Any]] | None = None
+        self._upstream_version = 0
+        self._built_for: tuple[int, int] | None = None
+        self._body = b""
+        self._etag = ""
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        if self.bifrost is not None and self.refresh_interval > 0:
+            # Refreshed in the background so a slow Bifrost does not delay startup
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def render(self) -> tuple[bytes, str]:
+        """The serialized body and its ETag, rebuilt only when an input changed."""
+        key = (self.registry.version, self._upstream_version)
+        if key != self._built_for:
+            catalog = build_catalog(self.registry.list_models(), self._upstream)
+            self._body = json.dumps(catalog, separators=(",", ":")).encode()
+            self._etag = '"' + hashlib.blake2b(self._body, digest_size=16).hexdigest() + '"'
+            self._built_for = key
+        return self._body, self._etag
+
+    async def refresh(self) -> None:
+        assert self.bifrost is not None
+        try:
+            resp = await self.bifrost.list_models()
+            resp.raise_for_status()
+            upstream = {m["id"]: m for m in resp.json().get("data", []) if isinstance(m, dict) and "id" in m}
+        except Exception as exc:  # noqa: BLE001 - keep serving the last catalog
+            logger.warning("Could not refresh the Bifrost model catalog: %s", exc)
+            return
+        if upstream != self._upstream:
+            self._upstream = upstream
+            self._upstream_version += 1
+            logger.info("Bifrost serves %d models", len(upstream))
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
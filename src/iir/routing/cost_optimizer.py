@@ -3,10 +3,46 @@
 from __future__ import annotations
 
 from iir.routing.model_registry import ModelInfo
+from iir.routing.tokens import TokenEstimate
 
 _QUALITY_ORDER = {"excellent": 3, "great": 2, "good": 1}
 
 
+def estimate_cost(model: ModelInfo, estimate: TokenEstimate) -> float:
+    """Estimated USD cost of a request on ``model``."""
+    prompt = estimate.prompt_for(model.provider)
+    return (prompt * model.cost_per_1m_input + estimate.completion_tokens * model.cost_per_1m_output) / 1_000_000
+
+
+def usage_cost(model: ModelInfo, prompt_tokens: int, completion_tokens: int) -> float:
+    """Actual USD cost of a completed request from upstream token counts."""
+    return (prompt_tokens * model.cost_per_1m_input + completion_tokens * model.cost_per_1m_output) / 1_000_000
+
+
+def fits_context(model: ModelInfo, estimate: TokenEstimate | None) -> bool:
+    if estimate is None:
+        return True
+    return estimate.required_context(model.provider) <= model.context_length
+
+
+def filter_fitting(candidates: list[ModelInfo], estimate: TokenEstimate | None) -> list[ModelInfo]:
+    if estimate is None:
+        return candidates
+    return [m for m in candidates if fits_context(m, estimate)]
+
+
+def filter_available(
+    candidates: list[ModelInfo],
+    estimate: TokenEstimate | None,
+    excluded_providers: frozenset[str] = frozenset(),
+) -> list[ModelInfo]:
+    """Drop models that cannot fit the request or whose provider is saturated."""
+    candidates = filter_fitting(candidates, estimate)
+    if excluded_providers:
+        candidates = [m for m in candidates if m.provider not in excluded_providers]
+    return candidates
+
+
 def select_cheapest(candidates: list[ModelInfo]) -> ModelInfo | None:
     if not candidates:
         return None
@@ -19,12 +55,19 @@ def select_best_quality(candidates: list[ModelInfo]) -> ModelInfo | None:
     return max(candidates, key=lambda m: _QUALITY_ORDER.get(m.quality_tier, 0))
 
 
-def select_cost_optimized(candidates: list[ModelInfo], max_cost: float | None = None) -> ModelInfo | None:
+def select_cost_optimized(
+    candidates: list[ModelInfo],
+    max_cost: float | None = None,
+    estimate: TokenEstimate | None = None,
+) -> ModelInfo | None:
     if not candidates:
         return None
 
     if max_cost is not None:
-        affordable = [m for m in candidates if m.cost_per_1m_input <= max_cost * 1000]
+        if estimate is not None:
+            affordable = [m for m in candidates if estimate_cost(m, estimate) <= max_cost]
+        else:
+            affordable = [m for m in candidates if m.cost_per_1m_input <= max_cost * 1000]
         if affordable:
             candidates = affordable
 
@@ -2,17 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import time
 from dataclasses import dataclass
 from typing import Any
 
-from iir.cache.keys import classification_cache_key
+from iir.bifrost_client.limiter import ConcurrencyLimiter
 from iir.classifier.base import HybridClassifier
 from iir.classifier.categories import TaskCategory
 from iir.observability.metrics import Metrics
+from iir.routing.capabilities import category_requirements, request_requirements, satisfies
+from iir.routing.cost_optimizer import estimate_cost, fits_context
+from iir.routing.features import RequestFeatures, extract_features
 from iir.routing.model_registry import ModelRegistry
 from iir.routing.strategies import route_cost_optimized, route_local_only, route_quality_first
+from iir.routing.tokens import TokenEstimate
 
 logger = logging.getLogger("iir.routing")
 
@@ -24,6 +29,8 @@ class RoutingDecision:
     category: str
     reason: str
     estimated_cost_per_1m: float = 0.0
+    estimated_prompt_tokens: int = 0
+    estimated_cost: float = 0.0
 
 
 class RoutingEngine:
@@ -36,6 +43,9 @@ class RoutingEngine:
         cache_ttl: int = 3600,
         default_strategy: str = "cost-optimized",
         max_cost: float | None = None,
+        prefer_local_under_tokens: int = 0,
+        limiter: ConcurrencyLimiter | None = None,
+        classify_deadline: float = 0.0,
     ) -> None:
         self.registry = registry
         self.classifier = classifier
@@ -44,6 +54,18 @@ class RoutingEngine:
         self.cache_ttl = cache_ttl
         self.default_strategy = default_strategy
         self.max_cost = max_cost
+        self.prefer_local_under_tokens = prefer_local_under_tokens
+        self.limiter = limiter
+        self.classify_deadline = classify_deadline
+        # First-turn classifications still running, by cache key; holds the
+        # only strong reference to tasks that outlived their deadline
+        self._inflight: dict[str, asyncio.Task[TaskCategory]] = {}
+
+    async def close(self) -> None:
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     async def route(
         self,
@@ -51,8 +73,17 @@ class RoutingEngine:
         strategy: str | None = None,
         explicit_model: str | None = None,
         max_cost: float | None = None,
+        max_tokens: int | None = None,
+        features: RequestFeatures | None = None,
         **kwargs: Any,
     ) -> RoutingDecision:
+        # One pass over the messages; classifiers, cache keys and capability
+        # checks below all read from it
+        if features is None:
+            features = extract_features(messages, kwargs.get("tools") or kwargs.get("functions"))
+        estimate = features.token_estimate(max_tokens)
+        self.metrics.request_prompt_tokens.observe(features.prompt_tokens)
+
         # Pass-through: user specified a model
         if explicit_model and self.registry.model_exists(explicit_model):
             model = self.registry.get_model(explicit_model)
@@ -63,26 +94,40 @@ class RoutingEngine:
                 category="explicit",
                 reason="User-specified model",
                 estimated_cost_per_1m=model.cost_per_1m_input,
+                estimated_prompt_tokens=estimate.prompt_for(model.provider),
+                estimated_cost=estimate_cost(model, estimate),
             )
 
         # Classify the prompt
-        category = await self._classify(messages, **kwargs)
-        self.metrics.classification_category.labels(category=category.value).inc()
+        category = await self._classify(messages, features, **kwargs)
+        self.metrics.category_counters.get(category.value).inc()
+
+        # Hard requirements (tools, images) that every candidate must meet
+        required = request_requirements(features) | category_requirements(category)
 
         # Select model based on strategy
         active_strategy = strategy or self.default_strategy
         active_max_cost = max_cost or self.max_cost
-        model_info = self._select_model(category, active_strategy, active_max_cost)
+        model_info = self._select_model(category, active_strategy, active_max_cost, estimate, required)
 
         if model_info is None:
             # Fallback to any default
             default_id = self.registry.get_default_model_for_task(TaskCategory.GENERAL_CHAT)
             model_info = self.registry.get_model(default_id) if default_id else None
+            if model_info is not None and not (
+                satisfies(model_info.capability_mask, required) and fits_context(model_info, estimate)
+            ):
+                model_info = None
 
         if model_info is None:
+            capable = [m for m in self.registry.models_with(required) if fits_context(m, estimate)]
             models = self.registry.list_models()
-            if models:
-                model_info = models[0]
+            if capable:
+                model_info = capable[0]
+            elif models:
+                logger.warning("No model meets requirements %#x; routing best-effort", required)
+                fitting = [m for m in models if fits_context(m, estimate)]
+                model_info = fitting[0] if fitting else models[0]
             else:
                 return RoutingDecision(
                     model="unknown",
@@ -91,7 +136,7 @@ class RoutingEngine:
                     reason="No models available",
                 )
 
-        self.metrics.model_routed.labels(model=model_info.id).inc()
+        self.metrics.model_counters.get(model_info.id).inc()
 
         return RoutingDecision(
             model=model_info.id,
@@ -99,35 +144,96 @@ class RoutingEngine:
             category=category.value,
             reason=f"Strategy={active_strategy}, task={category.value}",
             estimated_cost_per_1m=model_info.cost_per_1m_input,
+            estimated_prompt_tokens=estimate.prompt_for(model_info.provider),
+            estimated_cost=estimate_cost(model_info, estimate),
         )
 
-    async def _classify(self, messages: list[dict[str, Any]], **kwargs: Any) -> TaskCategory:
-        cache_key = classification_cache_key(messages)
+    async def _classify(self, messages: list[dict[str, Any]], features: RequestFeatures, **kwargs: Any) -> TaskCategory:
+        previous_key, cache_key = features.previous_cache_key, features.cache_key
+        kwargs["features"] = features
 
         # Check cache
         cached = await self.cache.get(cache_key)
         if cached:
-            self.metrics.cache_hits.labels(cache_type="classification").inc()
+            self.metrics.cache_hit_counters.get("classification").inc()
             try:
                 return TaskCategory(cached)
             except ValueError:
                 pass
         else:
-            self.metrics.cache_misses.labels(cache_type="classification").inc()
-
+            self.metrics.cache_miss_counters.get("classification").inc()
+
+        previous = await self._previous_turn_category(previous_key)
+        if previous is not None:
+            # Follow-ups only consult the rules tier, so they never wait on the LLM
+            start = time.monotonic()
+            category = await self.classifier.classify_followup(messages, previous, **kwargs)
+            self.metrics.classification_latency.observe(time.monotonic() - start)
+            await self.cache.set(cache_key, category.value, ttl=self.cache_ttl)
+            return category
+
+        if self.classify_deadline <= 0 or not self.classifier.llm_ready():
+            return await self._classify_and_cache(messages, cache_key, **kwargs)
+
+        # Identical prompts arriving while the LLM is busy share one classification
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._classify_and_cache(messages, cache_key, **kwargs))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(cache_key, None))
+        done, _ = await asyncio.wait({task}, timeout=self.classify_deadline)
+        if done:
+            return task.result()
+
+        # Route on the cheap signal now; the task keeps running and fills the cache
+        self.metrics.classification_deadline_expired.inc()
+        fallback = await self.classifier.classify_fast(messages, **kwargs)
+        task.add_done_callback(lambda t: self._record_late_result(t, fallback))
+        logger.debug("Classification deadline expired; routing on %s", fallback)
+        return fallback
+
+    async def _classify_and_cache(self, messages: list[dict[str, Any]], cache_key: str, **kwargs: Any) -> TaskCategory:
         start = time.monotonic()
         category = await self.classifier.classify(messages, **kwargs)
-        elapsed = time.monotonic() - start
-        self.metrics.classification_latency.observe(elapsed)
-
-        # Cache result
+        self.metrics.classification_latency.observe(time.monotonic() - start)
         await self.cache.set(cache_key, category.value, ttl=self.cache_ttl)
-
         return category
 
-    def _select_model(self, category: TaskCategory, strategy: str, max_cost: float | None) -> Any:
+    def _record_late_result(self, task: asyncio.Task[TaskCategory], fallback: TaskCategory) -> None:
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning("Background classification failed", exc_info=task.exception())
+            return
+        outcome = "agreed" if task.result() is fallback else "disagreed"
+        self.metrics.background_outcomes.get(outcome).inc()
+
+    async def _previous_turn_category(self, previous_key: str | None) -> TaskCategory | None:
+        if previous_key is None:
+            return None
+        cached = await self.cache.get(previous_key)
+        if not cached:
+            self.metrics.cache_miss_counters.get("conversation").inc()
+            return None
+        self.metrics.cache_hit_counters.get("conversation").inc()
+        try:
+            return TaskCategory(cached)
+        except ValueError:
+            return None
+
+    def _select_model(
+        self,
+        category: TaskCategory,
+        strategy: str,
+        max_cost: float | None,
+        estimate: TokenEstimate | None = None,
+        required: int = 0,
+    ) -> Any:
+        # Steer around providers at their adaptive concurrency limit
+        excluded = self.limiter.saturated() if self.limiter is not None else frozenset()
         if strategy == "quality-first":
-            return route_quality_first(category, self.registry)
+            return route_quality_first(category, self.registry, estimate, excluded, required)
         if strategy == "local-only":
-            return route_local_only(category, self.registry)
-        return route_cost_optimized(category, self.registry, max_cost)
+            return route_local_only(category, self.registry, estimate, excluded, required)
+        prefer_local = estimate is not None and estimate.prompt_tokens < self.prefer_local_under_tokens
+        return route_cost_optimized(category, self.registry, max_cost, estimate, prefer_local, excluded, required)
@@ -0,0 +1,121 @@
+"""Per-request features, extracted in one pass over the messages.
+
+The classifiers, the classification cache, capability filtering and token
+estimation all need facts about the same message list. ``extract_features``
+walks it once and collects the last user text, total text length, image and
+tool presence, the prompt token estimate, and the conversation cache keys.
+Consumers take a ``RequestFeatures`` instead of re-walking the list.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from iir.cache.keys import hash_message, new_hasher
+from iir.routing.tokens import (
+    TOKENS_PER_IMAGE,
+    TOKENS_PER_MESSAGE,
+    TOKENS_PER_REQUEST,
+    TokenEstimate,
+    estimate_text_tokens,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class RequestFeatures:
+    last_user_text: str
+    total_text_length: int
+    has_images: bool
+    has_tools: bool
+    prompt_tokens: int
+    cache_key: str
+    previous_cache_key: str | None = None
+
+    def token_estimate(self, max_tokens: int | None = None) -> TokenEstimate:
+        return TokenEstimate(prompt_tokens=self.prompt_tokens, max_tokens=max_tokens)
+
+
+def _block_text(block: dict[str, Any]) -> str:
+    text = block.get("text", "")
+    return text if isinstance(text, str) else ""
+
+
+def extract_features(messages: list[dict[str, Any]], tools: Any = None) -> RequestFeatures:
+    """Collect everything routing needs from ``messages`` in a single traversal."""
+    h = new_hasher()
+    previous: str | None = None
+    current: str | None = None
+    last_user_text = ""
+    total_length = 0
+    has_images = False
+    tokens = TOKENS_PER_REQUEST
+
+    for msg in messages:
+        role = msg.get("role", "")
+        content = msg.get("content", "")
+        tokens += TOKENS_PER_MESSAGE
+        if isinstance(content, str):
+            text = content
+            total_length += len(content)
+            tokens += estimate_text_tokens(content)
+        elif isinstance(content, list):
+            parts: list[str] = []
+            for block in content:
+                if not isinstance(block, dict):
+                    continue
+                kind = block.get("type")
+                if kind == "text":
+                    part = _block_text(block)
+                    parts.append(part)
+                    total_length += len(part)
+                    tokens += estimate_text_tokens(part)
+                elif kind == "image_url":
+                    has_images = True
+                    tokens += TOKENS_PER_IMAGE
+            text = "\n".join(parts)
+        else:
+            text = ""
+
+        # The conversation hash is snapshotted at every user turn, as in
+        # ``conversation_cache_keys``, so the keys are identical
+        hash_message(h, role, content)
+        if role == "user":
+            last_user_text = text
+            previous, current = current, h.hexdigest()
+
+    if tools:
+        tokens += estimate_text_tokens(json.dumps(tools))
+
+    if current is None:
+        cache_key, previous_cache_key = f"classify:{h.hexdigest()}", None
+    else:
+        cache_key = f"classify:{current}"
+        previous_cache_key = f"classify:{previous}" if previous else None
+
+    return RequestFeatures(
+        last_user_text=last_user_text,
+        total_text_length=total_length,
+        has_images=has_images,
+        has_tools=bool(tools),
+        prompt_tokens=tokens,
+        cache_key=cache_key,
+        previous_cache_key=previous_cache_key,
+    )
+
+
+def estimate_request_tokens(
+    messages: list[dict[str, Any]],
+    max_tokens: int | None = None,
+    tools: list[dict[str, Any]] | None = None,
+) -> TokenEstimate:
+    return extract_features(messages, tools).token_estimate(max_tokens)
+
+
+def features_of(messages: list[dict[str, Any]], kwargs: dict[str, Any]) -> RequestFeatures:
+    """The features a caller passed along in ``kwargs``, else extracted now."""
+    features = kwargs.get("features")
+    if features is None:
+        features = extract_features(messages, kwargs.get("tools") or kwargs.get("functions"))
+    return features
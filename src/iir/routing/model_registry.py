@@ -7,13 +7,20 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
-import yaml
-
 from iir.classifier.categories import TaskCategory
+from iir.routing.capabilities import category_bit, model_mask
+from iir.snapshot import load_snapshot, save_snapshot
 
 logger = logging.getLogger("iir.routing.registry")
 
 
+def _read_yaml(path: Path) -> dict[str, Any]:
+    import yaml  # only needed when there is no snapshot
+
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
 @dataclass
 class ModelInfo:
     id: str
@@ -25,21 +32,44 @@ class ModelInfo:
     quality_tier: str = "good"  # good | great | excellent
     supports_vision: bool = False
     supports_tools: bool = False
+    capability_mask: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.capability_mask = model_mask(self.capabilities, self.supports_tools, self.supports_vision)
 
 
 class ModelRegistry:
     def __init__(self) -> None:
         self._models: dict[str, ModelInfo] = {}
         self._task_defaults: dict[str, str] = {}
+        self._by_mask: dict[int, list[ModelInfo]] = {}
+        self.version = 0  # bumped on every load, for derived caches
+
+    def load(self, path: str | Path, snapshot_dir: str | Path | None = None) -> None:
+        """Load ``path``, through a JSON snapshot in ``snapshot_dir`` when given."""
+        path = Path(path)
+        if snapshot_dir is None or not path.exists():
+            self.load_from_yaml(path)
+            return
+        data = load_snapshot(snapshot_dir, "registry", [path])
+        if isinstance(data, dict):
+            self._apply(data)
+            logger.info("Loaded %d models from snapshot of %s", len(self._models), path)
+            return
+        data = _read_yaml(path)
+        self._apply(data)
+        logger.info("Loaded %d models from %s", len(self._models), path)
+        save_snapshot(snapshot_dir, "registry", [path], data)
 
     def load_from_yaml(self, path: str | Path) -> None:
         path = Path(path)
         if not path.exists():
             logger.warning("Model config not found: %s", path)
             return
-        with open(path) as f:
-            data = yaml.safe_load(f) or {}
+        self._apply(_read_yaml(path))
+        logger.info("Loaded %d models from %s", len(self._models), path)
 
+    def _apply(self, data: dict[str, Any]) -> None:
         for model_id, info in data.get("models", {}).items():
             self._models[model_id] = ModelInfo(
                 id=model_id,
@@ -54,13 +84,23 @@ class ModelRegistry:
             )
 
         self._task_defaults = data.get("task_routing", {})
-        logger.info("Loaded %d models from %s", len(self._models), path)
+        self._by_mask = {}
+        self.version += 1
 
     def get_model(self, model_id: str) -> ModelInfo | None:
         return self._models.get(model_id)
 
     def get_models_for_task(self, category: TaskCategory) -> list[ModelInfo]:
-        return [m for m in self._models.values() if category.value in m.capabilities]
+        return self.models_with(category_bit(category))
+
+    def models_with(self, required: int) -> list[ModelInfo]:
+        """Models whose capability mask covers ``required``; cached per mask, do not mutate."""
+        models = self._by_mask.get(required)
+        if models is None:
+            models = self._by_mask[required] = [
+                m for m in self._models.values() if m.capability_mask & required == required
+            ]
+        return models
 
     def get_default_model_for_task(self, category: TaskCategory) -> str | None:
         return self._task_defaults.get(category.value)
@@ -3,32 +3,68 @@
 from __future__ import annotations
 
 from iir.classifier.categories import TaskCategory
-from iir.routing.cost_optimizer import select_best_quality, select_cheapest, select_cost_optimized
+from iir.routing.capabilities import category_bit, satisfies
+from iir.routing.cost_optimizer import (
+    filter_available,
+    fits_context,
+    select_best_quality,
+    select_cheapest,
+    select_cost_optimized,
+)
 from iir.routing.model_registry import ModelInfo, ModelRegistry
+from iir.routing.tokens import TokenEstimate
 
 
 def route_cost_optimized(
     category: TaskCategory,
     registry: ModelRegistry,
     max_cost: float | None = None,
+    estimate: TokenEstimate | None = None,
+    prefer_local: bool = False,
+    excluded_providers: frozenset[str] = frozenset(),
+    required: int = 0,
 ) -> ModelInfo | None:
-    # Try task default first
+    candidates = filter_available(registry.models_with(category_bit(category) | required), estimate, excluded_providers)
+
+    # Short prompts go to a capable free model when one exists
+    if prefer_local:
+        local = [m for m in candidates if m.cost_per_1m_input == 0.0]
+        if local:
+            return select_best_quality(local)
+
+    # Try task default next
     default_id = registry.get_default_model_for_task(category)
     if default_id:
         model = registry.get_model(default_id)
-        if model:
+        if (
+            model
+            and satisfies(model.capability_mask, required)
+            and fits_context(model, estimate)
+            and model.provider not in excluded_providers
+        ):
             return model
 
-    candidates = registry.get_models_for_task(category)
-    return select_cost_optimized(candidates, max_cost)
+    return select_cost_optimized(candidates, max_cost, estimate)
 
 
-def route_quality_first(category: TaskCategory, registry: ModelRegistry) -> ModelInfo | None:
-    candidates = registry.get_models_for_task(category)
+def route_quality_first(
+    category: TaskCategory,
+    registry: ModelRegistry,
+    estimate: TokenEstimate | None = None,
+    excluded_providers: frozenset[str] = frozenset(),
+    required: int = 0,
+) -> ModelInfo | None:
+    candidates = filter_available(registry.models_with(category_bit(category) | required), estimate, excluded_providers)
     return select_best_quality(candidates)
 
 
-def route_local_only(category: TaskCategory, registry: ModelRegistry) -> ModelInfo | None:
-    candidates = registry.get_models_for_task(category)
+def route_local_only(
+    category: TaskCategory,
+    registry: ModelRegistry,
+    estimate: TokenEstimate | None = None,
+    excluded_providers: frozenset[str] = frozenset(),
+    required: int = 0,
+) -> ModelInfo | None:
+    candidates = filter_available(registry.models_with(category_bit(category) | required), estimate, excluded_providers)
     local = [m for m in candidates if m.cost_per_1m_input == 0.0]
     return select_best_quality(local) if local else select_cheapest(candidates)
@@ -0,0 +1,63 @@
+"""Fast token estimation for routing decisions.
+
+A byte-pair-style approximation: text is split into word/punctuation pieces
+(roughly what a BPE pre-tokenizer does) and long or non-ASCII runs are charged
+by UTF-8 byte length. The estimate is computed once per request and calibrated
+per provider when checked against each candidate model. The per-request count
+itself is taken in ``iir.routing.features``, which builds on this module; this
+module imports nothing from routing.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Average UTF-8 bytes per token for an OpenAI-style BPE vocabulary.
+_BYTES_PER_TOKEN = 4.0
+
+# Chat-format overhead (role markers, separators) per message and per request.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REQUEST = 3
+
+# Flat charge for an image block (high-detail 1024px tile set).
+TOKENS_PER_IMAGE = 765
+
+# Assumed completion length when the client does not set max_tokens.
+DEFAULT_COMPLETION_TOKENS = 256
+
+# Tokenizer calibration relative to the OpenAI baseline (tokens per baseline token).
+PROVIDER_CALIBRATION: dict[str, float] = {
+    "openai": 1.0,
+    "anthropic": 1.1,
+    "groq": 1.05,
+    "ollama": 1.05,
+}
+
+
+def estimate_text_tokens(text: str) -> int:
+    if not text:
+        return 0
+    pieces = len(_PIECE_RE.findall(text))
+    by_bytes = math.ceil(len(text.encode()) / _BYTES_PER_TOKEN)
+    return max(pieces, by_bytes)
+
+
+@dataclass(frozen=True)
+class TokenEstimate:
+    prompt_tokens: int
+    max_tokens: int | None = None
+
+    @property
+    def completion_tokens(self) -> int:
+        return self.max_tokens if self.max_tokens is not None else DEFAULT_COMPLETION_TOKENS
+
+    def prompt_for(self, provider: str) -> int:
+        return math.ceil(self.prompt_tokens * PROVIDER_CALIBRATION.get(provider, 1.0))
+
+    def required_context(self, provider: str) -> int:
+        """Tokens of context window needed for prompt plus the requested completion."""
+        return self.prompt_for(provider) + (self.max_tokens or 0)
@@ -0,0 +1,72 @@
+"""Startup snapshots of parsed configuration files.
+
+A snapshot is a JSON document holding the parsed data next to a key made from
+the source files' paths, mtimes and sizes plus the package version. Workers
+that start after the first one load the JSON instead of re-parsing YAML. Any
+change to a source file, or an upgrade, invalidates the snapshot. A corrupt or
+unreadable snapshot is treated as a miss.
+
+Snapshots are plain JSON rather than pickles so that a file planted in the
+snapshot directory can at worst change configuration, never run code.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from iir import __version__
+
+logger = logging.getLogger("iir.snapshot")
+
+_FORMAT = 3
+
+
+def _source_key(sources: list[Path]) -> list[Any]:
+    # Lists rather than tuples so the key compares equal after a JSON round trip
+    key: list[Any] = [_FORMAT, __version__]
+    for source in sources:
+        stat = source.stat()
+        key.append([str(source.resolve()), stat.st_mtime_ns, stat.st_size])
+    return key
+
+
+def snapshot_path(snapshot_dir: str | Path, name: str, sources: list[Path]) -> Path:
+    digest = hashlib.blake2b(repr([str(s.resolve()) for s in sources]).encode(), digest_size=8).hexdigest()
+    return Path(snapshot_dir) / f"{name}-{digest}.json"
+
+
+def load_snapshot(snapshot_dir: str | Path, name: str, sources: list[Path]) -> Any | None:
+    try:
+        key = _source_key(sources)
+        with open(snapshot_path(snapshot_dir, name, sources), encoding="utf-8") as f:
+            document = json.load(f)
+        stored_key, value = document["key"], document["value"]
+    except FileNotFoundError:
+        return None
+    except Exception as exc:  # noqa: BLE001 - any unreadable snapshot is rebuilt from source
+        logger.warning("Ignoring unreadable %s snapshot: %s", name, exc)
+        return None
+    return value if stored_key == key else None
+
+
+def save_snapshot(snapshot_dir: str | Path, name: str, sources: list[Path], value: Any) -> None:
+    path = snapshot_path(snapshot_dir, name, sources)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Atomic replace so concurrently starting workers never read a torn file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": _source_key(sources), "value": value}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except (OSError, TypeError, ValueError) as exc:
+        logger.warning("Could not write %s snapshot: %s", name, exc)
@@ -0,0 +1,213 @@
+"""Per-key spend tracking from upstream ``usage`` and budget enforcement.
+
+Token counts come from the ``usage`` object of each Bifrost response, or from
+the last SSE chunk that carries one for streamed responses. Spend is
+accumulated per key in memory and written to SQLite in one transaction every
+``flush_interval`` seconds. Each flush also re-reads the period totals and
+budgets, so spend from other workers and budget changes show up within one
+interval. Budgets are monthly (UTC) and checked against memory only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import calendar
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from iir.auth.apikey_db import add_usage, get_usage, load_budgets
+from iir.observability.metrics import Metrics
+from iir.routing.cost_optimizer import usage_cost
+from iir.routing.model_registry import ModelRegistry
+
+logger = logging.getLogger("iir.usage")
+
+
+@dataclass
+class Usage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class KeySpend:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, other: KeySpend) -> None:
+        self.requests += other.requests
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost_usd += other.cost_usd
+
+
+def _usage_from(obj: Any) -> Usage | None:
+    usage = obj.get("usage") if isinstance(obj, dict) else None
+    if not isinstance(usage, dict):
+        return None
+    return Usage(int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0))
+
+
+def parse_usage(content: bytes, content_type: str = "") -> Usage | None:
+    """Token usage from a chat completion body, JSON or SSE."""
+    if "text/event-stream" not in content_type:
+        try:
+            return _usage_from(json.loads(content))
+        except ValueError:
+            return None
+
+    # Usage arrives on the final chunk, so scan events from the end
+    for line in reversed(content.splitlines()):
+        if not line.startswith(b"data:"):
+            continue
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            continue
+        try:
+            usage = _usage_from(json.loads(data))
+        except ValueError:
+            continue
+        if usage is not None:
+            return usage
+    return None
+
+
+def current_period(now: float | None = None) -> str:
+    return time.strftime("%Y-%m", time.gmtime(now))
+
+
+def _period_end(now: float) -> float:
+    year, month = time.gmtime(now)[:2]
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return float(calendar.timegm((year, month, 1, 0, 0, 0)))
+
+
+class UsageLedger:
+    def __init__(
+        self,
+        db_path: str | Path,
+        registry: ModelRegistry,
+        flush_interval: float = 5.0,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.db_path = db_path
+        self.registry = registry
+        self.flush_interval = flush_interval
+        self.metrics = metrics
+        self._budgets: dict[str, float] = {}
+        self._committed: dict[str, float] = {}  # period spend per key as of the last flush
+        self._pending: dict[tuple[str, str], KeySpend] = {}
+        self._flushing: dict[tuple[str, str], KeySpend] = {}
+        self._period = ""
+        self._period_ends = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self._roll_period(time.time())
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self._reload, self._period)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    # --- Hot path ---
+
+    def within_budget(self, key: str) -> bool:
+        budget = self._budgets.get(key)
+        if budget is None:
+            return True
+        if self.spent(key) < budget:
+            return True
+        if self.metrics is not None:
+            self.metrics.budget_rejections.inc()
+        return False
+
+    def spent(self, key: str) -> float:
+        now = time.time()
+        if now >= self._period_ends:
+            self._roll_period(now)
+        spent = self._committed.get(key, 0.0)
+        for batch in (self._flushing, self._pending):
+            entry = batch.get((key, self._period))
+            if entry is not None:
+                spent += entry.cost_usd
+        return spent
+
+    def budget(self, key: str) -> float | None:
+        return self._budgets.get(key)
+
+    def set_budget(self, key: str, budget_usd: float | None) -> None:
+        if budget_usd is None:
+            self._budgets.pop(key, None)
+        else:
+            self._budgets[key] = budget_usd
+
+    def record(self, key: str, model_id: str, usage: Usage) -> float:
+        """Attribute a completed request to ``key``; returns its cost."""
+        now = time.time()
+        if now >= self._period_ends:
+            self._roll_period(now)
+        model = self.registry.get_model(model_id)
+        cost = usage_cost(model, usage.prompt_tokens, usage.completion_tokens) if model else 0.0
+        entry = self._pending.get((key, self._period))
+        if entry is None:
+            entry = self._pending[(key, self._period)] = KeySpend()
+        entry.add(KeySpend(1, usage.prompt_tokens, usage.completion_tokens, cost))
+        if self.metrics is not None:
+            self.metrics.usage_tokens.labels(model=model_id, kind="prompt").inc(usage.prompt_tokens)
+            self.metrics.usage_tokens.labels(model=model_id, kind="completion").inc(usage.completion_tokens)
+            self.metrics.usage_cost.labels(model=model_id).inc(cost)
+        return cost
+
+    # --- Write-behind ---
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        period = self._period
+        try:
+            committed, budgets = await asyncio.to_thread(self._write_and_reload, batch, period)
+        except Exception:
+            logger.exception("Usage flush failed; keeping %d pending entries", len(batch))
+            for k, spend in batch.items():
+                self._pending.setdefault(k, KeySpend()).add(spend)
+            return
+        finally:
+            self._flushing = {}
+        if period == self._period:
+            self._committed = committed
+        self._budgets = budgets
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _write_and_reload(
+        self, batch: dict[tuple[str, str], KeySpend], period: str
+    ) -> tuple[dict[str, float], dict[str, float]]:
+        if batch:
+            add_usage(self.db_path, [
+                (key, p, s.requests, s.prompt_tokens, s.completion_tokens, s.cost_usd)
+                for (key, p), s in batch.items()
+            ])
+        usage = get_usage(self.db_path, period)
+        return {key: row["cost_usd"] for key, row in usage.items()}, load_budgets(self.db_path)
+
+    def _reload(self, period: str) -> None:
+        self._committed, self._budgets = self._write_and_reload({}, period)
+
+    def _roll_period(self, now: float) -> None:
+        self._period = current_period(now)
+        self._period_ends = _period_end(now)
+        self._committed = {}
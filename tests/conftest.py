@@ -18,9 +18,12 @@ def tmp_db(tmp_path):
 
 
 @pytest.fixture
-def settings(tmp_db):
+def settings(tmp_db, tmp_path):
     return {
         "auth_db_path": tmp_db,
+        "batch_dir": str(tmp_path / "batches"),
+        "startup_snapshot_dir": str(tmp_path / "snapshots"),
+        "audit_dir": str(tmp_path / "audit"),
         "redis_url": "redis://localhost:6379/0",
         "redis_fallback_to_memory": True,
         "bifrost_url": "http://localhost:8080",
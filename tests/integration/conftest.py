@@ -15,14 +15,15 @@ from iir.config import Settings
 def _patch_settings(settings):
     """Patch get_settings() in modules that import it directly.
 
-    The app factory uses settings_override, but api_key_auth and admin routes
-    call get_settings() which returns the lru_cache'd singleton with production
-    defaults.  Patch both import sites so they use the test Settings.
+    The app factory uses settings_override, but api_key_auth and the admin and
+    chat routes call get_settings() which returns the lru_cache'd singleton with
+    production defaults.  Patch those import sites so they use the test Settings.
     """
     test_settings = Settings(**settings)
     with (
         patch("iir.auth.security.get_settings", return_value=test_settings),
         patch("iir.api.routes_admin.get_settings", return_value=test_settings),
+        patch("iir.api.routes_chat.get_settings", return_value=test_settings),
     ):
         yield
 
@@ -14,6 +14,7 @@ class TestAdminApiKeys:
         assert resp.status_code == 200
         data = resp.json()
         assert "api_key" in data
+        assert data["key_prefix"] == data["api_key"][:8]
         assert data["description"] == "integration test key"
         assert len(data["api_key"]) > 20  # secrets.token_urlsafe(32) → 43 chars
 
@@ -22,7 +23,8 @@ class TestAdminApiKeys:
 
         assert resp.status_code == 200
         keys = resp.json()["data"]
-        assert any(k["key"] == "test-key-123" for k in keys)
+        assert any(k["key_prefix"] == "test-key" for k in keys)
+        assert all("key" not in k and "key_hash" not in k for k in keys)
 
     def test_create_then_list(self, client, auth_headers):
         client.post("/admin/api-keys", json={"description": "new"}, headers=auth_headers)
@@ -38,7 +40,8 @@ class TestAdminApiKeys:
             json={"description": "to-delete"},
             headers=auth_headers,
         )
-        new_key = create_resp.json()["api_key"]
+        created = create_resp.json()
+        new_key = created["api_key"]
 
         # Delete by prefix
         resp = client.delete(f"/admin/api-keys/{new_key[:8]}", headers=auth_headers)
@@ -47,13 +50,51 @@ class TestAdminApiKeys:
 
         # Verify it's revoked (soft-delete: active=0)
         list_resp = client.get("/admin/api-keys", headers=auth_headers)
-        revoked = next(k for k in list_resp.json()["data"] if k["key"] == new_key)
+        revoked = next(k for k in list_resp.json()["data"] if k["id"] == created["id"])
         assert revoked["active"] == 0
 
     def test_delete_nonexistent_returns_404(self, client, auth_headers):
         resp = client.delete("/admin/api-keys/nonexistent-prefix", headers=auth_headers)
         assert resp.status_code == 404
 
+    def test_list_paginates_with_cursor(self, client, auth_headers):
+        for i in range(4):
+            client.post("/admin/api-keys", json={"description": f"page {i}"}, headers=auth_headers)
+
+        seen = []
+        cursor = 0
+        while True:
+            resp = client.get("/admin/api-keys", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+            page = resp.json()
+            seen.extend(k["id"] for k in page["data"])
+            if page["next_cursor"] is None:
+                break
+            cursor = page["next_cursor"]
+
+        assert len(seen) == 5  # seeded key + 4 new ones
+        assert seen == sorted(set(seen))
+
+    def test_list_filters(self, client, auth_headers):
+        kept = client.post("/admin/api-keys", json={"description": "billing batch"}, headers=auth_headers).json()
+        revoked = client.post("/admin/api-keys", json={"description": "billing old"}, headers=auth_headers).json()
+        client.delete(f"/admin/api-keys/{revoked['api_key']}", headers=auth_headers)
+
+        resp = client.get("/admin/api-keys", params={"q": "billing", "active": True}, headers=auth_headers)
+        assert [k["id"] for k in resp.json()["data"]] == [kept["id"]]
+
+        resp = client.get("/admin/api-keys", params={"prefix": kept["key_prefix"][:6]}, headers=auth_headers)
+        assert kept["id"] in [k["id"] for k in resp.json()["data"]]
+
+    def test_ambiguous_prefix_returns_409(self, client, auth_headers, tmp_db):
+        from iir.auth.apikey_db import add_api_key
+
+        add_api_key(tmp_db, "shared-prefix-one", "127.0.0.1")
+        add_api_key(tmp_db, "shared-prefix-two", "127.0.0.1")
+
+        assert client.delete("/admin/api-keys/shared-p", headers=auth_headers).status_code == 409
+        resp = client.delete("/admin/api-keys/shared-prefix-two", headers=auth_headers)
+        assert resp.status_code == 200
+
     def test_no_auth_returns_401(self, client):
         resp = client.get("/admin/api-keys")
         assert resp.status_code == 401
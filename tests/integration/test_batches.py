@@ -0,0 +1,99 @@
+"""Integration tests for the /v1/batches API."""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from iir.app import create_app
+from iir.auth.apikey_db import add_api_key
+
+BIFROST_URL = "http://localhost:8080/v1/chat/completions"
+BIFROST_RESPONSE = {"id": "chatcmpl-batch", "object": "chat.completion", "choices": []}
+
+
+def _jsonl(*texts: str) -> bytes:
+    lines = [
+        json.dumps({"custom_id": f"req-{i}", "method": "POST", "url": "/v1/chat/completions",
+                    "body": {"messages": [{"role": "user", "content": text}]}})
+        for i, text in enumerate(texts)
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _wait_for(client, batch_id, headers):
+    for _ in range(200):
+        data = client.get(f"/v1/batches/{batch_id}", headers=headers).json()
+        if data["status"] in ("completed", "failed", "cancelled"):
+            return data
+        time.sleep(0.01)
+    raise AssertionError("batch did not finish")
+
+
+class TestBatches:
+    def test_create_process_and_download(self, client, auth_headers, bifrost_mock):
+        bifrost_mock.post(BIFROST_URL).respond(200, json=BIFROST_RESPONSE)
+
+        resp = client.post("/v1/batches", content=_jsonl("Hello!", "Summarize this article"), headers=auth_headers)
+        assert resp.status_code == 200
+        batch = resp.json()
+        assert batch["object"] == "batch"
+
+        done = _wait_for(client, batch["id"], auth_headers)
+        assert done["status"] == "completed"
+        assert done["request_counts"] == {"total": 2, "completed": 2, "failed": 0}
+
+        output = client.get(f"/v1/batches/{batch['id']}/output", headers=auth_headers)
+        records = [json.loads(line) for line in output.text.splitlines()]
+        assert {r["custom_id"] for r in records} == {"req-0", "req-1"}
+        assert all(r["response"]["route"]["model"] == "ollama/llama3.2" for r in records)
+
+    def test_list_batches(self, client, auth_headers, bifrost_mock):
+        bifrost_mock.post(BIFROST_URL).respond(200, json=BIFROST_RESPONSE)
+        batch = client.post("/v1/batches", content=_jsonl("Hello!"), headers=auth_headers).json()
+
+        resp = client.get("/v1/batches", headers=auth_headers)
+        assert batch["id"] in {b["id"] for b in resp.json()["data"]}
+
+    def test_unknown_batch_returns_404(self, client, auth_headers):
+        assert client.get("/v1/batches/batch_nope", headers=auth_headers).status_code == 404
+        assert client.post("/v1/batches/batch_nope/cancel", headers=auth_headers).status_code == 404
+
+    def test_other_keys_cannot_see_a_batch(self, client, auth_headers, bifrost_mock, tmp_db):
+        bifrost_mock.post(BIFROST_URL).respond(200, json=BIFROST_RESPONSE)
+        batch = client.post("/v1/batches", content=_jsonl("Hello!"), headers=auth_headers).json()
+        _wait_for(client, batch["id"], auth_headers)
+
+        add_api_key(tmp_db, "other-key-456", "127.0.0.1", "other tenant")
+        other = {"Authorization": "Bearer other-key-456"}
+        assert client.get(f"/v1/batches/{batch['id']}", headers=other).status_code == 404
+        assert client.get(f"/v1/batches/{batch['id']}/output", headers=other).status_code == 404
+        assert client.post(f"/v1/batches/{batch['id']}/cancel", headers=other).status_code == 404
+        assert client.get("/v1/batches", headers=other).json()["data"] == []
+
+    def test_spent_budget_blocks_new_batches(self, client, auth_headers):
+        client.put("/admin/api-keys/test-key/budget", json={"budget_usd": 0.0}, headers=auth_headers)
+        resp = client.post("/v1/batches", content=_jsonl("Hello!"), headers=auth_headers)
+        assert resp.status_code == 429
+        assert resp.json()["error"]["code"] == "budget_exceeded"
+
+    def test_chunked_upload_is_capped(self, settings, auth_headers, bifrost_mock):
+        app = create_app(settings_override={**settings, "batch_max_upload_bytes": 1024})
+
+        def body():
+            for _ in range(20):
+                yield _jsonl("Hello!")
+
+        with TestClient(app) as client:
+            # A generator body is sent chunked, without a Content-Length for the middleware to check
+            resp = client.post("/v1/batches", content=body(), headers=auth_headers)
+            assert resp.status_code == 413
+            assert resp.json()["error"]["code"] == "request_too_large"
+            assert client.get("/v1/batches", headers=auth_headers).json()["data"] == []
+        assert list(Path(settings["batch_dir"]).iterdir()) == []
+
+    def test_no_auth_returns_401(self, client):
+        assert client.post("/v1/batches", content=_jsonl("Hello!")).status_code == 401
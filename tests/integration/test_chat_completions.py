@@ -340,3 +340,180 @@ class TestBifrostErrors:
 
         assert resp.status_code == 502
         assert "Gateway error" in resp.json()["error"]["message"]
+
+
+# ---------------------------------------------------------------------------
+# Usage ledger and budgets
+# ---------------------------------------------------------------------------
+
+
+class TestUsageAndBudgets:
+    def test_usage_is_attributed_to_key(self, client, auth_headers, bifrost_mock):
+        bifrost_mock.post(BIFROST_URL).respond(200, json=BIFROST_CHAT_RESPONSE)
+
+        client.post("/v1/chat/completions", json=_msg("What is the capital of France?"), headers=auth_headers)
+        usage = client.get("/admin/usage", headers=auth_headers).json()
+
+        row = next(r for r in usage["data"] if r["key_prefix"] == "test-key")
+        assert row["requests"] == 1
+        assert row["prompt_tokens"] == 10
+        assert row["completion_tokens"] == 8
+
+    def test_streamed_usage_from_final_chunk(self, client, auth_headers, bifrost_mock):
+        chunks = [
+            {"choices": [{"index": 0, "delta": {"content": "Hi"}}]},
+            {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 2, "total_tokens": 9}},
+        ]
+        sse = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+        route = bifrost_mock.post(BIFROST_URL).respond(200, text=sse, headers={"content-type": "text/event-stream"})
+
+        resp = client.post("/v1/chat/completions", json={**_msg("Hello!"), "stream": True}, headers=auth_headers)
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        assert json.loads(route.calls[0].request.content)["stream_options"] == {"include_usage": True}
+        usage = client.get("/admin/usage", headers=auth_headers).json()
+        assert usage["data"][0]["completion_tokens"] == 2
+
+    def test_spent_budget_rejects_with_429(self, client, auth_headers, bifrost_mock):
+        bifrost_mock.post(BIFROST_URL).respond(
+            200, json={**BIFROST_CHAT_RESPONSE, "usage": {"prompt_tokens": 1_000_000, "completion_tokens": 0}}
+        )
+        client.put("/admin/api-keys/test-key/budget", json={"budget_usd": 1.0}, headers=auth_headers)
+        prompt = _msg("Write a Python function to sort a list")
+
+        first = client.post("/v1/chat/completions", json=prompt, headers=auth_headers)
+        second = client.post("/v1/chat/completions", json=prompt, headers=auth_headers)
+
+        assert first.status_code == 200
+        assert second.status_code == 429
+        assert second.json()["error"]["code"] == "budget_exceeded"
+
+
+class TestAuditLog:
+    def test_request_is_audited(self, app, settings, auth_headers, bifrost_mock):
+        import gzip
+        from pathlib import Path
+
+        from fastapi.testclient import TestClient
+
+        bifrost_mock.post(BIFROST_URL).respond(200, json=BIFROST_CHAT_RESPONSE)
+        with TestClient(app) as client:
+            client.post("/v1/chat/completions", json=_msg("Hello!"), headers=auth_headers)
+
+        (path,) = Path(settings["audit_dir"]).glob("audit-*.jsonl.gz")
+        with gzip.open(path, "rt") as f:
+            record = json.loads(f.readline())
+        assert record["key"] == "test-key"
+        assert record["model"] == "ollama/llama3.2"
+        assert record["category"] == "simple_chat"
+        assert record["status"] == 200
+        assert record["prompt_tokens"] == 10
+        assert record["latency_ms"] >= record["upstream_ms"]
+        assert "messages" not in record  # prompts are kept only on request
+
+    def test_rejected_requests_are_audited(self, app, settings, auth_headers, bifrost_mock):
+        import gzip
+        from pathlib import Path
+
+        from fastapi.testclient import TestClient
+
+        from iir.config import Settings
+
+        headers = {**auth_headers, "Content-Type": "application/json"}
+        too_large = b"x" * (Settings(**settings).max_body_size + 1)
+        with TestClient(app) as client:
+            assert client.post("/v1/chat/completions", content=b"{not json", headers=headers).status_code == 422
+            assert client.post("/v1/chat/completions", content=too_large, headers=headers).status_code == 413
+
+        (path,) = Path(settings["audit_dir"]).glob("audit-*.jsonl.gz")
+        with gzip.open(path, "rt") as f:
+            records = [json.loads(line) for line in f]
+        assert [r["status"] for r in records] == [422, 413]
+        assert all(r["key"] == "test-key" and "latency_ms" in r for r in records)
+        assert "model" not in records[0]
+
+
+class TestCacheWarmup:
+    def test_startup_warms_classification_cache(self, settings, tmp_path):
+        import asyncio
+
+        from fastapi.testclient import TestClient
+
+        from iir.app import create_app
+        from iir.cache.keys import classification_cache_key
+
+        messages = [{"role": "user", "content": "Write a Python function to reverse a list"}]
+        corpus = tmp_path / "prompts.jsonl"
+        corpus.write_text(json.dumps({"messages": messages}) + "\n")
+        app = create_app(settings_override={**settings, "warmup_enabled": True, "warmup_source": str(corpus)})
+
+        with TestClient(app):
+            cached = asyncio.run(app.state.cache.get(classification_cache_key(messages)))
+        assert cached == "coding"
+
+
+class TestVisionPayloads:
+    IMAGE = "data:image/png;base64," + "iVBORw0KGgo" * 1000  # ~11 KB, above max_body_size below
+
+    @pytest.fixture
+    def settings(self, settings):
+        return {**settings, "max_body_size": 4096, "vision_max_body_size": 65536}
+
+    def _vision_body(self, text: str = "What is in this picture?") -> bytes:
+        return json.dumps({
+            "messages": [{"role": "user", "content": [
+                {"type": "text", "text": text},
+                {"type": "image_url", "image_url": {"url": self.IMAGE, "detail": "high"}},
+            ]}],
+            "temperature": None,
+            "max_tokens": 50,
+        }).encode()
+
+    def test_large_image_request_is_forwarded_unchanged(self, client, auth_headers, bifrost_mock):
+        bifrost_mock.post(BIFROST_URL).respond(200, json=BIFROST_CHAT_RESPONSE)
+        raw = self._vision_body("Qu'y a-t-il sur cette image ? ")
+
+        resp = client.post("/v1/chat/completions", content=raw, headers={**auth_headers, "Content-Type": "application/json"})
+
+        assert resp.status_code == 200
+        assert resp.headers["X-Classification"] == "vision"
+        sent_raw = bifrost_mock.calls.last.request.content
+        assert bifrost_mock.calls.last.request.headers["content-length"] == str(len(sent_raw))
+        assert "transfer-encoding" not in bifrost_mock.calls.last.request.headers
+        sent = json.loads(sent_raw)
+        assert sent["model"] == resp.headers["X-Route-Model"]
+        assert "temperature" not in sent  # nulls are dropped, as before
+        # The messages array reaches Bifrost as the exact bytes the client sent
+        original_messages = raw[raw.index(b"["):raw.index(b', "temperature"')]
+        assert original_messages in sent_raw
+
+    def test_large_text_request_is_rejected(self, client, auth_headers, bifrost_mock):
+        resp = client.post("/v1/chat/completions", json=_msg("x" * 8000), headers=auth_headers)
+
+        assert resp.status_code == 413
+        assert resp.json()["error"]["code"] == "request_too_large"
+        assert not bifrost_mock.calls
+
+    def test_large_text_body_is_rejected_before_parsing(self, client, auth_headers, bifrost_mock):
+        body = b'{"messages": ' + b"x" * 8000  # not even JSON: a parse would answer 422
+
+        resp = client.post("/v1/chat/completions", content=body, headers={**auth_headers, "Content-Type": "application/json"})
+
+        assert resp.status_code == 413
+        assert "max 4096 bytes" in resp.json()["error"]["message"]
+
+    def test_above_vision_limit_is_rejected(self, client, auth_headers, bifrost_mock):
+        body = self._vision_body().replace(b"iVBORw0KGgo", b"iVBORw0KGgo" * 8)
+
+        resp = client.post("/v1/chat/completions", content=body, headers={**auth_headers, "Content-Type": "application/json"})
+
+        assert resp.status_code == 413
+
+    def test_invalid_bodies_return_422(self, client, auth_headers, bifrost_mock):
+        headers = {**auth_headers, "Content-Type": "application/json"}
+
+        assert client.post("/v1/chat/completions", content=b"{not json", headers=headers).status_code == 422
+        resp = client.post("/v1/chat/completions", json={"model": "x"}, headers=headers)
+        assert resp.status_code == 422
+        assert resp.json()["detail"][0]["loc"] == ["body", "messages"]
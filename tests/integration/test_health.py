@@ -0,0 +1,43 @@
+"""Integration tests for the health endpoints."""
+
+from __future__ import annotations
+
+import time
+
+from fastapi.testclient import TestClient
+
+BIFROST_HEALTH = "http://localhost:8080/health"
+
+
+def _wait_for(client: TestClient, path: str, status: int) -> dict:
+    for _ in range(100):
+        resp = client.get(path)
+        if resp.status_code == status:
+            return resp.json()
+        time.sleep(0.01)
+    raise AssertionError(f"{path} never returned {status}")
+
+
+class TestHealth:
+    def test_ready_when_critical_dependencies_are_up(self, app, bifrost_mock):
+        bifrost_mock.get(BIFROST_HEALTH).respond(200)
+        with TestClient(app) as client:
+            body = _wait_for(client, "/health/ready", 200)
+
+        assert body["checks"]["bifrost"]["status"] == "up"
+        assert body["checks"]["auth_db"]["status"] == "up"
+        # Redis is down in tests, but the memory fallback keeps the worker ready
+        assert body["checks"]["redis"]["critical"] is False
+
+    def test_unready_when_bifrost_is_down(self, app, bifrost_mock):
+        route = bifrost_mock.get(BIFROST_HEALTH).respond(503)
+        with TestClient(app) as client:
+            body = _wait_for(client, "/health/ready", 503)
+            calls = route.call_count
+            for _ in range(5):
+                assert client.get("/health").json()["bifrost"] == "unreachable"
+            assert client.get("/health/live").status_code == 200
+
+        assert body["checks"]["bifrost"]["status"] == "down"
+        # Probes are served from memory, not forwarded upstream
+        assert route.call_count == calls
@@ -38,3 +38,17 @@ class TestListModels:
     def test_no_auth_returns_401(self, client):
         resp = client.get("/v1/models")
         assert resp.status_code == 401
+
+    def test_etag_revalidation(self, client, auth_headers):
+        first = client.get("/v1/models", headers=auth_headers)
+        etag = first.headers["etag"]
+        assert etag.startswith('"') and first.headers["cache-control"] == "private, no-cache"
+
+        cached = client.get("/v1/models", headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == etag
+
+        stale = client.get("/v1/models", headers={**auth_headers, "If-None-Match": '"other"'})
+        assert stale.status_code == 200
+        assert stale.json() == first.json()
@@ -0,0 +1,114 @@
+"""Tests for the priority-aware admission scheduler."""
+
+import asyncio
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from iir.bifrost_client.admission import AdmissionScheduler
+from iir.observability.metrics import Metrics
+
+
+async def _queue(scheduler, order, name, provider="openai", priority=0):
+    await scheduler.acquire(provider, priority)
+    order.append(name)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_admits_immediately_under_limit():
+    scheduler = AdmissionScheduler(max_concurrency=2)
+    await scheduler.acquire("openai")
+    await scheduler.acquire("groq")
+    assert scheduler.in_flight == 2
+    assert scheduler.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_admitted_first():
+    scheduler = AdmissionScheduler(max_concurrency=1)
+    await scheduler.acquire("openai")
+    order: list[str] = []
+    low = asyncio.create_task(_queue(scheduler, order, "low", priority=0))
+    await _settle()
+    high = asyncio.create_task(_queue(scheduler, order, "high", priority=3))
+    await _settle()
+    assert scheduler.queue_depth() == 2
+
+    scheduler.release("openai")
+    await _settle()
+    assert order == ["high"]
+    scheduler.release("openai")
+    await asyncio.gather(low, high)
+    assert order == ["high", "low"]
+
+
+@pytest.mark.asyncio
+async def test_low_priority_not_starved():
+    scheduler = AdmissionScheduler(max_concurrency=1, aging_seconds=3600)
+    await scheduler.acquire("openai")
+    order: list[str] = []
+    tasks = [asyncio.create_task(_queue(scheduler, order, f"low{i}", priority=0)) for i in range(4)]
+    tasks += [asyncio.create_task(_queue(scheduler, order, f"high{i}", priority=1)) for i in range(8)]
+    await _settle()
+
+    for _ in range(12):
+        scheduler.release("openai")
+        await _settle()
+    await asyncio.gather(*tasks)
+
+    # Weight 2:1 — lows are interleaved with highs instead of waiting for all eight
+    assert order.index("low0") < order.index("high7")
+    assert order.index("low1") < order.index("high7")
+
+
+@pytest.mark.asyncio
+async def test_aging_favours_long_waiters():
+    scheduler = AdmissionScheduler(max_concurrency=1, aging_seconds=0.001)
+    await scheduler.acquire("openai")
+    order: list[str] = []
+    low = asyncio.create_task(_queue(scheduler, order, "low", priority=0))
+    await asyncio.sleep(0.02)
+    high = asyncio.create_task(_queue(scheduler, order, "high", priority=3))
+    await _settle()
+
+    scheduler.release("openai")
+    await _settle()
+    assert order == ["low"]
+    scheduler.release("openai")
+    await asyncio.gather(low, high)
+
+
+@pytest.mark.asyncio
+async def test_provider_limit_isolated():
+    scheduler = AdmissionScheduler(max_concurrency=10, provider_limits={"ollama": 1})
+    await scheduler.acquire("ollama")
+    waiting = asyncio.create_task(scheduler.acquire("ollama"))
+    await _settle()
+    assert not waiting.done()
+
+    await asyncio.wait_for(scheduler.acquire("openai"), timeout=1)
+    scheduler.release("ollama")
+    await asyncio.wait_for(waiting, timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_releases_queue_position():
+    registry = CollectorRegistry()
+    scheduler = AdmissionScheduler(max_concurrency=1, metrics=Metrics(registry=registry))
+    await scheduler.acquire("openai")
+    waiting = asyncio.create_task(scheduler.acquire("openai"))
+    await _settle()
+    assert registry.get_sample_value("iir_admission_queue_depth", {"provider": "openai"}) == 1
+
+    waiting.cancel()
+    await _settle()
+    assert scheduler.queue_depth() == 0
+    scheduler.release("openai")
+    assert scheduler.in_flight == 0
+    await asyncio.wait_for(scheduler.acquire("openai"), timeout=1)
+    assert registry.get_sample_value("iir_admission_queue_depth", {"provider": "openai"}) == 0
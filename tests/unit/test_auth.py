@@ -1,8 +1,25 @@
 """Tests for API key auth."""
 
+import sqlite3
+import threading
+import time
+
 import pytest
 
-from iir.auth.apikey_db import add_api_key, get_api_key, init_db, list_api_keys, revoke_api_key
+from iir.auth import apikey_db
+from iir.auth.apikey_db import (
+    add_api_key,
+    add_usage,
+    check_db,
+    find_api_keys,
+    get_api_key,
+    get_db,
+    get_usage,
+    init_db,
+    list_api_keys,
+    load_budgets,
+    revoke_api_key,
+)
 
 
 @pytest.fixture
@@ -16,7 +33,21 @@ def test_add_and_get(db):
     add_api_key(db, "abc123", "127.0.0.1", "test key")
     row = get_api_key(db, "abc123")
     assert row is not None
-    assert row["key"] == "abc123"
+    assert row["key_prefix"] == "abc123"
+    assert "key_hash" not in row
+
+
+def test_key_is_not_stored_in_plaintext(db):
+    add_api_key(db, "sk-plaintext-secret", "127.0.0.1")
+    with get_db(db) as conn:
+        dump = "\n".join(conn.iterdump())
+    assert "sk-plaintext-secret" not in dump
+
+
+def test_same_prefix_different_key(db):
+    add_api_key(db, "prefix00-aaaa", "127.0.0.1")
+    assert get_api_key(db, "prefix00-bbbb") is None
+    assert get_api_key(db, "prefix00-aaaa") is not None
 
 
 def test_get_missing(db):
@@ -24,8 +55,8 @@ def test_get_missing(db):
 
 
 def test_revoke(db):
-    add_api_key(db, "abc123", "127.0.0.1")
-    revoke_api_key(db, "abc123")
+    key_id = add_api_key(db, "abc123", "127.0.0.1")
+    revoke_api_key(db, key_id)
     assert get_api_key(db, "abc123") is None
 
 
@@ -38,6 +69,115 @@ def test_list(db):
 
 def test_duplicate_insert_ignored(db):
     add_api_key(db, "abc123", "127.0.0.1")
-    add_api_key(db, "abc123", "192.168.1.1")  # should not raise
+    assert add_api_key(db, "abc123", "192.168.1.1") is None  # should not raise
     keys = list_api_keys(db)
     assert len(keys) == 1
+
+
+def test_list_pages_by_id(db):
+    for i in range(5):
+        add_api_key(db, f"key{i}", "127.0.0.1", f"key number {i}")
+    first = list_api_keys(db, limit=2)
+    second = list_api_keys(db, limit=2, after_id=first[-1]["id"])
+    assert [k["key_prefix"] for k in first + second] == ["key0", "key1", "key2", "key3"]
+    assert [k["key_prefix"] for k in list_api_keys(db, description="number 4")] == ["key4"]
+
+
+def test_find_by_prefix(db):
+    add_api_key(db, "team-a-0001-secret", "127.0.0.1")
+    add_api_key(db, "team-a-0002-secret", "127.0.0.1")
+    add_api_key(db, "team-b-0001-secret", "127.0.0.1")
+    assert len(find_api_keys(db, "team-a")) == 2
+    assert len(find_api_keys(db, "team-")) == 3
+    assert [k["key_prefix"] for k in find_api_keys(db, "team-a-0002-secret")] == ["team-a-0"]
+    assert find_api_keys(db, "team-a-0002-wrong") == []
+
+
+def _legacy_db(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE api_keys (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE NOT NULL, "
+            "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_used_at TIMESTAMP, created_ip TEXT, description TEXT, "
+            "priority INTEGER DEFAULT 0, active BOOLEAN DEFAULT 1, revoked_at TIMESTAMP, is_superadmin BOOLEAN DEFAULT 0)"
+        )
+        conn.execute("INSERT INTO api_keys (key, created_ip, priority) VALUES ('legacy-key-1', 'x', 3)")
+        conn.execute(
+            "CREATE TABLE api_key_usage (key TEXT NOT NULL, period TEXT NOT NULL, requests INTEGER NOT NULL DEFAULT 0, "
+            "prompt_tokens INTEGER NOT NULL DEFAULT 0, completion_tokens INTEGER NOT NULL DEFAULT 0, "
+            "cost_usd REAL NOT NULL DEFAULT 0, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (key, period))"
+        )
+        conn.execute("INSERT INTO api_key_usage (key, period, requests, cost_usd) VALUES ('legacy-key-1', '2026-01', 2, 1.5)")
+
+
+def test_migrates_plaintext_keys(tmp_path):
+    path = str(tmp_path / "legacy.sqlite3")
+    _legacy_db(path)
+
+    init_db(path)
+    init_db(path)  # idempotent
+
+    row = get_api_key(path, "legacy-key-1")
+    assert row is not None and row["priority"] == 3 and row["key_prefix"] == "legacy-k"
+    usage = get_usage(path, "2026-01")
+    assert usage[str(row["id"])]["key_prefix"] == "legacy-k"
+    assert load_budgets(path) == {}
+
+
+def test_failed_migration_leaves_the_plaintext_table(tmp_path, monkeypatch):
+    path = str(tmp_path / "legacy.sqlite3")
+    _legacy_db(path)
+
+    def crash(key, salt):
+        raise RuntimeError("crash mid-migration")
+
+    monkeypatch.setattr("iir.auth.apikey_db.hash_key", crash)
+    with pytest.raises(RuntimeError):
+        init_db(path)
+
+    with sqlite3.connect(path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "api_keys_plaintext" not in tables
+        assert conn.execute("SELECT key FROM api_keys").fetchall() == [("legacy-key-1",)]
+
+    monkeypatch.undo()
+    init_db(path)
+    assert get_api_key(path, "legacy-key-1") is not None
+
+
+def test_lookups_do_not_wait_for_another_writer(db, monkeypatch):
+    add_api_key(db, "sk-reader", "127.0.0.1")
+    monkeypatch.setattr(apikey_db, "BUSY_TIMEOUT_SECONDS", 0.1)
+    writer = sqlite3.connect(db)  # another worker, mid-transaction
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("UPDATE api_keys SET description = 'busy'")
+    try:
+        started = time.monotonic()
+        assert get_api_key(db, "sk-reader") is not None
+        assert time.monotonic() - started < 0.05
+
+        # A flush from a worker thread gives up after the short busy timeout, holding no lock of ours
+        errors: list[Exception] = []
+
+        def flush():
+            try:
+                add_usage(db, [("1", "2026-01", 1, 1, 1, 0.1)])
+            except sqlite3.OperationalError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=flush)
+        thread.start()
+        time.sleep(0.02)  # the flush is now waiting for the write lock
+        started = time.monotonic()
+        assert get_api_key(db, "sk-reader") is not None
+        assert time.monotonic() - started < 0.05
+        thread.join(2)
+        assert errors and "locked" in str(errors[0])
+    finally:
+        writer.rollback()
+        writer.close()
+
+
+def test_check_db(db, tmp_path):
+    assert check_db(db)
+    with pytest.raises(sqlite3.OperationalError):
+        check_db(tmp_path / "empty.sqlite3")
@@ -0,0 +1,222 @@
+"""Tests for the batch manager."""
+
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+from prometheus_client import CollectorRegistry
+
+from iir.auth.apikey_db import get_usage
+from iir.batch import manager as batch_manager
+from iir.batch.manager import BatchManager, BatchState
+from iir.bifrost_client.limiter import ProviderOverloadedError
+from iir.cache.memory_cache import MemoryCache
+from iir.classifier.base import HybridClassifier
+from iir.classifier.rules import RulesClassifier
+from iir.observability.metrics import Metrics
+from iir.routing.engine import RoutingEngine
+from iir.routing.model_registry import ModelRegistry
+from iir.usage.ledger import UsageLedger, current_period
+
+
+class _StubBifrost:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.payloads: list[dict] = []
+
+    async def chat_completion(self, payload, *, provider, priority=0):
+        self.payloads.append(payload)
+        usage = {"prompt_tokens": 10, "completion_tokens": 5}
+        return httpx.Response(200, json={"id": "chatcmpl-1", "choices": [], "usage": usage})
+
+
+@pytest.fixture
+def engine():
+    registry = ModelRegistry()
+    registry.load_from_yaml("config/models.yaml")
+    return RoutingEngine(
+        registry=registry,
+        classifier=HybridClassifier(RulesClassifier(), strategy="rules_only"),
+        cache=MemoryCache(),
+        metrics=Metrics(registry=CollectorRegistry()),
+    )
+
+
+def _line(custom_id: str, text: str = "Hello!") -> bytes:
+    item = {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {"messages": [{"role": "user", "content": text}]},
+    }
+    return (json.dumps(item) + "\n").encode()
+
+
+async def _chunks(*lines: bytes):
+    for line in lines:
+        yield line
+
+
+async def _wait(manager: BatchManager, batch_id: str) -> BatchState:
+    for _ in range(200):
+        state = manager.get(batch_id)
+        if state.status in ("completed", "failed", "cancelled"):
+            return state
+        await asyncio.sleep(0.01)
+    raise AssertionError("batch did not finish")
+
+
+@pytest.mark.asyncio
+async def test_batch_completes_and_writes_output(tmp_path, engine):
+    bifrost = _StubBifrost()
+    manager = BatchManager(tmp_path, engine, bifrost, concurrency=2)
+    await manager.start()
+
+    state = await manager.create(_chunks(_line("a"), _line("b", "Write a Python function to sort a list")))
+    state = await _wait(manager, state.id)
+
+    assert state.status == "completed"
+    assert (state.total, state.completed, state.failed) == (2, 2, 0)
+    records = [json.loads(line) for line in manager.output_path(state.id).read_text().splitlines()]
+    assert {r["custom_id"] for r in records} == {"a", "b"}
+    assert all(p["stream"] is False for p in bifrost.payloads)
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_invalid_input_fails_validation(tmp_path, engine):
+    manager = BatchManager(tmp_path, engine, _StubBifrost())
+    await manager.start()
+
+    state = await manager.create(_chunks(_line("a"), _line("a"), b"not json\n"))
+    state = await _wait(manager, state.id)
+
+    assert state.status == "failed"
+    assert any("duplicate" in e for e in state.errors)
+    assert any("invalid JSON" in e for e in state.errors)
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_items_already_in_output(tmp_path, engine):
+    batch_dir = tmp_path / "batch_resume"
+    batch_dir.mkdir()
+    (batch_dir / "input.jsonl").write_bytes(_line("a") + _line("b"))
+    done = {"custom_id": "a", "response": {"status_code": 200, "body": {}}, "error": None}
+    (batch_dir / "output.jsonl").write_text(json.dumps(done) + "\n")
+    state = BatchState(id="batch_resume", status="in_progress", total=2, created_at=1)
+    (batch_dir / "state.json").write_text(json.dumps(state.__dict__))
+
+    bifrost = _StubBifrost()
+    manager = BatchManager(tmp_path, engine, bifrost)
+    await manager.start()
+    state = await _wait(manager, "batch_resume")
+
+    assert state.status == "completed"
+    assert state.completed == 2
+    assert len(bifrost.payloads) == 1
+
+
+@pytest.mark.asyncio
+async def test_resume_drops_torn_last_line(tmp_path, engine):
+    batch_dir = tmp_path / "batch_torn"
+    batch_dir.mkdir()
+    (batch_dir / "input.jsonl").write_bytes(_line("a") + _line("b"))
+    done = {"custom_id": "a", "response": {"status_code": 200, "body": {}}, "error": None}
+    (batch_dir / "output.jsonl").write_text(json.dumps(done) + '\n{"custom_id": "b", "resp')
+    state = BatchState(id="batch_torn", status="in_progress", total=2, created_at=1)
+    (batch_dir / "state.json").write_text(json.dumps(state.__dict__))
+
+    manager = BatchManager(tmp_path, engine, _StubBifrost())
+    await manager.start()
+    state = await _wait(manager, "batch_torn")
+
+    records = [json.loads(line) for line in manager.output_path(state.id).read_text().splitlines()]
+    assert [r["custom_id"] for r in records] == ["a", "b"]
+    assert state.completed == 2
+
+
+@pytest.mark.asyncio
+async def test_batches_are_scoped_to_their_owner(tmp_path, engine):
+    manager = BatchManager(tmp_path, engine, _StubBifrost())
+    await manager.start()
+    state = await manager.create(_chunks(_line("a")), owner="1")
+    await _wait(manager, state.id)
+
+    assert manager.get(state.id, owner="1") is state
+    assert manager.get(state.id, owner="2") is None
+    assert manager.cancel(state.id, owner="2") is None
+    assert manager.list_batches(owner="2") == []
+    assert manager.list_batches(owner="1") == [state]
+    assert "owner" not in state.to_dict()
+
+
+@pytest.mark.asyncio
+async def test_overloaded_item_fails_after_bounded_retries(tmp_path, engine, monkeypatch):
+    class _Overloaded(_StubBifrost):
+        async def chat_completion(self, payload, *, provider, priority=0):
+            self.payloads.append(payload)
+            raise ProviderOverloadedError("ollama")
+
+    monkeypatch.setattr(batch_manager, "_OVERLOAD_RETRY_SECONDS", 0.0)
+    bifrost = _Overloaded()
+    manager = BatchManager(tmp_path, engine, bifrost)
+    await manager.start()
+    state = await _wait(manager, (await manager.create(_chunks(_line("a")))).id)
+
+    assert (state.status, state.failed) == ("completed", 1)
+    assert len(bifrost.payloads) == batch_manager._MAX_OVERLOAD_RETRIES + 1
+
+
+@pytest.mark.asyncio
+async def test_items_are_billed_to_the_owner_and_stop_at_its_budget(tmp_path, tmp_db, engine):
+    ledger = UsageLedger(tmp_db, engine.registry, flush_interval=3600)
+    await ledger.start()
+    bifrost = _StubBifrost()
+    manager = BatchManager(tmp_path / "batches", engine, bifrost, ledger=ledger)
+    await manager.start()
+
+    state = await _wait(manager, (await manager.create(_chunks(_line("a"), _line("b")), owner="1")).id)
+    await ledger.flush()
+    row = get_usage(tmp_db, current_period())["1"]
+    assert (state.completed, row["requests"], row["prompt_tokens"]) == (2, 2, 20)
+
+    ledger.set_budget("1", 0.0)
+    state = await _wait(manager, (await manager.create(_chunks(_line("c")), owner="1")).id)
+    record = json.loads(manager.output_path(state.id).read_text())
+    assert state.failed == 1
+    assert record["error"]["code"] == "budget_exceeded"
+    assert len(bifrost.payloads) == 2
+    await ledger.close()
+
+
+@pytest.mark.asyncio
+async def test_cancel_during_validation_is_not_lost(tmp_path, engine, monkeypatch):
+    bifrost = _StubBifrost()
+    manager = BatchManager(tmp_path, engine, bifrost)
+    validating, release = threading.Event(), threading.Event()
+    validate = manager._validate
+
+    def slow_validate(state):
+        validating.set()
+        release.wait(5)
+        return validate(state)
+
+    monkeypatch.setattr(manager, "_validate", slow_validate)
+    state = await manager.create(_chunks(_line("a"), _line("b")))
+    await asyncio.to_thread(validating.wait, 5)
+    assert manager.cancel(state.id).status == "cancelling"
+    release.set()
+
+    state = await _wait(manager, state.id)
+    assert state.status == "cancelled"
+    assert state.completed_at is not None
+    assert bifrost.payloads == []
+    assert json.loads((tmp_path / state.id / "state.json").read_text())["status"] == "cancelled"
+
+
+@pytest.mark.asyncio
+async def test_cancel_unknown_batch(tmp_path, engine):
+    manager = BatchManager(tmp_path, engine, _StubBifrost())
+    assert manager.cancel("batch_missing") is None
@@ -0,0 +1,91 @@
+"""Tests for BifrostClient connection pools."""
+
+import asyncio
+
+import pytest
+import respx
+from prometheus_client import CollectorRegistry
+
+from iir.bifrost_client.client import DEFAULT_POOL, BifrostClient, PoolConfig
+from iir.observability.metrics import Metrics
+
+BASE = "http://bifrost.test"
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+@pytest.fixture
+async def client(registry):
+    c = BifrostClient(
+        BASE,
+        provider_pools={"ollama": PoolConfig(max_connections=4, max_keepalive_connections=2)},
+        http2=True,
+        metrics=Metrics(registry=registry),
+    )
+    await c.start()
+    yield c
+    await c.close()
+
+
+def test_pool_config_overrides():
+    config = PoolConfig().with_overrides({"max_connections": 5, "connect_timeout": 1.0})
+    assert config.max_connections == 5
+    assert config.connect_timeout == 1.0
+    assert config.keepalive_expiry == PoolConfig().keepalive_expiry
+
+
+@pytest.mark.asyncio
+async def test_provider_gets_own_pool(client):
+    assert client.pool_name("ollama") == "ollama"
+    assert client.pool_name("openai") == DEFAULT_POOL
+    assert client._pools["ollama"] is not client.client
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics_are_sampled_off_the_request_path(registry):
+    metrics = Metrics(registry=registry)
+    c = BifrostClient(BASE, provider_pools={"ollama": PoolConfig(max_connections=4)}, metrics=metrics, pool_stats_interval=0.01)
+    await c.start()
+    try:
+        # Children are bound at construction; a request never looks up labels
+        def unexpected(*args, **kwargs):
+            raise AssertionError("labels() on the request path")
+
+        for gauge in (metrics.bifrost_pool_in_flight, metrics.bifrost_pool_connections, metrics.bifrost_pool_utilization):
+            gauge.labels = unexpected
+        with respx.mock:
+            respx.post(f"{BASE}/v1/chat/completions").respond(200, json={})
+            await c.chat_completion({"model": "ollama/llama3.2", "messages": []}, provider="ollama")
+        await asyncio.sleep(0.05)
+    finally:
+        await c.close()
+
+    assert registry.get_sample_value("iir_bifrost_pool_in_flight", {"pool": "ollama"}) == 0
+    assert registry.get_sample_value("iir_bifrost_pool_utilization", {"pool": "ollama"}) is not None
+    assert c.pool_stats("ollama")["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_connection_pools_are_found(client):
+    # Connection counts come from httpx's private transport pool; fail here if an upgrade moves it
+    assert set(client._connection_pools) == {DEFAULT_POOL, "ollama"}
+
+
+@pytest.mark.asyncio
+async def test_prewarm_touches_every_pool(client):
+    with respx.mock:
+        route = respx.get(f"{BASE}/health").respond(200)
+        await client.prewarm(3)
+    # default pool: min(3, 20) requests; ollama pool: min(3, 2)
+    assert route.call_count == 5
+
+
+@pytest.mark.asyncio
+async def test_prewarm_disabled(client):
+    with respx.mock(assert_all_called=False):
+        route = respx.get(f"{BASE}/health").respond(200)
+        await client.prewarm(0)
+    assert route.call_count == 0
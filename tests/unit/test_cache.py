@@ -2,6 +2,7 @@
 
 import pytest
 
+from iir.cache.keys import conversation_cache_keys
 from iir.cache.memory_cache import MemoryCache
 
 
@@ -33,3 +34,45 @@ async def test_close_clears():
     await cache.set("key1", "value", ttl=60)
     await cache.close()
     assert await cache.get("key1") is None
+
+
+def _turns(*texts: str) -> list[dict]:
+    messages = []
+    for text in texts:
+        if messages:
+            messages.append({"role": "assistant", "content": "ok"})
+        messages.append({"role": "user", "content": text})
+    return messages
+
+
+def test_conversation_keys_single_turn():
+    previous, current = conversation_cache_keys(_turns("hello"))
+    assert previous is None
+    assert current.startswith("classify:")
+
+
+def test_conversation_keys_chain_to_previous_turn():
+    _, first = conversation_cache_keys(_turns("fix my code"))
+    previous, second = conversation_cache_keys(_turns("fix my code", "and now add tests"))
+    assert previous == first
+    assert second != first
+
+
+def test_same_followup_in_different_conversations_does_not_collide():
+    _, a = conversation_cache_keys(_turns("write a poem", "make it shorter"))
+    _, b = conversation_cache_keys(_turns("debug this function", "make it shorter"))
+    assert a != b
+
+
+def test_images_are_hashed_by_url():
+    def image(url: str) -> list[dict]:
+        return [{"role": "user", "content": [
+            {"type": "text", "text": "describe"},
+            {"type": "image_url", "image_url": {"url": url}},
+        ]}]
+
+    _, a = conversation_cache_keys(image("data:image/png;base64,AAAA"))
+    _, b = conversation_cache_keys(image("data:image/png;base64,AAAA"))
+    _, c = conversation_cache_keys(image("data:image/png;base64,BBBB"))
+    assert a == b
+    assert a != c
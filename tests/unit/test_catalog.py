@@ -0,0 +1,74 @@
+"""Tests for the precomputed /v1/models catalog."""
+
+from __future__ import annotations
+
+import json
+
+import httpx
+import respx
+
+from iir.bifrost_client.client import BifrostClient
+from iir.routing.catalog import ModelCatalog
+from iir.routing.model_registry import ModelRegistry
+
+BASE = "http://bifrost:8080"
+
+
+def _registry() -> ModelRegistry:
+    registry = ModelRegistry()
+    registry.load_from_yaml("config/models.yaml")
+    return registry
+
+
+def test_render_is_cached_per_registry_version():
+    registry = _registry()
+    catalog = ModelCatalog(registry)
+
+    body, etag = catalog.render()
+    assert catalog.render()[0] is body
+    assert all("available" not in m for m in json.loads(body)["data"])
+
+    registry.load_from_yaml("config/models.yaml")
+    rebuilt, same_etag = catalog.render()
+    assert rebuilt is not body
+    assert same_etag == etag  # same content, same strong ETag
+
+
+@respx.mock
+async def test_merges_bifrost_catalog():
+    respx.get(f"{BASE}/v1/models").respond(200, json={"data": [
+        {"id": "openai/gpt-4o", "object": "model", "owned_by": "openai"},
+        {"id": "mistral/mistral-large", "object": "model", "owned_by": "mistral"},
+    ]})
+    bifrost = BifrostClient(BASE)
+    await bifrost.start()
+    catalog = ModelCatalog(_registry(), bifrost, refresh_interval=60)
+    _, before = catalog.render()
+
+    await catalog.refresh()
+    body, after = catalog.render()
+
+    models = {m["id"]: m for m in json.loads(body)["data"]}
+    assert after != before
+    assert models["openai/gpt-4o"]["available"] is True
+    assert models["ollama/llama3.2"]["available"] is False
+    assert models["ollama/llama3.2"]["configured"] is True
+    assert models["mistral/mistral-large"] == {
+        "id": "mistral/mistral-large", "object": "model", "provider": "mistral", "configured": False, "available": True,
+    }
+    await bifrost.close()
+
+
+@respx.mock
+async def test_failed_refresh_keeps_last_catalog():
+    route = respx.get(f"{BASE}/v1/models").respond(200, json={"data": [{"id": "openai/gpt-4o"}]})
+    bifrost = BifrostClient(BASE)
+    await bifrost.start()
+    catalog = ModelCatalog(_registry(), bifrost, refresh_interval=60)
+    await catalog.refresh()
+    body, etag = catalog.render()
+
+    route.mock(side_effect=httpx.ConnectError("refused"))
+    await catalog.refresh()
+    assert catalog.render() == (body, etag)
+    await bifrost.close()
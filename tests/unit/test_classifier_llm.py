@@ -0,0 +1,93 @@
+"""Tests for the Ollama LLM classifier."""
+
+from __future__ import annotations
+
+import json
+import math
+
+import httpx
+import pytest
+import respx
+
+from iir.classifier.base import HybridClassifier
+from iir.classifier.categories import TaskCategory
+from iir.classifier.llm_classifier import LLMClassifier
+from iir.classifier.rules import RulesClassifier
+
+OLLAMA = "http://ollama:11434"
+MESSAGES = [{"role": "user", "content": "What do you make of these two market reports"}]
+
+
+def _ndjson(*chunks: dict) -> bytes:
+    return b"".join(json.dumps(c).encode() + b"\n" for c in chunks)
+
+
+@pytest.fixture
+async def classifier():
+    c = LLMClassifier(OLLAMA)
+    yield c
+    await c.close()
+
+
+@respx.mock
+async def test_constrained_request_and_streamed_label(classifier):
+    route = respx.post(f"{OLLAMA}/api/generate").respond(200, content=_ndjson(
+        {"response": '{"category": "', "logprobs": [{"token": '{"category": "', "logprob": 0.0}]},
+        {"response": "analysis", "logprobs": [{"token": "analysis", "logprob": math.log(0.8)}]},
+        {"response": '"}', "logprobs": [{"token": '"}', "logprob": 0.0}]},
+        {"response": "", "done": True},
+    ))
+
+    result = await classifier.classify_with_confidence(MESSAGES)
+
+    assert result.category is TaskCategory.ANALYSIS
+    assert result.confidence == pytest.approx(0.8)
+    body = json.loads(route.calls[0].request.content)
+    assert body["stream"] is True
+    assert body["options"]["num_predict"] == 16
+    assert "analysis" in body["format"]["properties"]["category"]["enum"]
+    assert "vision" not in body["format"]["properties"]["category"]["enum"]
+
+
+@respx.mock
+async def test_stops_at_first_complete_label(classifier):
+    respx.post(f"{OLLAMA}/api/generate").respond(200, content=_ndjson(
+        {"response": '{"category": "math"}'},
+        {"response": "garbage that would not parse"},
+    ))
+
+    result = await classifier.classify_with_confidence(MESSAGES)
+
+    assert result.category is TaskCategory.MATH
+    assert result.confidence == 1.0  # no logprobs from this Ollama
+
+
+@respx.mock
+async def test_unknown_label_or_error_abstains(classifier):
+    respx.post(f"{OLLAMA}/api/generate").respond(200, content=_ndjson({"response": '{"category": "vision"}'}))
+    assert await classifier.classify(MESSAGES) is None
+
+    respx.post(f"{OLLAMA}/api/generate").mock(side_effect=httpx.ConnectError("refused"))
+    assert await classifier.classify(MESSAGES) is None
+
+
+@respx.mock
+async def test_freeform_mode():
+    classifier = LLMClassifier(OLLAMA, constrained=False)
+    respx.post(f"{OLLAMA}/api/generate").respond(200, json={"response": " Coding\n"})
+
+    assert await classifier.classify(MESSAGES) is TaskCategory.CODING
+    await classifier.close()
+
+
+@respx.mock
+async def test_hybrid_ignores_low_confidence_answers(classifier):
+    respx.post(f"{OLLAMA}/api/generate").respond(200, content=_ndjson(
+        {"response": '{"category": "math"}', "logprobs": [{"token": "math", "logprob": math.log(0.3)}]},
+    ))
+
+    confident = HybridClassifier(RulesClassifier(), classifier, llm_min_confidence=0.2)
+    unsure = HybridClassifier(RulesClassifier(), classifier, llm_min_confidence=0.5)
+
+    assert await confident.classify(MESSAGES) is TaskCategory.MATH
+    assert await unsure.classify(MESSAGES) is TaskCategory.GENERAL_CHAT
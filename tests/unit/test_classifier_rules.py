@@ -2,6 +2,7 @@
 
 import pytest
 
+from iir.classifier.base import Classifier, HybridClassifier
 from iir.classifier.categories import TaskCategory
 from iir.classifier.rules import RulesClassifier
 
@@ -93,3 +94,79 @@ async def test_long_context(classifier):
 async def test_ambiguous_returns_none(classifier):
     result = await classifier.classify(_msgs("Tell me about the history of Rome"))
     assert result is None
+
+
+_ANALYSIS_PROMPT = (
+    "Please analyze the quarterly revenue trends below. Revenue grew in Q1 and Q2, "
+    "though a bug in the export delayed Q3 numbers. What does this mean for hiring?"
+)
+
+
+@pytest.mark.asyncio
+async def test_incidental_code_word_loses_to_analysis(classifier):
+    result = await classifier.classify_with_confidence(_msgs(_ANALYSIS_PROMPT))
+    assert result.category == TaskCategory.ANALYSIS
+    assert 0 < result.confidence < 1
+
+
+@pytest.mark.asyncio
+async def test_unambiguous_prompt_has_full_margin(classifier):
+    result = await classifier.classify_with_confidence(_msgs("Fix this bug:\n```python\ndef foo(): pass\n```"))
+    assert result.category == TaskCategory.CODING
+    assert result.confidence == 1.0
+
+
+@pytest.mark.asyncio
+async def test_single_incidental_keyword_in_long_prompt_has_low_confidence(classifier):
+    report = (
+        "Here is the regional sales report for the last quarter. Northern stores beat their targets "
+        "while coastal stores lagged behind because of weather and staffing shortages. "
+    ) * 8
+    prompt = report + "A bug in the till software double counted some refunds. " + report
+    result = await classifier.classify_with_confidence(_msgs(prompt))
+    assert len(prompt) > 2500
+    assert result.category == TaskCategory.CODING
+    assert result.confidence < 0.3
+
+    # A clear instruction at the edge of the same long prompt still wins outright
+    result = await classifier.classify_with_confidence(_msgs("Summarize this report. " + report * 2))
+    assert result.category == TaskCategory.SUMMARIZATION
+    assert result.confidence > 0.5
+
+
+def test_code_punctuation_scores_coding():
+    from iir.classifier.rules import score_text
+
+    assert TaskCategory.CODING in score_text("for (i = 0; i < n; i++) { total += a[i]; }")
+    assert score_text("What a lovely day it is today, isn't it") == {}
+
+
+def test_edge_hits_outweigh_middle_hits():
+    from iir.classifier.rules import score_text
+
+    filler = " lorem ipsum" * 40
+    assert score_text("summarize" + filler)[TaskCategory.SUMMARIZATION] > score_text(filler + " summarize" + filler)[TaskCategory.SUMMARIZATION]
+
+
+class _FixedLLM(Classifier):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def classify(self, messages, **kwargs):
+        self.calls += 1
+        return TaskCategory.CREATIVE_WRITING
+
+
+@pytest.mark.asyncio
+async def test_hybrid_escalates_only_below_margin():
+    llm = _FixedLLM()
+    strict = HybridClassifier(RulesClassifier(), llm, rules_min_margin=0.9)
+    lenient = HybridClassifier(RulesClassifier(), llm, rules_min_margin=0.1)
+
+    assert await lenient.classify(_msgs(_ANALYSIS_PROMPT)) == TaskCategory.ANALYSIS
+    assert llm.calls == 0
+    assert await strict.classify(_msgs(_ANALYSIS_PROMPT)) == TaskCategory.CREATIVE_WRITING
+    assert llm.calls == 1
+    # Unambiguous prompts never reach the LLM
+    assert await strict.classify(_msgs("Translate this to Spanish: Hello world")) == TaskCategory.TRANSLATION
+    assert llm.calls == 1
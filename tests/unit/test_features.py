@@ -0,0 +1,53 @@
+"""Tests for single-pass request feature extraction."""
+
+from __future__ import annotations
+
+from iir.cache.keys import conversation_cache_keys
+from iir.classifier.categories import TaskCategory
+from iir.classifier.rules import RulesClassifier
+from iir.routing.features import extract_features
+from iir.routing.tokens import TOKENS_PER_IMAGE, estimate_text_tokens
+
+CONVERSATION = [
+    {"role": "system", "content": "You are helpful."},
+    {"role": "user", "content": "fix my code"},
+    {"role": "assistant", "content": "Sure, paste it."},
+    {"role": "user", "content": [
+        {"type": "text", "text": "here it is"},
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+    ]},
+]
+
+
+def test_cache_keys_match_conversation_keys():
+    features = extract_features(CONVERSATION)
+    assert (features.previous_cache_key, features.cache_key) == conversation_cache_keys(CONVERSATION)
+
+    no_user = [{"role": "system", "content": "only a system prompt"}]
+    assert (extract_features(no_user).previous_cache_key, extract_features(no_user).cache_key) == conversation_cache_keys(no_user)
+
+
+def test_text_images_and_length():
+    features = extract_features(CONVERSATION)
+    assert features.last_user_text == "here it is"
+    assert features.has_images
+    assert not features.has_tools
+    assert features.total_text_length == len("You are helpful.fix my codeSure, paste it.here it is")
+
+
+def test_tools_and_token_estimate():
+    tools = [{"type": "function", "function": {"name": "lookup"}}]
+    plain = extract_features([{"role": "user", "content": "hi"}])
+    with_tools = extract_features([{"role": "user", "content": "hi"}], tools)
+    assert with_tools.has_tools
+    assert with_tools.prompt_tokens > plain.prompt_tokens
+
+    image = extract_features(CONVERSATION).prompt_tokens
+    text_only = extract_features(CONVERSATION[:3]).prompt_tokens
+    assert image - text_only >= TOKENS_PER_IMAGE + estimate_text_tokens("here it is")
+    assert plain.token_estimate(100).max_tokens == 100
+
+
+async def test_rules_classify_text_blocks():
+    messages = [{"role": "user", "content": [{"type": "text", "text": "Translate this to French: good morning"}]}]
+    assert await RulesClassifier().classify(messages) == TaskCategory.TRANSLATION
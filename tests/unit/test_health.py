@@ -0,0 +1,103 @@
+"""Tests for the background health monitor."""
+
+from __future__ import annotations
+
+import asyncio
+
+from prometheus_client import CollectorRegistry
+
+from iir.classifier.base import Classifier, HybridClassifier
+from iir.classifier.categories import TaskCategory
+from iir.classifier.rules import RulesClassifier
+from iir.observability.health import HealthMonitor
+from iir.observability.metrics import Metrics
+
+
+async def _up() -> bool:
+    return True
+
+
+async def _down() -> bool:
+    return False
+
+
+async def _raises() -> bool:
+    raise ConnectionError("refused")
+
+
+async def _hangs() -> bool:
+    await asyncio.sleep(10)
+    return True
+
+
+async def test_probe_results_are_recorded():
+    metrics = Metrics(CollectorRegistry())
+    monitor = HealthMonitor(metrics)
+    monitor.add("ok", _up)
+    monitor.add("down", _down)
+    monitor.add("broken", _raises)
+    monitor.add("slow", _hangs, timeout=0.01)
+
+    for name in monitor.checks:
+        await monitor.check_now(name)
+
+    snapshot = monitor.snapshot()
+    assert snapshot["ok"]["status"] == "up" and snapshot["ok"]["latency_ms"] is not None
+    assert snapshot["down"]["status"] == "down"
+    assert snapshot["broken"]["error"] == "refused"
+    assert "timed out" in snapshot["slow"]["error"]
+    assert metrics.dependency_up.labels("ok")._value.get() == 1
+    assert metrics.dependency_up.labels("broken")._value.get() == 0
+
+
+async def test_readiness_ignores_non_critical_checks():
+    monitor = HealthMonitor()
+    monitor.add("bifrost", _up)
+    monitor.add("ollama", _down, critical=False)
+    assert monitor.ready  # nothing probed yet: assumed up
+
+    await monitor.check_now("ollama")
+    assert monitor.ready
+    assert not monitor.is_healthy("ollama")
+    assert monitor.is_healthy("unknown")
+
+
+async def test_background_loop_probes_on_interval():
+    calls = 0
+
+    async def probe() -> bool:
+        nonlocal calls
+        calls += 1
+        return calls < 3
+
+    monitor = HealthMonitor()
+    monitor.add("flappy", probe, interval=0.01)
+    await monitor.start()
+    await asyncio.sleep(0.1)
+    await monitor.close()
+
+    assert calls >= 3
+    assert not monitor.ready
+    assert monitor.checks["flappy"].status.consecutive_failures == calls - 2
+
+
+class _RecordingLLM(Classifier):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def classify(self, messages, **kwargs):
+        self.calls += 1
+        return TaskCategory.ANALYSIS
+
+
+async def test_unhealthy_llm_tier_is_skipped():
+    llm = _RecordingLLM()
+    up = True
+    classifier = HybridClassifier(RulesClassifier(), llm, "hybrid", llm_available=lambda: up)
+    messages = [{"role": "user", "content": "Tell me about the history of Rome"}]
+
+    assert await classifier.classify(messages) == TaskCategory.ANALYSIS
+    up = False
+    assert not classifier.llm_ready()
+    assert await classifier.classify(messages) == TaskCategory.GENERAL_CHAT
+    assert llm.calls == 1
@@ -0,0 +1,157 @@
+"""Tests for adaptive per-provider concurrency limits."""
+
+import asyncio
+
+import httpx
+import pytest
+import respx
+from prometheus_client import CollectorRegistry
+
+from iir.bifrost_client.admission import AdmissionScheduler
+from iir.bifrost_client.client import BifrostClient
+from iir.bifrost_client.limiter import AIMDLimit, ConcurrencyLimiter, ProviderOverloadedError
+from iir.cache.memory_cache import MemoryCache
+from iir.classifier.base import HybridClassifier
+from iir.classifier.rules import RulesClassifier
+from iir.observability.metrics import Metrics
+from iir.routing.engine import RoutingEngine
+from iir.routing.model_registry import ModelRegistry
+
+
+def test_aimd_grows_when_busy_and_healthy():
+    limit = AIMDLimit(initial_limit=10)
+    limit.on_sample(0.1, in_flight=5, dropped=False)
+    assert limit.limit == 11
+
+
+def test_aimd_holds_when_underused():
+    limit = AIMDLimit(initial_limit=10)
+    limit.on_sample(0.1, in_flight=1, dropped=False)
+    assert limit.limit == 10
+
+
+def test_aimd_backs_off_on_drop_and_sustained_slowness():
+    limit = AIMDLimit(initial_limit=20, backoff_ratio=0.5, latency_tolerance=2.0, window=4)
+    limit.on_sample(None, in_flight=0, dropped=True)
+    assert limit.limit == 10
+    for _ in range(4):
+        limit.on_sample(0.01, in_flight=0, dropped=False)  # first window sets the baseline
+    for _ in range(4):
+        limit.on_sample(0.1, in_flight=0, dropped=False)  # 10x the baseline
+    assert limit.limit == 5
+
+
+def test_aimd_ignores_occasional_long_completions():
+    # Healthy traffic where a fifth of requests take much longer: the limit must not collapse
+    limit = AIMDLimit(initial_limit=20, max_limit=40)
+    for i in range(2000):
+        latency = 6.0 if i % 5 == 0 else 0.8 + (i % 7) * 0.1
+        limit.on_sample(latency, in_flight=(limit.limit + 1) // 2, dropped=False)
+    assert limit.limit == 40
+
+
+def test_aimd_respects_bounds():
+    limit = AIMDLimit(initial_limit=2, min_limit=2, max_limit=3)
+    limit.on_sample(0.1, in_flight=2, dropped=True)
+    assert limit.limit == 2
+    limit.on_sample(0.1, in_flight=2, dropped=False)
+    limit.on_sample(0.1, in_flight=2, dropped=False)
+    assert limit.limit == 3
+
+
+def test_limiter_rejects_over_limit_and_exports_gauges():
+    registry = CollectorRegistry()
+    limiter = ConcurrencyLimiter(lambda: AIMDLimit(initial_limit=1), metrics=Metrics(registry=registry))
+    assert limiter.try_acquire("groq")
+    assert not limiter.try_acquire("groq")
+    assert limiter.saturated() == frozenset({"groq"})
+    assert registry.get_sample_value("iir_provider_rejections_total", {"provider": "groq"}) == 1
+    assert registry.get_sample_value("iir_provider_in_flight", {"provider": "groq"}) == 1
+
+    limiter.release("groq", reached=False)
+    assert limiter.has_capacity("groq")
+    assert registry.get_sample_value("iir_provider_concurrency_limit", {"provider": "groq"}) == 1
+
+
+@pytest.mark.asyncio
+async def test_client_raises_when_provider_saturated():
+    limiter = ConcurrencyLimiter(lambda: AIMDLimit(initial_limit=1))
+    limiter.try_acquire("openai")
+    client = BifrostClient("http://bifrost.test", limiter=limiter)
+    await client.start()
+    with pytest.raises(ProviderOverloadedError):
+        await client.chat_completion({"model": "openai/gpt-4o", "messages": []}, provider="openai")
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_feeds_errors_back_into_limit():
+    limiter = ConcurrencyLimiter(lambda: AIMDLimit(initial_limit=10, backoff_ratio=0.5))
+    client = BifrostClient("http://bifrost.test", limiter=limiter)
+    await client.start()
+    with respx.mock:
+        respx.post("http://bifrost.test/v1/chat/completions").respond(503)
+        await client.chat_completion({"model": "groq/llama", "messages": []}, provider="groq")
+    assert limiter.limit("groq") == 5
+    assert limiter.in_flight("groq") == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_keys_limit_by_provider_and_samples_per_token():
+    limiter = ConcurrencyLimiter(lambda: AIMDLimit(initial_limit=10, window=1))
+    client = BifrostClient("http://bifrost.test", limiter=limiter)
+    await client.start()
+    with respx.mock:
+        body = {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 50}}
+        respx.post("http://bifrost.test/v1/chat/completions").respond(200, json=body)
+        await client.chat_completion({"model": "meta-llama/llama-3", "messages": []}, provider="groq")
+    assert limiter.in_flight("groq") == 0
+    assert "meta-llama" not in limiter._limits
+    elapsed_per_token = limiter._get("groq").baseline
+    assert elapsed_per_token is not None and elapsed_per_token < 0.1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_do_not_hold_limit_slots():
+    scheduler = AdmissionScheduler(max_concurrency=1)
+    limiter = ConcurrencyLimiter(lambda: AIMDLimit(initial_limit=5))
+    client = BifrostClient("http://bifrost.test", scheduler=scheduler, limiter=limiter)
+    await client.start()
+    release = asyncio.Event()
+
+    async def _slow(request):
+        await release.wait()
+        return httpx.Response(200, json={})
+
+    with respx.mock:
+        respx.post("http://bifrost.test/v1/chat/completions").mock(side_effect=_slow)
+        calls = [asyncio.create_task(client.chat_completion({"messages": []}, provider="groq")) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert limiter.in_flight("groq") == 1
+        release.set()
+        await asyncio.gather(*calls)
+    assert limiter.in_flight("groq") == 0
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_reroutes_around_saturated_provider():
+    registry = ModelRegistry()
+    registry.load_from_yaml("config/models.yaml")
+    limiter = ConcurrencyLimiter(lambda: AIMDLimit(initial_limit=1))
+    engine = RoutingEngine(
+        registry=registry,
+        classifier=HybridClassifier(RulesClassifier(), strategy="rules_only"),
+        cache=MemoryCache(),
+        metrics=Metrics(registry=CollectorRegistry()),
+        limiter=limiter,
+    )
+    messages = [{"role": "user", "content": "Write a Python function to sort a list"}]
+    assert (await engine.route(messages=messages)).provider == "anthropic"
+
+    limiter.try_acquire("anthropic")
+    decision = await engine.route(messages=messages)
+    assert decision.provider != "anthropic"
+    assert decision.category == "coding"
@@ -0,0 +1,49 @@
+"""Tests for multiprocess metrics aggregation."""
+
+import os
+import subprocess
+import sys
+
+_WORKER = """
+from iir.observability.metrics import get_metrics
+m = get_metrics()
+m.requests_total.labels("POST", "/v1/chat/completions", "2xx").inc({n})
+m.request_latency.labels("POST", "/v1/chat/completions").observe(0.1)
+m.provider_in_flight.labels(provider="openai").set(3)
+"""
+
+_SCRAPE = """
+import sys
+from iir.observability.metrics import reap_dead_workers, render_latest
+reaped = reap_dead_workers()
+body, _ = render_latest()
+sys.stdout.write(f"reaped={reaped}\\n" + body.decode())
+"""
+
+
+def _run(code: str, env: dict) -> str:
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True).stdout
+
+
+def test_counters_aggregate_across_workers_and_dead_gauges_are_reaped(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    _run(_WORKER.format(n=2), env)
+    _run(_WORKER.format(n=3), env)
+
+    out = _run(_SCRAPE, env)
+
+    assert "reaped=2" in out
+    assert 'iir_requests_total{method="POST",route="/v1/chat/completions",status="2xx"} 5.0' in out
+    assert 'iir_request_latency_seconds_count{method="POST",route="/v1/chat/completions"} 2.0' in out
+    # Both workers exited, so their live gauges no longer contribute
+    assert 'iir_provider_in_flight{provider="openai"}' not in out
+
+
+def test_single_process_render(monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    monkeypatch.delenv("prometheus_multiproc_dir", raising=False)
+    from iir.observability.metrics import render_latest
+
+    body, content_type = render_latest()
+    assert content_type.startswith("text/plain")
+    assert b"python_info" in body
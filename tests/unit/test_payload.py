@@ -0,0 +1,71 @@
+"""Tests for single-parse chat bodies and byte-preserving forwarding."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from iir.api import payload
+from iir.api.payload import parse_chat_body, upstream_body
+
+
+def test_spans_point_at_original_bytes():
+    raw = b'{ "model" : null, "messages":[{"role":"user","content":"hi"}] ,"stream":true}'
+    body = parse_chat_body(raw)
+    assert body.data == json.loads(raw)
+    start, end = body.spans["messages"]
+    assert raw[start:end] == b'[{"role":"user","content":"hi"}]'
+
+
+def test_spans_are_byte_offsets_for_non_ascii():
+    raw = '{"messages":[{"role":"user","content":"héllo wörld"}],"max_tokens":5}'.encode()
+    body = parse_chat_body(raw)
+    start, end = body.spans["max_tokens"]
+    assert raw[start:end] == b"5"
+    start, end = body.spans["messages"]
+    assert json.loads(raw[start:end]) == body.data["messages"]
+
+
+def test_upstream_body_overrides_and_drops_nulls():
+    raw = b'{"model":null,"messages":[{"role":"user","content":"hi"}],"temperature":null,"top_p":0.5}'
+    body = parse_chat_body(raw)
+    sent = bytes(upstream_body(body, {"model": "openai/gpt-4o", "stream_options": {"include_usage": True}}))
+    assert b'"messages":[{"role":"user","content":"hi"}]' in sent
+    assert json.loads(sent) == {
+        "messages": [{"role": "user", "content": "hi"}],
+        "top_p": 0.5,
+        "model": "openai/gpt-4o",
+        "stream_options": {"include_usage": True},
+    }
+
+
+@pytest.mark.parametrize("raw", [b"", b"[]", b'{"a":1', b'{"a" 1}', b'{"a":1}x', b'{"a":1,}', b"\xff"])
+def test_invalid_bodies_raise_value_error(raw):
+    with pytest.raises(ValueError):
+        parse_chat_body(raw)
+
+
+def test_empty_object():
+    body = parse_chat_body(b" {} ")
+    assert body.data == {}
+    assert bytes(upstream_body(body, {})) == b"{}"
+
+
+def test_nested_nulls_are_forwarded():
+    # Unlike the old model_dump(exclude_none=True), only top-level nulls are dropped
+    raw = b'{"messages":[{"role":"user","content":"hi","name":null}],"tools":[{"type":"function","strict":null}]}'
+    sent = json.loads(bytes(upstream_body(parse_chat_body(raw), {"model": "m"})))
+    assert sent["messages"] == [{"role": "user", "content": "hi", "name": None}]
+    assert sent["tools"] == [{"type": "function", "strict": None}]
+
+
+async def test_upstream_body_streams_small_chunks(monkeypatch):
+    monkeypatch.setattr(payload, "_CHUNK_SIZE", 4)
+    raw = b'{"messages":[{"role":"user","content":"hello world"}]}'
+    sent = upstream_body(parse_chat_body(raw), {"model": "m"})
+
+    chunks = [chunk async for chunk in sent]
+    assert all(len(chunk) <= 4 for chunk in chunks)
+    assert b"".join(chunks) == bytes(sent)
+    assert len(sent) == len(bytes(sent))
@@ -0,0 +1,81 @@
+"""Tests for the Redis cache (against fakeredis)."""
+
+from __future__ import annotations
+
+import logging
+
+import fakeredis
+import pytest
+
+from iir.cache.redis_cache import LocalCache, RedisCache, decode_value, encode_value
+
+
+@pytest.fixture
+async def cache():
+    c = RedisCache("redis://fake", client=fakeredis.FakeAsyncRedis())
+    await c.connect()
+    yield c
+    await c.close()
+
+
+def test_codec_round_trips_and_reads_legacy_json():
+    for value in ("coding", "", "naïve", b"\x00\xff", {"a": [1, 2]}, 3):
+        assert decode_value(encode_value(value)) == value
+    assert len(encode_value("coding")) == len("coding") + 1
+    assert decode_value(b'"analysis"') == "analysis"  # written by the JSON codec
+
+
+async def test_set_get_delete(cache):
+    await cache.set("classify:a", "math", ttl=60)
+    assert await cache.get("classify:a") == "math"
+    assert await cache._client.ttl("classify:a") == 60
+    await cache.delete("classify:a")
+    assert await cache.get("classify:a") is None
+
+
+async def test_bulk_operations(cache):
+    await cache.set_many({"k1": "coding", "k2": {"n": 1}}, ttl=30)
+    await cache.set_many({"k3": "math"}, ttl=0)
+
+    assert await cache.get_many(["k1", "missing", "k2", "k3"]) == ["coding", None, {"n": 1}, "math"]
+    assert await cache._client.ttl("k1") == 30
+    assert await cache._client.ttl("k3") == -1
+    assert await cache.get_many([]) == []
+
+
+async def test_tracking_unsupported_falls_back_to_reads(caplog):
+    c = RedisCache("redis://fake", client=fakeredis.FakeAsyncRedis(), client_tracking=True)
+    with caplog.at_level(logging.WARNING, logger="iir.cache"):
+        await c.connect()
+    # Refused by the server, not broken on our side before the command was sent
+    assert "client-side caching unavailable (ResponseError" in caplog.text
+    await c.set("classify:x", "coding")
+    assert await c.get("classify:x") == "coding"
+    assert not c._tracking and len(c._local) == 0
+    await c.close()
+
+
+async def test_local_hits_are_invalidated_by_push(cache):
+    cache._tracking = True  # as if CLIENT TRACKING had been accepted
+    await cache.set("classify:x", "coding")
+    assert await cache.get("classify:x") == "coding"
+    await cache._client.set("classify:x", encode_value("math"))
+    assert await cache.get("classify:x") == "coding"  # served locally
+
+    cache.handle_invalidation([b"message", b"__redis__:invalidate", [b"classify:x"]])
+    assert await cache.get("classify:x") == "math"
+
+    cache.handle_invalidation([b"message", b"__redis__:invalidate", None])  # FLUSHALL
+    assert len(cache._local) == 0
+
+
+def test_local_cache_skips_reads_that_raced_an_invalidation():
+    local = LocalCache(max_entries=2)
+    generation = local.generation
+    local.invalidate(["a"])
+    local.put("a", "stale", generation)
+    assert local.get("a") is None
+
+    for key in ("a", "b", "c"):
+        local.put(key, key, local.generation)
+    assert local.get("a") is None and local.get("c") == "c"
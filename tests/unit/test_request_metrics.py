@@ -0,0 +1,71 @@
+"""Tests for the request metrics middleware and pre-bound label children."""
+
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+from prometheus_client.openmetrics.exposition import generate_latest
+
+from iir.middleware.metrics import RequestMetricsMiddleware
+from iir.observability.metrics import LabelCache, Metrics
+
+_TRACEPARENT = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+def _app(registry: CollectorRegistry, exemplars: bool = False) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str) -> dict:
+        if item_id == "missing":
+            raise HTTPException(404)
+        return {"id": item_id}
+
+    app.add_middleware(RequestMetricsMiddleware, metrics=Metrics(registry=registry), exemplars=exemplars)
+    return app
+
+
+def test_records_route_template_and_status_class(registry):
+    client = TestClient(_app(registry))
+    client.get("/items/a")
+    client.get("/items/b")
+    client.get("/items/missing")
+    client.get("/nowhere")
+
+    def sample(name: str, **labels: str) -> float | None:
+        return registry.get_sample_value(name, labels)
+
+    assert sample("iir_requests_total", method="GET", route="/items/{item_id}", status="2xx") == 2
+    assert sample("iir_requests_total", method="GET", route="/items/{item_id}", status="4xx") == 1
+    assert sample("iir_request_errors_total", method="GET", route="/items/{item_id}", status="4xx") == 1
+    assert sample("iir_request_errors_total", method="GET", route="/items/{item_id}", status="2xx") == 0
+    assert sample("iir_requests_total", method="GET", route="<unmatched>", status="4xx") == 1
+    assert sample("iir_request_latency_seconds_count", method="GET", route="/items/{item_id}") == 3
+
+
+def test_exemplars_carry_trace_id(registry, monkeypatch):
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    monkeypatch.delenv("prometheus_multiproc_dir", raising=False)
+    client = TestClient(_app(registry, exemplars=True))
+    client.get("/items/a", headers={"traceparent": _TRACEPARENT})
+
+    body = generate_latest(registry).decode()
+    assert 'trace_id="4bf92f3577b34da6a3ce929d0e0e4736"' in body
+
+
+def test_label_cache_reuses_children(registry):
+    metrics = Metrics(registry=registry)
+    cache = LabelCache(metrics.model_routed)
+
+    assert cache.get("openai/gpt-4o") is cache.get("openai/gpt-4o")
+    cache.get("openai/gpt-4o").inc()
+    assert registry.get_sample_value("iir_model_routed_total", {"model": "openai/gpt-4o"}) == 1
+    # Every category is bound up front, so it is exported at zero
+    assert registry.get_sample_value("iir_classification_category_total", {"category": "coding"}) == 0
@@ -0,0 +1,116 @@
+"""Tests for the Redis failover wrapper."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from prometheus_client import CollectorRegistry
+
+from iir.cache.memory_cache import MemoryCache
+from iir.cache.resilient import ResilientCache
+from iir.observability.metrics import Metrics
+
+
+class _FlakyRedis(MemoryCache):
+    """MemoryCache that can be taken down or slowed like a remote Redis."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.down = False
+        self.delay = 0.0
+        self.calls = 0
+
+    async def _check(self) -> None:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.down:
+            raise ConnectionError("connection refused")
+
+    async def connect(self) -> None:
+        await self._check()
+
+    async def get(self, key):
+        await self._check()
+        return await super().get(key)
+
+    async def set(self, key, value, ttl=3600):
+        await self._check()
+        await super().set(key, value, ttl)
+
+    async def set_many(self, items, ttl=3600):
+        await self._check()
+        await super().set_many(items, ttl)
+
+
+def _wrap(primary, **kwargs) -> ResilientCache:
+    return ResilientCache(primary, timeout=0.01, failure_threshold=2, probe_interval=0.01, metrics=Metrics(CollectorRegistry()), **kwargs)
+
+
+async def test_runtime_outage_fails_over_and_recovers():
+    primary = _FlakyRedis()
+    cache = _wrap(primary)
+    await cache.connect()
+    await cache.set("k", "redis")
+    assert cache.healthy
+
+    primary.down = True
+    assert await cache.get("k") is None  # answered by the fallback, no exception
+    assert cache.healthy  # one failure is not enough
+    await cache.set("k", "memory")
+    assert not cache.healthy
+    assert cache.metrics.cache_failovers._value.get() == 1
+    calls = primary.calls
+    assert await cache.get("k") == "memory"
+    assert primary.calls == calls  # breaker open: Redis is not touched
+
+    primary.down = False
+    for _ in range(100):
+        if cache.healthy:
+            break
+        await asyncio.sleep(0.01)
+    assert cache.healthy
+    assert cache.metrics.cache_redis_up._value.get() == 1
+    assert await cache.get("k") == "redis"
+    assert await cache.fallback.get("k") is None  # outage writes discarded
+    await cache.close()
+
+
+async def test_down_at_startup_starts_on_fallback():
+    primary = _FlakyRedis()
+    primary.down = True
+    cache = _wrap(primary)
+    await cache.connect()
+    assert not cache.healthy
+
+    await cache.set("k", "v")
+    assert await cache.get("k") == "v"
+    await cache.close()
+    assert cache._probe_task is None
+
+
+async def test_slow_redis_costs_at_most_the_timeout():
+    primary = _FlakyRedis()
+    cache = _wrap(primary)
+    await cache.connect()
+    primary.delay = 1.0
+
+    started = time.monotonic()
+    assert await cache.get("k") is None
+    assert time.monotonic() - started < 0.5
+    await cache.close()
+
+
+async def test_bulk_calls_get_their_own_timeout():
+    primary = _FlakyRedis()
+    cache = _wrap(primary, bulk_timeout=1.0)
+    await cache.connect()
+    primary.delay = 0.05  # well over the per-call timeout
+
+    for _ in range(3):
+        await cache.set_many({"k": "v"})
+    assert cache.healthy
+    assert await cache.get_many(["k"]) == ["v"]
+    assert await cache.fallback.get("k") is None  # the warm-up landed in Redis
+    await cache.close()
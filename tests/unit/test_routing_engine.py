@@ -1,9 +1,11 @@
 """Tests for the routing engine."""
 
+import asyncio
+
 import pytest
 
 from iir.cache.memory_cache import MemoryCache
-from iir.classifier.base import HybridClassifier
+from iir.classifier.base import Classifier, HybridClassifier
 from iir.classifier.categories import TaskCategory
 from iir.classifier.rules import RulesClassifier
 from iir.observability.metrics import Metrics
@@ -88,3 +90,207 @@ async def test_local_only_strategy(engine):
         strategy="local-only",
     )
     assert "ollama" in decision.model or decision.estimated_cost_per_1m == 0.0
+
+
+@pytest.fixture
+def small_context_registry(tmp_path):
+    config = tmp_path / "models.yaml"
+    config.write_text(
+        "models:\n"
+        "  local/small:\n"
+        "    provider: ollama\n"
+        "    capabilities: [general_chat, coding]\n"
+        "    context_length: 2000\n"
+        "    quality_tier: good\n"
+        "  cloud/big:\n"
+        "    provider: openai\n"
+        "    capabilities: [general_chat, coding]\n"
+        "    context_length: 128000\n"
+        "    cost_per_1m_input_tokens: 1.0\n"
+        "    cost_per_1m_output_tokens: 2.0\n"
+        "    quality_tier: great\n"
+        "task_routing:\n"
+        "  general_chat: local/small\n"
+        "  coding: cloud/big\n"
+    )
+    r = ModelRegistry()
+    r.load_from_yaml(config)
+    return r
+
+
+def _engine_for(registry, **kwargs):
+    return RoutingEngine(
+        registry=registry,
+        classifier=HybridClassifier(RulesClassifier(), strategy="rules_only"),
+        cache=MemoryCache(),
+        metrics=Metrics(registry=CollectorRegistry()),
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_context_too_small_is_skipped(small_context_registry):
+    engine = _engine_for(small_context_registry)
+    decision = await engine.route(
+        messages=[{"role": "user", "content": "Tell me about the history of Rome"}],
+        max_tokens=4000,
+    )
+    assert decision.model == "cloud/big"
+
+
+@pytest.mark.asyncio
+async def test_short_prompt_prefers_local(small_context_registry):
+    engine = _engine_for(small_context_registry, prefer_local_under_tokens=2000)
+    decision = await engine.route(messages=[{"role": "user", "content": "Write a Python function to sort a list"}])
+    assert decision.model == "local/small"
+    assert decision.estimated_cost == 0.0
+
+
+@pytest.mark.asyncio
+async def test_estimated_cost_for_paid_model(small_context_registry):
+    engine = _engine_for(small_context_registry)
+    decision = await engine.route(messages=[{"role": "user", "content": "Write a Python function to sort a list"}], max_tokens=100)
+    assert decision.model == "cloud/big"
+    assert decision.estimated_prompt_tokens > 0
+    assert decision.estimated_cost > 0
+
+
+class _CountingLLM(Classifier):
+    def __init__(self, category: TaskCategory) -> None:
+        self.category = category
+        self.calls = 0
+
+    async def classify(self, messages, **kwargs):
+        self.calls += 1
+        return self.category
+
+
+@pytest.mark.asyncio
+async def test_followup_turn_reuses_conversation_category(registry):
+    llm = _CountingLLM(TaskCategory.ANALYSIS)
+    engine = RoutingEngine(
+        registry=registry,
+        classifier=HybridClassifier(RulesClassifier(), llm, strategy="hybrid"),
+        cache=MemoryCache(),
+        metrics=Metrics(registry=CollectorRegistry()),
+    )
+    history = [{"role": "user", "content": "What do you make of these two market reports"}]
+    first = await engine.route(messages=history)
+    history += [{"role": "assistant", "content": "Report A is ..."}, {"role": "user", "content": "Go deeper on risks"}]
+    second = await engine.route(messages=history)
+
+    assert first.category == second.category == "analysis"
+    assert llm.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_followup_turn_switches_on_strong_signal(engine):
+    history = [{"role": "user", "content": "Tell me about the history of Rome"}]
+    await engine.route(messages=history)
+    history += [
+        {"role": "assistant", "content": "Rome was founded ..."},
+        {"role": "user", "content": "Translate that to Spanish"},
+    ]
+    decision = await engine.route(messages=history)
+    assert decision.category == "translation"
+
+
+def test_capability_masks(registry):
+    from iir.routing.capabilities import TOOLS, VISION, category_bit
+
+    llama = registry.get_model("ollama/llama3.2")
+    gpt4o = registry.get_model("openai/gpt-4o")
+    assert llama.capability_mask & TOOLS == 0
+    assert gpt4o.capability_mask & (TOOLS | VISION | category_bit(TaskCategory.MATH)) == TOOLS | VISION | category_bit(TaskCategory.MATH)
+    assert [m.id for m in registry.models_with(category_bit(TaskCategory.SUMMARIZATION))] == ["ollama/llama3.2"]
+    assert registry.models_with(VISION) is registry.models_with(VISION)
+
+
+@pytest.mark.asyncio
+async def test_cached_category_still_honours_tools(engine):
+    messages = [{"role": "user", "content": "Hello!"}]
+    await engine.route(messages=messages)  # caches simple_chat for these messages
+
+    decision = await engine.route(messages=messages, tools=[{"type": "function", "function": {"name": "f"}}])
+
+    assert decision.category == "simple_chat"
+    assert engine.registry.get_model(decision.model).supports_tools
+
+
+@pytest.mark.asyncio
+async def test_local_only_with_image_skips_text_only_models(engine):
+    messages = [{"role": "user", "content": [
+        {"type": "text", "text": "What is in this picture?"},
+        {"type": "image_url", "image_url": {"url": "https://example.com/cat.png"}},
+    ]}]
+
+    decision = await engine.route(messages=messages, strategy="local-only")
+
+    assert engine.registry.get_model(decision.model).supports_vision
+
+
+class _SlowLLM(Classifier):
+    def __init__(self, category: TaskCategory, delay: float) -> None:
+        self.category = category
+        self.delay = delay
+        self.calls = 0
+
+    async def classify(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.category
+
+
+def _deadline_engine(registry, llm, deadline=0.01):
+    return RoutingEngine(
+        registry=registry,
+        classifier=HybridClassifier(RulesClassifier(), llm, strategy="hybrid"),
+        cache=MemoryCache(),
+        metrics=Metrics(registry=CollectorRegistry()),
+        classify_deadline=deadline,
+    )
+
+
+@pytest.mark.asyncio
+async def test_deadline_falls_back_and_fills_cache_in_background(registry):
+    llm = _SlowLLM(TaskCategory.ANALYSIS, delay=0.1)
+    engine = _deadline_engine(registry, llm)
+    messages = [{"role": "user", "content": "Tell me about the history of Rome"}]
+
+    first, second = await asyncio.gather(engine.route(messages=messages), engine.route(messages=messages))
+    assert first.category == second.category == "general_chat"
+    assert llm.calls == 1  # concurrent identical prompts share the late classification
+    assert engine.metrics.classification_deadline_expired._value.get() == 2
+
+    await asyncio.gather(*engine._inflight.values())
+    assert engine.metrics.background_outcomes.get("disagreed")._value.get() == 2
+
+    third = await engine.route(messages=messages)
+    assert third.category == "analysis"
+    assert llm.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_fallback_uses_rules_winner(registry):
+    llm = _SlowLLM(TaskCategory.CODING, delay=0.1)
+    engine = _deadline_engine(registry, llm)
+    prompt = (
+        "Please analyze the quarterly revenue trends below. Revenue grew in Q1 and Q2, "
+        "though a bug in the export delayed Q3 numbers. What does this mean for hiring?"
+    )
+    engine.classifier.rules_min_margin = 0.99  # force escalation
+
+    decision = await engine.route(messages=[{"role": "user", "content": prompt}])
+    assert decision.category == "analysis"
+    await engine.close()
+    assert not engine._inflight
+
+
+@pytest.mark.asyncio
+async def test_fast_llm_answers_within_deadline(registry):
+    llm = _SlowLLM(TaskCategory.ANALYSIS, delay=0)
+    engine = _deadline_engine(registry, llm, deadline=1.0)
+
+    decision = await engine.route(messages=[{"role": "user", "content": "Tell me about the history of Rome"}])
+    assert decision.category == "analysis"
+    assert engine.metrics.classification_deadline_expired._value.get() == 0
@@ -0,0 +1,157 @@
+"""Tests for the consistent-hashing sharded cache."""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+
+import fakeredis
+import redis.asyncio as aioredis
+from prometheus_client import CollectorRegistry
+
+from iir.cache.redis_cache import RedisCache
+from iir.cache.sharded import HashRing, ShardedRedisCache, node_name
+from iir.cli.main import main
+from iir.observability.metrics import Metrics
+
+KEYS = [f"classify:{i}" for i in range(3000)]
+
+
+class _Node(RedisCache):
+    """RedisCache on its own fakeredis server that can be taken down."""
+
+    def __init__(self) -> None:
+        super().__init__("redis://fake", client=fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer()))
+        self.down = False
+
+    async def connect(self) -> None:
+        if self.down:
+            raise ConnectionError("connection refused")
+        await super().connect()
+
+    async def get(self, key):
+        if self.down:
+            raise ConnectionError("connection refused")
+        return await super().get(key)
+
+    async def set(self, key, value, ttl=3600):
+        if self.down:
+            raise ConnectionError("connection refused")
+        await super().set(key, value, ttl)
+
+
+def _sharded(n: int = 3) -> tuple[ShardedRedisCache, dict[str, _Node]]:
+    nodes = {f"node{i}": _Node() for i in range(n)}
+    cache = ShardedRedisCache(
+        nodes, timeout=0.5, failure_threshold=1, probe_interval=0.01, metrics=Metrics(CollectorRegistry())
+    )
+    return cache, nodes
+
+
+def test_ring_spreads_keys_evenly():
+    ring = HashRing(["a", "b", "c", "d"])
+    counts: dict[str, int] = {}
+    for key in KEYS:
+        counts[ring.owner(key)] = counts.get(ring.owner(key), 0) + 1
+    assert min(counts.values()) > len(KEYS) / 4 * 0.7
+
+
+def test_adding_a_node_moves_few_keys():
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+    assert all(after.owner(key) == "d" for key in moved)
+    assert len(moved) < len(KEYS) * 0.35
+
+
+def test_node_name_hides_credentials():
+    assert node_name("redis://:secret@cache-1:6380/2") == "cache-1:6380/2"
+    assert node_name("redis://cache-2") == "cache-2:6379"
+
+
+async def test_keys_live_on_their_owner():
+    cache, nodes = _sharded()
+    await cache.connect()
+    await cache.set_many({key: "coding" for key in KEYS[:300]})
+    assert await cache.get_many(KEYS[:300]) == ["coding"] * 300
+    for key in KEYS[:300]:
+        assert await nodes[cache.ring.owner(key)].get(key) == "coding"
+    await cache.close()
+
+
+async def test_down_node_is_routed_around_and_rejoins():
+    cache, nodes = _sharded()
+    await cache.connect()
+    victim = cache.ring.owner(KEYS[0])
+    await cache.set(KEYS[0], "coding")
+
+    nodes[victim].down = True
+    assert await cache.get(KEYS[0]) is None  # trips the node, answered from its fallback
+    assert not cache.shards[victim].healthy
+    assert cache.distribution(KEYS)[victim] == 0
+    assert cache.shards[victim].metrics.cache_node_up.labels(victim)._value.get() == 0
+
+    # Rerouted keys are written to the next node on the ring
+    await cache.set(KEYS[0], "math")
+    assert await cache.get(KEYS[0]) == "math"
+    assert cache.shard_for(KEYS[0]).node != victim
+
+    nodes[victim].down = False
+    for _ in range(100):
+        if cache.shards[victim].healthy:
+            break
+        await asyncio.sleep(0.01)
+    assert cache.distribution(KEYS)[victim] > 0
+    assert await cache.get(KEYS[0]) == "coding"  # back on its owner
+    await cache.close()
+
+
+async def test_all_nodes_down_uses_owner_fallback():
+    cache, nodes = _sharded(2)
+    for node in nodes.values():
+        node.down = True
+    await cache.connect()
+    assert not cache.healthy
+    await cache.set("k", "v")
+    assert await cache.get("k") == "v"
+    await cache.close()
+
+
+class _ClusterClient(aioredis.RedisCluster):
+    """The slice of RedisCluster's API that cluster mode uses, without a cluster."""
+
+    def __init__(self) -> None:  # no super().__init__(): nothing to discover
+        self.data: dict[str, bytes] = {}
+
+    async def ping(self) -> bool:
+        return True
+
+    async def mget_nonatomic(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def mset_nonatomic(self, mapping):
+        self.data.update(mapping)
+
+    async def mget(self, keys):
+        raise AssertionError("cross-slot MGET")
+
+    async def mset(self, mapping):
+        raise AssertionError("cross-slot MSET")
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def test_cluster_mode_splits_bulk_operations_by_slot():
+    cache = RedisCache("redis://node-1:7000", client=_ClusterClient(), cluster=True, client_tracking=True)
+    assert not cache.client_tracking
+    await cache.connect()
+    await cache.set_many({"a": "coding", "b": "math"}, ttl=0)
+    assert await cache.get_many(["a", "b", "c"]) == ["coding", "math", None]
+    await cache.close()
+
+
+def test_bench_cache_without_fakeredis_prints_a_hint(monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "fakeredis", None)  # import raises ImportError
+    assert main(["bench-cache", "--nodes", "1"]) == 2
+    assert "need fakeredis" in capsys.readouterr().err
@@ -0,0 +1,66 @@
+"""Tests for the offline routing simulator."""
+
+import json
+from itertools import pairwise
+
+import pytest
+
+from iir.cli.main import main
+from iir.cli.simulate import SimulationConfig, run_simulation, split_ranges
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "corpus.jsonl"
+    lines = [
+        {"messages": [{"role": "user", "content": "Hello!"}]},
+        {"messages": [{"role": "user", "content": "Write a Python function to sort a list"}]},
+        {"custom_id": "x", "body": {"messages": [{"role": "user", "content": "Translate this to Spanish"}]}},
+        {"messages": [{"role": "user", "content": "Tell me about the history of Rome"}]},
+    ] * 25
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\nnot json\n")
+    return path
+
+
+def _config(**kwargs):
+    return SimulationConfig(models_path="config/models.yaml", classifier_strategy="hybrid", **kwargs)
+
+
+def test_split_ranges_cover_file(corpus):
+    ranges = split_ranges(str(corpus), 7)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == corpus.stat().st_size
+    assert all(a[1] == b[0] for a, b in pairwise(ranges))
+
+
+def test_simulation_reports_categories_and_models(corpus):
+    result = run_simulation(str(corpus), _config(strategies=("cost-optimized", "local-only")))
+
+    assert result.requests == 100
+    assert result.invalid == 1
+    assert result.categories["simple_chat"] == 25
+    assert result.categories["coding"] == 25
+    assert result.categories["general_chat"] == 25
+    assert result.models["cost-optimized"]["anthropic/claude-sonnet-4-20250514"] == 25
+    assert sum(result.models["local-only"].values()) == 100
+    assert result.cost["cost-optimized"] > 0
+    assert result.classifications > 0
+
+
+def test_stub_llm_category(corpus):
+    result = run_simulation(str(corpus), _config(strategies=("cost-optimized",), llm_category="analysis"))
+    assert result.categories["analysis"] == 25
+
+
+def test_multiprocess_matches_single_process(corpus):
+    single = run_simulation(str(corpus), _config(), workers=1)
+    multi = run_simulation(str(corpus), _config(), workers=2)
+    assert multi.requests == single.requests
+    assert multi.categories == single.categories
+    assert multi.models == single.models
+
+
+def test_cli_json_output(corpus, capsys):
+    assert main(["simulate", str(corpus), "--models", "config/models.yaml", "--workers", "1", "--json"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["requests"] == 100
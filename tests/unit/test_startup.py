@@ -0,0 +1,84 @@
+"""Tests for startup snapshots and the import-time report."""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+
+from iir.cli.startup import parse_importtime
+from iir.routing.model_registry import ModelRegistry
+from iir.snapshot import load_snapshot, snapshot_path
+
+
+def test_registry_snapshot_round_trip(tmp_path):
+    config = tmp_path / "models.yaml"
+    shutil.copy("config/models.yaml", config)
+    snapshots = tmp_path / "snapshots"
+
+    first = ModelRegistry()
+    first.load(config, snapshots)
+    assert load_snapshot(snapshots, "registry", [config]) is not None
+
+    second = ModelRegistry()
+    second.load(config, snapshots)
+    assert [m.id for m in second.list_models()] == [m.id for m in first.list_models()]
+    assert second.get_model("openai/gpt-4o") == first.get_model("openai/gpt-4o")
+
+
+def test_snapshot_invalidated_when_source_changes(tmp_path):
+    config = tmp_path / "models.yaml"
+    config.write_text("models:\n  openai/gpt-4o:\n    provider: openai\n")
+    snapshots = tmp_path / "snapshots"
+    ModelRegistry().load(config, snapshots)
+
+    config.write_text("models:\n  openai/gpt-4o-mini:\n    provider: openai\n")
+    stat = config.stat()
+    os.utime(config, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_snapshot(snapshots, "registry", [config]) is None
+
+    registry = ModelRegistry()
+    registry.load(config, snapshots)
+    assert registry.model_exists("openai/gpt-4o-mini")
+    assert not registry.model_exists("openai/gpt-4o")
+
+
+def test_corrupt_snapshot_is_a_miss(tmp_path):
+    config = tmp_path / "models.yaml"
+    shutil.copy("config/models.yaml", config)
+    path = snapshot_path(tmp_path, "registry", [config])
+    path.write_bytes(b"not json")
+
+    assert load_snapshot(tmp_path, "registry", [config]) is None
+    registry = ModelRegistry()
+    registry.load(config, tmp_path)
+    assert registry.list_models()
+
+
+def test_snapshot_for_another_source_is_a_miss(tmp_path):
+    config = tmp_path / "models.yaml"
+    shutil.copy("config/models.yaml", config)
+    path = snapshot_path(tmp_path, "registry", [config])
+    path.write_text(json.dumps({"key": [0, "old", [str(config), 0, 0]], "value": {"models": {"evil/model": {}}}}))
+
+    assert load_snapshot(tmp_path, "registry", [config]) is None
+    registry = ModelRegistry()
+    registry.load(config, tmp_path)
+    assert not registry.model_exists("evil/model")
+    assert registry.model_exists("openai/gpt-4o")
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:      1500 |       4000 |     iir.config\n"
+        "import time:       300 |       4500 | iir\n"
+    )
+    timings = parse_importtime(output)
+
+    assert [(t.module, t.self_us, t.cumulative_us, t.depth) for t in timings] == [
+        ("_io", 120, 120, 1),
+        ("iir.config", 1500, 4000, 2),
+        ("iir", 300, 4500, 0),
+    ]
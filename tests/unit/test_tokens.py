@@ -0,0 +1,60 @@
+"""Tests for token estimation and token-aware selection."""
+
+import pytest
+
+from iir.routing.cost_optimizer import estimate_cost, fits_context, select_cost_optimized
+from iir.routing.features import estimate_request_tokens
+from iir.routing.model_registry import ModelInfo
+from iir.routing.tokens import DEFAULT_COMPLETION_TOKENS, TokenEstimate, estimate_text_tokens
+
+
+def test_empty_text():
+    assert estimate_text_tokens("") == 0
+
+
+def test_english_text_near_four_chars_per_token():
+    text = "The quick brown fox jumps over the lazy dog. " * 20
+    tokens = estimate_text_tokens(text)
+    assert len(text) / 6 < tokens < len(text) / 3
+
+
+def test_non_ascii_charged_by_bytes():
+    assert estimate_text_tokens("日本語のテキスト") > estimate_text_tokens("japanese")
+
+
+def test_request_overhead_and_images():
+    plain = estimate_request_tokens([{"role": "user", "content": "hi"}])
+    with_image = estimate_request_tokens([{"role": "user", "content": [
+        {"type": "text", "text": "hi"},
+        {"type": "image_url", "image_url": {"url": "https://example.com/a.png"}},
+    ]}])
+    assert plain.prompt_tokens > 1
+    assert with_image.prompt_tokens > plain.prompt_tokens + 500
+
+
+def test_provider_calibration():
+    estimate = TokenEstimate(prompt_tokens=1000)
+    assert estimate.prompt_for("openai") == 1000
+    assert estimate.prompt_for("anthropic") > 1000
+    assert estimate.prompt_for("unknown") == 1000
+
+
+def test_fits_context_includes_max_tokens():
+    model = ModelInfo(id="a/1", provider="openai", context_length=1000)
+    assert fits_context(model, TokenEstimate(prompt_tokens=500, max_tokens=400))
+    assert not fits_context(model, TokenEstimate(prompt_tokens=500, max_tokens=600))
+
+
+def test_estimate_cost():
+    model = ModelInfo(id="a/1", provider="openai", cost_per_1m_input=1.0, cost_per_1m_output=2.0)
+    cost = estimate_cost(model, TokenEstimate(prompt_tokens=1_000_000, max_tokens=500_000))
+    assert cost == pytest.approx(2.0)
+    default = estimate_cost(model, TokenEstimate(prompt_tokens=0))
+    assert default == pytest.approx(DEFAULT_COMPLETION_TOKENS * 2.0 / 1_000_000)
+
+
+def test_cost_optimized_max_cost_uses_estimate():
+    cheap = ModelInfo(id="a/1", provider="openai", cost_per_1m_input=0.5, cost_per_1m_output=1.0, quality_tier="great")
+    pricey = ModelInfo(id="b/2", provider="openai", cost_per_1m_input=10.0, cost_per_1m_output=30.0, quality_tier="great")
+    estimate = TokenEstimate(prompt_tokens=100_000, max_tokens=1000)
+    assert select_cost_optimized([pricey, cheap], max_cost=0.1, estimate=estimate).id == "a/1"
@@ -0,0 +1,107 @@
+"""Tests for usage parsing and the per-key spend ledger."""
+
+from __future__ import annotations
+
+import calendar
+import json
+
+import pytest
+
+from iir.auth.apikey_db import get_usage, set_api_key_budget
+from iir.routing.model_registry import ModelRegistry
+from iir.usage.ledger import Usage, UsageLedger, _period_end, current_period, parse_usage
+
+KEY = "1"  # the ledger identifies keys by id; tmp_db seeds key 1
+GPT4O = "openai/gpt-4o"  # $2.50 in / $10.00 out per 1M
+
+
+@pytest.fixture
+def registry():
+    r = ModelRegistry()
+    r.load_from_yaml("config/models.yaml")
+    return r
+
+
+@pytest.fixture
+async def ledger(tmp_db, registry):
+    ledger = UsageLedger(tmp_db, registry, flush_interval=3600)
+    await ledger.start()
+    yield ledger
+    await ledger.close()
+
+
+def test_parse_usage_json():
+    body = json.dumps({"usage": {"prompt_tokens": 12, "completion_tokens": 5}}).encode()
+    assert parse_usage(body, "application/json") == Usage(12, 5)
+    assert parse_usage(b"{}", "application/json") is None
+    assert parse_usage(b"not json", "application/json") is None
+
+
+def test_parse_usage_takes_final_sse_chunk():
+    sse = (
+        b'data: {"choices": [{"delta": {"content": "a"}}], "usage": null}\n\n'
+        b'data: {"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 4}}\n\n'
+        b"data: [DONE]\n\n"
+    )
+    assert parse_usage(sse, "text/event-stream; charset=utf-8") == Usage(3, 4)
+
+
+def test_period_end_rolls_over_year():
+    dec = calendar.timegm((2026, 12, 15, 0, 0, 0))
+    assert current_period(dec) == "2026-12"
+    assert _period_end(dec) == calendar.timegm((2027, 1, 1, 0, 0, 0))
+
+
+async def test_record_costs_and_flushes_in_one_batch(ledger, tmp_db):
+    cost = ledger.record(KEY, GPT4O, Usage(1_000_000, 100_000))
+    ledger.record(KEY, GPT4O, Usage(1_000_000, 100_000))
+
+    assert cost == pytest.approx(3.5)
+    assert ledger.spent(KEY) == pytest.approx(7.0)
+    assert get_usage(tmp_db, current_period()) == {}
+
+    await ledger.flush()
+
+    row = get_usage(tmp_db, current_period())[KEY]
+    assert row["requests"] == 2
+    assert row["cost_usd"] == pytest.approx(7.0)
+    assert ledger.spent(KEY) == pytest.approx(7.0)
+
+
+async def test_budget_enforced_from_memory(ledger, tmp_db):
+    assert ledger.within_budget(KEY)
+    ledger.set_budget(KEY, 5.0)
+    ledger.record(KEY, GPT4O, Usage(2_000_000, 0))
+    assert not ledger.within_budget(KEY)
+    ledger.set_budget(KEY, None)
+    assert ledger.within_budget(KEY)
+
+
+async def test_flush_picks_up_other_workers_and_budget_changes(ledger, tmp_db, registry):
+    other = UsageLedger(tmp_db, registry, flush_interval=3600)
+    await other.start()
+    other.record(KEY, GPT4O, Usage(2_000_000, 0))
+    await other.close()
+    set_api_key_budget(tmp_db, KEY, 4.0)
+
+    ledger.record(KEY, GPT4O, Usage(0, 0))
+    await ledger.flush()
+
+    assert ledger.spent(KEY) == pytest.approx(5.0)
+    assert ledger.budget(KEY) == 4.0
+    assert not ledger.within_budget(KEY)
+
+
+async def test_failed_flush_keeps_pending(ledger, monkeypatch):
+    ledger.record(KEY, GPT4O, Usage(1_000_000, 0))
+
+    def boom(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("iir.usage.ledger.add_usage", boom)
+    await ledger.flush()
+
+    assert ledger.spent(KEY) == pytest.approx(2.5)
+    monkeypatch.undo()
+    await ledger.flush()
+    assert ledger.spent(KEY) == pytest.approx(2.5)